@@ -1,13 +1,7 @@
 # app.py - Professional Storm Damage Prediction App
+# Only Streamlit is imported here: this page runs on every cold start, and
+# pandas, scikit-learn, matplotlib and the model are loaded by the pages that use them
 import streamlit as st
-import pandas as pd
-import numpy as np
-import joblib
-import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime
-import streamlit.components.v1 as components
 
 # Page configuration
 st.set_page_config(
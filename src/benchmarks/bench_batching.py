@@ -0,0 +1,90 @@
+# benchmarks/bench_batching.py - Latency/throughput of async micro-batching
+#
+# Simulates concurrent callers that each send one event at a time and
+# compares scoring every request on its own with AsyncMicroBatcher at
+# several max_wait_ms settings.
+#
+# Usage (from the src directory):
+#   python -m benchmarks.bench_batching events.csv --clients 64 --requests 20 --wait-ms 0 2 5 10
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+
+from utils.batching import DEFAULT_MAX_BATCH_ROWS, AsyncMicroBatcher, damage_predictor
+from utils.model_utils import read_events
+
+
+async def _drive(batcher, events, clients, requests_per_client):
+    latencies = []
+
+    async def client(offset):
+        for i in range(requests_per_client):
+            event = events[(offset * requests_per_client + i) % len(events)]
+            start = time.perf_counter()
+            await batcher.predict_one(event)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    return time.perf_counter() - start, latencies
+
+
+def run_setting(predict_fn, events, clients, requests_per_client, max_batch_rows, max_wait_ms):
+    """Run one load test; returns a result dict (throughput, latency percentiles, batch sizes)."""
+    async def main():
+        async with AsyncMicroBatcher(predict_fn, max_batch_rows=max_batch_rows, max_wait_ms=max_wait_ms) as batcher:
+            seconds, latencies = await _drive(batcher, events, clients, requests_per_client)
+            return seconds, latencies, batcher.stats.snapshot()
+
+    seconds, latencies, stats = asyncio.run(main())
+    latencies_ms = 1000 * np.asarray(latencies)
+    return {
+        'max_batch_rows': max_batch_rows,
+        'max_wait_ms': max_wait_ms,
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / seconds,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'mean_batch_rows': stats['mean_batch_rows'],
+        'batches': stats['batches'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_batching',
+                                     description='Measure async micro-batching under concurrent single-event load.')
+    parser.add_argument('input', help='.csv or .parquet file of storm events to sample requests from')
+    parser.add_argument('--model', default=None, help='model file (default: the up-to-date model in src/)')
+    parser.add_argument('--clients', type=int, default=64, help='concurrent callers')
+    parser.add_argument('--requests', type=int, default=20, help='sequential requests per caller')
+    parser.add_argument('--max-batch-rows', type=int, default=DEFAULT_MAX_BATCH_ROWS)
+    parser.add_argument('--wait-ms', type=float, nargs='+', default=[0.0, 2.0, 5.0, 10.0],
+                        help='max_wait_ms settings to compare')
+    parser.add_argument('--json', dest='json_path', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    events = read_events(args.input).to_dict(orient='records')
+    predict_fn = damage_predictor(args.model)
+    predict_fn(events[:1])  # warm up
+
+    # Batch size 1 = every request scored on its own (no coalescing)
+    settings = [(1, 0.0)] + [(args.max_batch_rows, wait) for wait in args.wait_ms]
+    results = [run_setting(predict_fn, events, args.clients, args.requests, rows, wait) for rows, wait in settings]
+
+    print(f"{'batch':>6} {'wait ms':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'rows/batch':>11}")
+    for r in results:
+        print(f"{r['max_batch_rows']:>6} {r['max_wait_ms']:>8.1f} {r['requests_per_second']:>9,.0f} "
+              f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['mean_batch_rows']:>11.1f}")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# benchmarks/bench_damage_parser.py - Vectorized parse_damage vs the notebook's row-by-row convert_damage
+#
+# Usage (from the src directory):
+#   python -m benchmarks.bench_damage_parser StormEvents_cleaned1.csv
+#   python -m benchmarks.bench_damage_parser StormEvents_cleaned1.csv --rows 2000000 --json parser.json
+
+import argparse
+import json
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data_utils import DAMAGE_MULTIPLIERS, parse_damage
+
+
+def convert_damage(value, multipliers=DAMAGE_MULTIPLIERS):
+    """The training notebook's original per-value parser (the .apply baseline)."""
+    if pd.isna(value):
+        return 0.0
+    v = str(value).strip().upper()
+    if v in ["", "0", "0.0", "NONE", "NA", "NAN"]:
+        return 0.0
+    multiplier = 1.0
+    if v[-1] in multipliers:
+        multiplier = multipliers[v[-1]]
+        num = v[:-1]
+    else:
+        num = v.replace(",", "")
+    try:
+        return float(num) * multiplier
+    except ValueError:
+        num_only = re.sub(r"[^0-9\.]", "", v)
+        try:
+            return float(num_only) * multiplier if num_only else 0.0
+        except ValueError:
+            return float('nan')
+
+
+def _best_of(fn, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(values, repeat=3):
+    """Time both parsers over values (a Series of damage strings); returns a result dict.
+
+    The baseline uses the same K/M/B multipliers as parse_damage so the
+    outputs can be compared value for value.
+    """
+    apply_seconds, expected = _best_of(lambda: values.apply(convert_damage).astype('float64'), repeat)
+    vector_seconds, actual = _best_of(lambda: parse_damage(values), repeat)
+    # Strings the notebook version could not parse at all (e.g. "1.2.3K") are not compared
+    comparable = expected.notna().to_numpy()
+    agree = np.isclose(actual.to_numpy()[comparable], expected.to_numpy()[comparable], rtol=1e-12, atol=0)
+    return {
+        'rows': len(values),
+        'distinct_values': int(values.nunique(dropna=False)),
+        'apply_seconds': apply_seconds,
+        'vectorized_seconds': vector_seconds,
+        'speedup': apply_seconds / vector_seconds if vector_seconds else float('inf'),
+        'compared': int(comparable.sum()),
+        'mismatches': int((~agree).sum()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_damage_parser',
+                                     description='Compare parse_damage with the row-by-row .apply parser.')
+    parser.add_argument('input', help='StormEvents CSV with a damage column')
+    parser.add_argument('--column', default='DAMAGE_PROPERTY')
+    parser.add_argument('--rows', type=int, default=None, help='tile the column to this many rows')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', dest='json_path', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    values = pd.read_csv(args.input, usecols=[args.column], dtype=str, keep_default_na=False)[args.column]
+    if args.rows and len(values):
+        repeats = -(-args.rows // len(values))
+        values = pd.concat([values] * repeats, ignore_index=True).iloc[:args.rows]
+
+    r = run(values, repeat=args.repeat)
+    print(f"{r['rows']:,} values ({r['distinct_values']:,} distinct) of {args.column}")
+    print(f"  .apply(convert_damage) {r['apply_seconds']:8.3f}s")
+    print(f"  parse_damage           {r['vectorized_seconds']:8.3f}s  ({r['speedup']:.1f}x)")
+    print(f"  mismatches             {r['mismatches']:,} of {r['compared']:,}")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(r, f, indent=2)
+    return 0 if r['mismatches'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# benchmarks/bench_features.py - Vectorized utils.features vs the notebook's feature engineering
+#
+# Baselines: DURATION_HOURS and calendar columns via pd.to_datetime with
+# the explicit format and the .dt accessors, and the track length with a
+# scalar math haversine applied row by row.
+#
+# Usage (from the src directory):
+#   python -m benchmarks.bench_features StormEvents_cleaned1.csv
+#   python -m benchmarks.bench_features StormEvents_cleaned1.csv --rows 2000000 --json features.json
+
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.features import DATETIME_FORMAT, EARTH_RADIUS_KM, calendar_features, duration_hours, haversine_km
+
+COLUMNS = ['BEGIN_DATE_TIME', 'END_DATE_TIME', 'BEGIN_LAT', 'BEGIN_LON', 'END_LAT', 'END_LON']
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """The notebook's scalar great-circle distance in km (math module, one pair at a time)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _best_of(fn, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _pandas_datetimes(values):
+    # Same century rule as utils.features: two-digit years after this one are 19xx
+    times = pd.to_datetime(values, format=DATETIME_FORMAT, errors='coerce')
+    return times.mask(times.dt.year > pd.Timestamp.now().year, times - pd.DateOffset(years=100))
+
+
+def _pandas_duration(df):
+    begin = _pandas_datetimes(df['BEGIN_DATE_TIME'])
+    end = _pandas_datetimes(df['END_DATE_TIME'])
+    return ((end - begin).dt.total_seconds() / 3600.0).to_numpy()
+
+
+def _pandas_calendar(df):
+    begin = _pandas_datetimes(df['BEGIN_DATE_TIME']).dt
+    return {'YEAR': begin.year, 'MONTH': begin.month, 'DAY_OF_YEAR': begin.dayofyear,
+            'DAY_OF_WEEK': begin.dayofweek, 'HOUR': begin.hour}
+
+
+def _scalar_track_length(df):
+    coords = df[['BEGIN_LAT', 'BEGIN_LON', 'END_LAT', 'END_LON']]
+    return coords.apply(lambda row: haversine(*row), axis=1).to_numpy(dtype=np.float64)
+
+
+def _mismatches(expected, actual):
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    same = np.isclose(actual, expected, rtol=1e-9, atol=1e-9) | (np.isnan(actual) & np.isnan(expected))
+    return int((~same).sum())
+
+
+def run(df, repeat=3):
+    """Time each feature both ways over df (StormEvents COLUMNS); returns a result dict."""
+    results = {'rows': len(df)}
+    cases = {
+        'duration': (lambda: _pandas_duration(df),
+                     lambda: duration_hours(df['BEGIN_DATE_TIME'], df['END_DATE_TIME'])),
+        'calendar': (lambda: _pandas_calendar(df),
+                     lambda: calendar_features(df['BEGIN_DATE_TIME'])),
+        'track_length': (lambda: _scalar_track_length(df),
+                         lambda: haversine_km(df['BEGIN_LAT'], df['BEGIN_LON'], df['END_LAT'], df['END_LON'])),
+    }
+    for name, (baseline, vectorized) in cases.items():
+        baseline_seconds, expected = _best_of(baseline, repeat)
+        vector_seconds, actual = _best_of(vectorized, repeat)
+        if isinstance(expected, dict):
+            mismatches = sum(_mismatches(expected[key], actual[key]) for key in expected)
+        else:
+            mismatches = _mismatches(expected, actual)
+        results[name] = {
+            'baseline_seconds': baseline_seconds,
+            'vectorized_seconds': vector_seconds,
+            'speedup': baseline_seconds / vector_seconds if vector_seconds else float('inf'),
+            'mismatches': mismatches,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_features',
+                                     description='Compare utils.features with the notebook feature engineering.')
+    parser.add_argument('input', help='StormEvents CSV with date/time and coordinate columns')
+    parser.add_argument('--rows', type=int, default=None, help='tile the rows to this many')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', dest='json_path', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.input, usecols=COLUMNS)
+    if args.rows and len(df):
+        repeats = -(-args.rows // len(df))
+        df = pd.concat([df] * repeats, ignore_index=True).iloc[:args.rows]
+
+    r = run(df, repeat=args.repeat)
+    print(f"{r['rows']:,} events")
+    print(f"  {'feature':<14}{'baseline':>10}{'vectorized':>12}{'speedup':>9}{'mismatches':>12}")
+    for name in ('duration', 'calendar', 'track_length'):
+        f = r[name]
+        print(f"  {name:<14}{f['baseline_seconds']:9.3f}s{f['vectorized_seconds']:11.3f}s"
+              f"{f['speedup']:8.1f}x{f['mismatches']:12,}")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(r, f, indent=2)
+    mismatches = sum(r[name]['mismatches'] for name in ('duration', 'calendar', 'track_length'))
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# benchmarks/bench_parallel.py - Batch prediction throughput by worker count
+#
+# Usage (from the src directory):
+#   python -m benchmarks.bench_parallel events.csv --rows 500000 --workers 1 2 4 8 16 32
+
+import argparse
+import json
+import sys
+import time
+
+import pandas as pd
+
+from utils.model_utils import DEFAULT_CHUNK_SIZE, default_model_path, load_model, predict_batch, read_events
+from utils.parallel import ParallelPredictor, default_workers
+
+
+def _scaled_events(path, rows):
+    """Read an events file and tile it to exactly rows rows (if rows is given)."""
+    events = read_events(path)
+    if rows and len(events):
+        repeats = -(-rows // len(events))
+        events = pd.concat([events] * repeats, ignore_index=True).iloc[:rows]
+    return events
+
+
+def run(events, model_path, worker_counts, shard_size, repeat=3):
+    """Time predictions over events for each worker count; returns one dict per count.
+
+    Worker count 1 runs in-process on the cached model (the baseline); the
+    others use a warmed-up ParallelPredictor so pool start-up and model
+    loading are excluded from the timings. The best of repeat runs is kept.
+    """
+    results = []
+    baseline = None
+    for n_workers in worker_counts:
+        if n_workers == 1:
+            model = load_model(model_path)
+            predict = lambda: predict_batch(model, events, chunk_size=shard_size)
+            close = lambda: None
+        else:
+            predictor = ParallelPredictor(model_path, n_workers=n_workers, shard_size=shard_size)
+            predictor.warm_up()
+            predict, close = (lambda: predictor.predict_damage(events)), predictor.close
+        try:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                predict()
+                best = min(best, time.perf_counter() - start)
+        finally:
+            close()
+
+        rows_per_second = len(events) / best
+        if baseline is None:
+            baseline = rows_per_second
+        results.append({
+            'workers': n_workers,
+            'rows': len(events),
+            'seconds': best,
+            'rows_per_second': rows_per_second,
+            'speedup': rows_per_second / baseline,
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_parallel',
+                                     description='Measure batch prediction scaling by worker count.')
+    parser.add_argument('input', help='.csv or .parquet file of storm events')
+    parser.add_argument('--model', default=None, help='model file (default: the up-to-date model in src/)')
+    parser.add_argument('--rows', type=int, default=None, help='tile the input to this many rows')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='worker counts to try (default: 1, 2, 4, ... up to the core count)')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', dest='json_path', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    worker_counts = args.workers
+    if not worker_counts:
+        worker_counts, n = [], 1
+        while n < default_workers():
+            worker_counts.append(n)
+            n *= 2
+        worker_counts.append(default_workers())
+    if worker_counts[0] != 1:
+        worker_counts = [1] + worker_counts
+
+    events = _scaled_events(args.input, args.rows)
+    results = run(events, args.model or default_model_path(), worker_counts, args.shard_size, repeat=args.repeat)
+
+    print(f"{'workers':>8} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+    for r in results:
+        print(f"{r['workers']:>8} {r['seconds']:>9.3f} {r['rows_per_second']:>12,.0f} {r['speedup']:>7.2f}x")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# benchmarks/import_profile.py - Cold-start import cost of the app pages and service modules
+#
+# Each target is imported in a fresh interpreter (python -X importtime), so
+# nothing is shared between measurements. For a page, its top-level import
+# statements are executed (not the page body, which needs a Streamlit
+# session); with --run the whole page is also executed once through
+# Streamlit's AppTest, to include the model and data a page loads.
+# Reported per target: import wall time, resident memory added, which heavy
+# libraries got loaded and the packages that took the most time.
+#
+# Usage (from the src directory):
+#   python -m benchmarks.import_profile
+#   python -m benchmarks.import_profile --run --json imports-new.json --compare imports-old.json
+
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+from utils.memory import format_bytes
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+# Modules a page or service should only pay for when it needs them
+HEAVY_MODULES = ('numpy', 'pandas', 'pyarrow', 'joblib', 'sklearn', 'scipy', 'matplotlib', 'seaborn', 'plotly')
+
+# Other modules profiled besides the pages
+DEFAULT_MODULES = ('utils.model_utils', 'utils.service')
+
+# Runs in the child interpreter: argv[1] is the code to profile, argv[2] the page to run (or '')
+_CHILD = '''
+import json, sys, time
+from utils.memory import current_rss_bytes
+rss_before = current_rss_bytes()
+start = time.perf_counter()
+exec(compile(sys.argv[1], '<imports>', 'exec'), {'__name__': '__profile__'})
+seconds = time.perf_counter() - start
+rss_imports = current_rss_bytes()
+result = {'import_seconds': seconds, 'import_rss_bytes': rss_imports - rss_before,
+          'loaded': [m for m in sys.argv[3].split(',') if m in sys.modules]}
+if sys.argv[2]:
+    from streamlit.testing.v1 import AppTest
+    start = time.perf_counter()
+    at = AppTest.from_file(sys.argv[2], default_timeout=300)
+    at.run()
+    result['run_seconds'] = time.perf_counter() - start
+    result['run_rss_bytes'] = current_rss_bytes() - rss_before
+    result['run_exceptions'] = len(at.exception)
+    result['loaded_after_run'] = [m for m in sys.argv[3].split(',') if m in sys.modules]
+print(json.dumps(result))
+'''
+
+
+def page_imports(path):
+    """Return the source of the top-level import statements of a page script."""
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    tree = ast.parse(source, filename=path)
+    lines = [ast.get_source_segment(source, node) for node in tree.body
+             if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return '\n'.join(lines)
+
+
+def find_pages(src_dir=SRC_DIR):
+    """The app's entry script followed by its pages, in navigation order."""
+    return sorted(glob.glob(os.path.join(src_dir, '[0-9]*.py'))) + \
+        sorted(glob.glob(os.path.join(src_dir, 'pages', '[0-9]*.py')))
+
+
+def _package_times(importtime_log, top=5):
+    """Sum the self time of every imported module by top-level package (-X importtime output)."""
+    totals = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, _, name = line[len('import time:'):].split('|', 2)
+            package = name.strip().split('.')[0]
+            totals[package] = totals.get(package, 0) + int(self_us)
+        except ValueError:
+            continue
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {package: us / 1e6 for package, us in ranked}
+
+
+def profile_target(code, run_page=None, src_dir=SRC_DIR):
+    """Execute code (import statements) in a fresh interpreter and return its import cost."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _CHILD, code, run_page or '', ','.join(HEAVY_MODULES)],
+        cwd=src_dir, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f'profiling failed:\n{proc.stderr[-2000:]}')
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['slowest_packages'] = _package_times(proc.stderr)
+    return result
+
+
+def run_profile(modules=DEFAULT_MODULES, run_pages=False, src_dir=SRC_DIR):
+    results = {'baseline': profile_target('import streamlit', src_dir=src_dir)}
+    for path in find_pages(src_dir):
+        name = os.path.relpath(path, src_dir)
+        results[name] = profile_target(page_imports(path), run_page=path if run_pages else None, src_dir=src_dir)
+    for module in modules:
+        results[module] = profile_target(f'import {module}', src_dir=src_dir)
+    return results
+
+
+def print_report(results, out=sys.stdout):
+    print(f"{'target':<26} {'imports':>9} {'+RSS':>10}  heavy modules loaded", file=out)
+    for name, r in results.items():
+        print(f"{name:<26} {r['import_seconds']:>8.3f}s {format_bytes(r['import_rss_bytes']):>10}  "
+              f"{', '.join(r['loaded']) or '-'}", file=out)
+        if 'run_seconds' in r:
+            print(f"{'  after running the page':<26} {r['run_seconds']:>8.3f}s {format_bytes(r['run_rss_bytes']):>10}  "
+                  f"{', '.join(r['loaded_after_run']) or '-'}"
+                  + (f"  ({r['run_exceptions']} exceptions)" if r['run_exceptions'] else ''), file=out)
+    print("\nSlowest packages to import (self time)", file=out)
+    for name, r in results.items():
+        slowest = ', '.join(f'{package} {seconds * 1000:.0f}ms' for package, seconds in r['slowest_packages'].items())
+        print(f"  {name:<24} {slowest}", file=out)
+
+
+def compare(old, new, out=sys.stdout):
+    """Print the import time and memory change of every target present in both runs."""
+    print("\nCompared with the earlier run:", file=out)
+    for name in new:
+        if name not in old:
+            continue
+        before, after = old[name], new[name]
+        print(f"  {name:<24} {before['import_seconds']:>7.3f}s -> {after['import_seconds']:>7.3f}s  "
+              f"{format_bytes(before['import_rss_bytes']):>10} -> {format_bytes(after['import_rss_bytes']):>10}",
+              file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.import_profile',
+                                     description='Profile the cold-start import cost of the app pages.')
+    parser.add_argument('--module', action='append', dest='modules',
+                        help=f'module to profile besides the pages (repeatable; default: {", ".join(DEFAULT_MODULES)})')
+    parser.add_argument('--run', action='store_true',
+                        help='also execute each page once (needs the model and dataset in place)')
+    parser.add_argument('--json', dest='json_path', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    args = parser.parse_args(argv)
+
+    try:
+        results = run_profile(args.modules or DEFAULT_MODULES, run_pages=args.run)
+    except RuntimeError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    print_report(results)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
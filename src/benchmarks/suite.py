@@ -0,0 +1,254 @@
+# benchmarks/suite.py - Prediction latency/throughput, model load and dataset load benchmarks
+#
+# Runs on synthetic events (utils.synthetic), so no dataset is needed for
+# the model benchmarks. Results can be written to JSON and compared with an
+# earlier run to spot regressions between commits.
+#
+# Usage (from the src directory):
+#   python -m benchmarks.suite --json bench-$(git rev-parse --short HEAD).json
+#   python -m benchmarks.suite --max-rows 100000 --compare bench-old.json
+#   python -m benchmarks.suite --model damage_model_pipeline.pkl --data StormEvents_cleaned1.csv
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils.memory import current_rss_bytes, format_bytes, peak_rss_bytes
+from utils.model_utils import (
+    PredictionCache,
+    cached_prediction,
+    clear_model_cache,
+    default_model_path,
+    get_model_info,
+    load_model,
+    make_prediction,
+    postprocess_prediction,
+    predict_batch,
+)
+from utils.synthetic import generate_events
+
+SUITE_VERSION = 1
+
+# Metrics where a larger value is better (for --compare); all others are times
+_HIGHER_IS_BETTER = ('rows_per_second',)
+
+
+def _percentiles(samples):
+    ms = 1000 * np.asarray(samples)
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+        'samples': len(ms),
+    }
+
+
+def bench_model_load(model_path, repeat=3):
+    """Time loading the model file into the registry (cold, i.e. not cached in-process)."""
+    seconds = []
+    for _ in range(repeat):
+        clear_model_cache(model_path)
+        start = time.perf_counter()
+        load_model(model_path)
+        seconds.append(time.perf_counter() - start)
+    info = get_model_info(model_path)
+    return {
+        # The first load also pays for importing the model's libraries
+        'first_seconds': seconds[0],
+        'best_seconds': min(seconds),
+        'mean_seconds': float(np.mean(seconds)),
+        'file_bytes': info['file_bytes'],
+        'model_type': info['model_type'],
+    }
+
+
+def bench_single_row(model_path, n=500, seed=1):
+    """Single-event latency of make_prediction and of the Assess Risk page path.
+
+    The page path is cached_prediction(): 'miss' scores a new event (as on
+    a first submit), 'hit' repeats one (as on a rerun with the same input).
+    """
+    model = load_model(model_path)
+    events = generate_events(n, seed=seed).to_dict(orient='records')
+    make_prediction(model, events[0])  # warm up
+
+    raw = []
+    for event in events:
+        start = time.perf_counter()
+        postprocess_prediction(make_prediction(model, event))
+        raw.append(time.perf_counter() - start)
+
+    cache = PredictionCache(maxsize=2 * n)
+    miss, hit = [], []
+    for event in events:
+        start = time.perf_counter()
+        cached_prediction(model_path, event, cache=cache)
+        miss.append(time.perf_counter() - start)
+    for event in events:
+        start = time.perf_counter()
+        cached_prediction(model_path, event, cache=cache)
+        hit.append(time.perf_counter() - start)
+    return {
+        'make_prediction': _percentiles(raw),
+        'assess_risk_miss': _percentiles(miss),
+        'assess_risk_hit': _percentiles(hit),
+    }
+
+
+def bench_throughput(model_path, sizes, min_seconds=0.5, seed=2):
+    """rows/s of predict_batch for each batch size (repeated until min_seconds elapsed)."""
+    model = load_model(model_path)
+    results = []
+    for size in sizes:
+        events = generate_events(size, seed=seed)
+        predict_batch(model, events.iloc[:1])
+        rss_before = current_rss_bytes()
+        runs, elapsed = 0, 0.0
+        while elapsed < min_seconds or runs == 0:
+            start = time.perf_counter()
+            predict_batch(model, events)
+            elapsed += time.perf_counter() - start
+            runs += 1
+        results.append({
+            'rows': size,
+            'runs': runs,
+            'seconds_per_batch': elapsed / runs,
+            'rows_per_second': size * runs / elapsed,
+            'rss_growth_bytes': max(current_rss_bytes() - rss_before, 0),
+        })
+    return results
+
+
+def bench_dataset_load(data_path):
+    """Time loading the dataset from CSV (cold cache) and from the Feather cache (warm)."""
+    from utils.data_utils import load_dataset
+
+    cache_dir = tempfile.mkdtemp(prefix='storm-bench-')
+    try:
+        start = time.perf_counter()
+        df = load_dataset(data_path, cache_dir=cache_dir, remote_url=None)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        load_dataset(data_path, cache_dir=cache_dir, remote_url=None)
+        warm = time.perf_counter() - start
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return {'rows': len(df), 'cold_seconds': cold, 'warm_seconds': warm}
+
+
+def _environment(model_path):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    info = get_model_info(model_path) or {}
+    return {
+        'suite_version': SUITE_VERSION,
+        'commit': commit,
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'model_path': os.path.abspath(model_path),
+        'model_sha256': info.get('sha256'),
+    }
+
+
+def run_suite(model_path, sizes, data_path=None, latency_samples=500):
+    results = {'environment': None}
+    results['model_load'] = bench_model_load(model_path)
+    results['environment'] = _environment(model_path)
+    results['single_row'] = bench_single_row(model_path, n=latency_samples)
+    results['throughput'] = bench_throughput(model_path, sizes)
+    if data_path and os.path.exists(data_path):
+        results['dataset_load'] = bench_dataset_load(data_path)
+    results['peak_rss_bytes'] = peak_rss_bytes()
+    return results
+
+
+def _flatten(results):
+    """Map 'section.metric' -> value for the numeric results (for --compare)."""
+    flat = {}
+    for key, value in results.get('model_load', {}).items():
+        if key.endswith('seconds'):
+            flat[f'model_load.{key}'] = value
+    for path, stats in results.get('single_row', {}).items():
+        for key in ('p50_ms', 'p99_ms'):
+            flat[f'single_row.{path}.{key}'] = stats[key]
+    for row in results.get('throughput', []):
+        flat[f"throughput.{row['rows']}.rows_per_second"] = row['rows_per_second']
+    for key, value in results.get('dataset_load', {}).items():
+        if key.endswith('seconds'):
+            flat[f'dataset_load.{key}'] = value
+    return flat
+
+
+def compare(old, new, out=sys.stdout):
+    """Print the change of every metric present in both result sets (+ = better)."""
+    old_flat, new_flat = _flatten(old), _flatten(new)
+    print(f"\nCompared with {old['environment'].get('commit') or 'previous run'}:", file=out)
+    for key in sorted(set(old_flat) & set(new_flat)):
+        before, after = old_flat[key], new_flat[key]
+        if not before or not after:
+            continue
+        higher_better = key.endswith(_HIGHER_IS_BETTER)
+        gain = (after / before - 1) if higher_better else (before / after - 1)
+        print(f"  {key:<45} {before:>12.4g} -> {after:>12.4g}  {gain:+7.1%}", file=out)
+
+
+def print_report(results, out=sys.stdout):
+    load = results['model_load']
+    print(f"Model load      {load['first_seconds']:.3f}s first, {load['best_seconds']:.3f}s best of 3 ({load['model_type']}, "
+          f"{format_bytes(load['file_bytes'])})", file=out)
+    print("Single-row latency (ms)        p50      p99", file=out)
+    for path, stats in results['single_row'].items():
+        print(f"  {path:<24} {stats['p50_ms']:>8.3f} {stats['p99_ms']:>8.3f}", file=out)
+    print("Batch throughput", file=out)
+    for row in results['throughput']:
+        print(f"  {row['rows']:>9,} rows  {row['rows_per_second']:>14,.0f} rows/s", file=out)
+    if 'dataset_load' in results:
+        d = results['dataset_load']
+        print(f"Dataset load    {d['rows']:,} rows: CSV {d['cold_seconds']:.3f}s, "
+              f"cached {d['warm_seconds']:.3f}s", file=out)
+    print(f"Peak RSS        {format_bytes(results['peak_rss_bytes'])}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite',
+                                     description='Benchmark prediction latency, throughput, model and dataset loading.')
+    parser.add_argument('--model', default=None, help='model file (default: the up-to-date model in src/)')
+    parser.add_argument('--data', default=None, help='StormEvents CSV to time loading (default: skip)')
+    parser.add_argument('--max-rows', type=int, default=1_000_000,
+                        help='largest batch size; sizes are powers of ten from 1 (default: 1000000)')
+    parser.add_argument('--latency-samples', type=int, default=500)
+    parser.add_argument('--json', dest='json_path', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    args = parser.parse_args(argv)
+
+    model_path = args.model or default_model_path()
+    if not os.path.exists(model_path):
+        print(f'error: model file not found: {model_path}', file=sys.stderr)
+        return 1
+    sizes = [10 ** k for k in range(0, 7) if 10 ** k <= args.max_rows]
+    results = run_suite(model_path, sizes, data_path=args.data, latency_samples=args.latency_samples)
+    print_report(results)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,53 +1,51 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
+
+from utils.data_utils import dataset_signature
+from utils.figures import cached_figure, render_correlation, render_event_counts
+from utils.ingest import load_store_stats, store_signature
+from utils.instrumentation import stage
+from utils.model_utils import MONTHS
+from utils.stats_cache import load_stats
 
 # Set the page config for better layout
 st.set_page_config(page_title="Storm Damage Prediction Statistics", layout="wide")
 
-# Set a beautiful seaborn style
-sns.set_style("whitegrid")
-plt.rcParams['font.size'] = 12
-plt.rcParams['axes.titlesize'] = 16
-plt.rcParams['axes.labelsize'] = 14
-plt.rcParams['xtick.labelsize'] = 11
-plt.rcParams['ytick.labelsize'] = 11
-plt.rcParams['legend.fontsize'] = 12
-
 # Set the title of the page
 st.title("🌪️ Storm Damage Prediction Statistics")
 
-# Load the dataset
+# Load the precomputed aggregates (rebuilt from the dataset only when it changes).
+# Once events have been ingested into the partitioned store (python -m utils.ingest),
+# its incrementally merged aggregates are used instead of the single CSV.
 @st.cache_data
-def load_data():
-    df = pd.read_csv('https://raw.githubusercontent.com/NMAnuda/storm-damage-prediction-app/refs/heads/main/src/StormEvents_cleaned1.csv')
-    # Convert DAMAGE_PROPERTY to numeric (assuming format like '10.00K' meaning 10,000 USD)
-    if 'DAMAGE_PROPERTY' in df.columns:
-        df['DAMAGE_PROPERTY'] = pd.to_numeric(
-            df['DAMAGE_PROPERTY'].astype(str).str.replace('K', '').str.replace('$', '').str.strip(), 
-            errors='coerce'
-        ) * 1000
-    return df
+def load_data(signature, from_store):
+    return load_store_stats() if from_store else load_stats()
 
-df = load_data()
+try:
+    with stage('statistics.load_data'):
+        data_version = store_signature()
+        if data_version is not None:
+            stats = load_data(data_version, True)
+        else:
+            data_version = dataset_signature()
+            stats = load_data(data_version, False)
+except FileNotFoundError as e:
+    st.error(f"Dataset not available: {e}")
+    st.stop()
 
 # Display basic statistics
 st.header("📊 Basic Statistics")
 st.write("Here are some basic statistics about the storm damage dataset:")
 col1, col2 = st.columns(2)
 with col1:
-    st.metric("Total Events", f"{len(df):,}")
-    if 'DAMAGE_PROPERTY' in df.columns:
-        st.metric("Avg Property Damage", f"${df['DAMAGE_PROPERTY'].mean()/1000 :,.0f}K")
+    st.metric("Total Events", f"{stats['rows']:,}")
+    if stats['avg_property_damage'] is not None:
+        st.metric("Avg Property Damage", f"${stats['avg_property_damage']/1000 :,.0f}K")
 with col2:
-    if 'DAMAGE_PROPERTY' in df.columns:
-        st.metric("Max Damage", f"${df['DAMAGE_PROPERTY'].max()/1000 :,.0f}K")
-    st.metric("Unique States", df['STATE'].nunique() if 'STATE' in df.columns else 0)
-numeric_cols = df.select_dtypes(include=[np.number])
-if not numeric_cols.empty:
-    st.dataframe(numeric_cols.describe().style.format("{:.2f}").background_gradient(cmap='viridis'), use_container_width=True)
+    if stats['max_property_damage'] is not None:
+        st.metric("Max Damage", f"${stats['max_property_damage']/1000 :,.0f}K")
+    st.metric("Unique States", stats['unique_states'])
+if stats['describe'] is not None:
+    st.dataframe(stats['describe'].style.format("{:.2f}").background_gradient(cmap='viridis'), use_container_width=True)
 else:
     st.warning("No numeric columns found for description.")
 
@@ -56,43 +54,32 @@ st.header("📈 Visualizations")
 
 
 # Event Type Count - Limit to top 10 for better visualization
-if 'EVENT_TYPE' in df.columns:
+if stats['event_counts'] is not None:
     st.subheader("Top 10 Storm Event Types")
-    event_counts = df['EVENT_TYPE'].value_counts().head(10)
-    fig, ax = plt.subplots(figsize=(12, 8))
-    colors = sns.color_palette("viridis", len(event_counts))
-    sns.barplot(y=event_counts.index, x=event_counts.values, ax=ax, palette=colors)
-    ax.set_title("Top 10 Storm Event Types by Count", fontsize=18, fontweight='bold', pad=20)
-    ax.set_xlabel("Count", fontsize=14)
-    ax.set_ylabel("Event Type", fontsize=14)
-    ax.grid(True, alpha=0.3, axis='x')
-    for spine in ax.spines.values():
-        spine.set_visible(False)
-    ax.spines['left'].set_visible(True)
-    ax.spines['left'].set_color('gray')
-    ax.spines['left'].set_linewidth(0.5)
-    # Add value labels on bars
-    for i, v in enumerate(event_counts.values):
-        ax.text(v + max(event_counts.values) * 0.01, i, str(v), va='center', fontsize=11)
-    st.pyplot(fig)
+    # Charts are rendered once per dataset version and served as cached PNG bytes
+    with stage('statistics.figures'):
+        st.image(cached_figure('event_counts', data_version, render_event_counts, stats['event_counts']))
 
 # Correlation Heatmap
-numeric_df = df.select_dtypes(include=[np.number])
-if not numeric_df.empty and len(numeric_df.columns) > 1:
+correlation_matrix = stats['correlation']
+if correlation_matrix is not None:
     st.subheader("Feature Correlation Heatmap")
-    correlation_matrix = numeric_df.corr()
-    fig, ax = plt.subplots(figsize=(14, 12))
-    mask = np.triu(np.ones_like(correlation_matrix, dtype=bool))
-    sns.heatmap(correlation_matrix, annot=True, fmt=".2f", cmap='coolwarm', center=0, 
-                square=True, ax=ax, cbar_kws={'shrink': 0.8}, mask=mask,
-                annot_kws={"fontsize": 8})
-    ax.set_title("Feature Correlation Heatmap", fontsize=18, fontweight='bold', pad=20)
-    plt.xticks(rotation=45, ha='right')
-    plt.yticks(rotation=0)
-    st.pyplot(fig)
+    with stage('statistics.figures'):
+        st.image(cached_figure('correlation', data_version, render_correlation, correlation_matrix))
 else:
     st.warning("Insufficient numeric columns for correlation heatmap.")
 
+# Damage totals
+if stats['damage_by_state'] is not None:
+    st.subheader("Total Property Damage by State (Top 15)")
+    st.bar_chart(stats['damage_by_state'].head(15).rename("Property Damage (USD)"))
+if stats['damage_by_month'] is not None:
+    st.subheader("Total Property Damage by Month")
+    by_month = stats['damage_by_month'].rename("Property Damage (USD)")
+    # Keep calendar order instead of the chart's alphabetical default
+    by_month.index = [f"{MONTHS.index(m) + 1:02d} {m}" if m in MONTHS else m for m in by_month.index]
+    st.bar_chart(by_month)
+
 # Conclusion
 st.header("Insights")
 st.write("The statistics and visualizations above provide valuable insights into the storm damage dataset, highlighting key patterns in event types, damage distributions, and feature relationships to better understand factors affecting storm damage predictions.")
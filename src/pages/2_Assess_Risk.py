@@ -1,10 +1,22 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import joblib
-import os
 from datetime import datetime
 
+from utils.features import duration_hours as event_duration_hours
+from utils.model_utils import (
+    EVENT_TYPES,
+    MAGNITUDE_TYPES,
+    MONTHS,
+    PREDICTION_CACHE,
+    STATES,
+    cached_prediction,
+    default_model_path,
+    get_model_info,
+    load_model,
+)
+from utils.memory import format_bytes
+from utils import instrumentation
+from utils.instrumentation import stage
+
 # Page configuration
 st.set_page_config(page_title="Assess Storm Damage Risk", layout="wide")
 
@@ -97,10 +109,11 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Load the trained model
-model_path = os.path.join(os.path.dirname(__file__), '..', 'damage_model_pipeline.pkl')
+# Load the trained model (cached process-wide, shared by all sessions); the
+# flat array export is preferred when it is up to date with the pipeline
+model_path = default_model_path()
 try:
-    model = joblib.load(model_path)
+    model = load_model(model_path)
 except FileNotFoundError:
     st.error("Model file not found. Please ensure 'damage_model_pipeline.pkl' is in the correct location.")
     st.stop()
@@ -133,32 +146,39 @@ with st.sidebar:
     - Use realistic coordinates (e.g., lat: 39.74, lon: -104.99 for Denver)  
     - Ensure end time is after begin time  
     """)
+    model_info = get_model_info(model_path)
+    if model_info:
+        st.caption(
+            f"Model loaded in {model_info['load_seconds']:.2f}s "
+            f"({format_bytes(model_info['memory_bytes'])} resident)"
+        )
+    cache_stats = PREDICTION_CACHE.stats()
+    st.caption(
+        f"Prediction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['size']} cached)"
+    )
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Input form with better layout to prevent overflow
 st.markdown('<div class="input-section">', unsafe_allow_html=True)
 st.subheader("Enter Storm Event Details")
 
-# You may want to load these from your CSV for consistency
-states = ["AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", "HI", "ID", "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY"]
-event_types = ["Flood", "Hurricane", "Tornado", "Thunderstorm", "Winter Storm"]
-months = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
-magnitude_types = ['EG', 'MG', 'None']
-
+# Form choices (STATES, EVENT_TYPES, ...) live in utils/model_utils.py, shared with the
+# synthetic event generator used by the benchmarks
 with st.form("risk_form", clear_on_submit=False):
     # Row 1: State, Event Type, Month
     col1_row1, col2_row1, col3_row1 = st.columns(3)
     with col1_row1:
-        state = st.selectbox("State", options=states, help="Select the affected state")
+        state = st.selectbox("State", options=STATES, help="Select the affected state")
     with col2_row1:
-        event_type = st.selectbox("Event Type", options=event_types, help="Type of storm event")
+        event_type = st.selectbox("Event Type", options=EVENT_TYPES, help="Type of storm event")
     with col3_row1:
-        month_name = st.selectbox("Month", options=months, help="Month of the event")
+        month_name = st.selectbox("Month", options=MONTHS, help="Month of the event")
     
     # Row 2: Magnitude Type, Magnitude
     col1_row2, col2_row2 = st.columns(2)
     with col1_row2:
-        magnitude_type = st.selectbox("Magnitude Type", options=magnitude_types, help="Type of magnitude measurement")
+        magnitude_type = st.selectbox("Magnitude Type", options=MAGNITUDE_TYPES, help="Type of magnitude measurement")
     with col2_row2:
         magnitude = st.number_input("Magnitude (mph)", min_value=0.0, max_value=300.0, value=50.0, step=0.1, help="Storm intensity in miles per hour")
     
@@ -191,14 +211,15 @@ st.markdown('</div>', unsafe_allow_html=True)
 # Process submission
 if submitted:
     with st.spinner("Analyzing storm risk..."):
-        begin_datetime = datetime.combine(begin_date, begin_time)
-        end_datetime = datetime.combine(end_date, end_time)
-        duration_hours = (end_datetime - begin_datetime).total_seconds() / 3600.0
+        # Same DURATION_HOURS computation as training (utils/features.py)
+        duration_hours = float(event_duration_hours(
+            datetime.combine(begin_date, begin_time), datetime.combine(end_date, end_time)
+        ))
         
         if duration_hours < 0:
             st.error("❌ End date/time must be after begin date/time.")
         else:
-            input_data = pd.DataFrame([{
+            input_data = {
                 "STATE": state,
                 "EVENT_TYPE": event_type,
                 "MONTH_NAME": month_name,
@@ -207,40 +228,59 @@ if submitted:
                 "BEGIN_LAT": begin_lat,
                 "BEGIN_LON": begin_lon,
                 "DURATION_HOURS": duration_hours
-            }])
+            }
             
             try:
-                pred_log = model.predict(input_data)
-                pred_log = np.clip(pred_log, 0, None)
-                prediction = np.expm1(pred_log)[0]
+                # Repeated what-if inputs are answered from the shared prediction cache
+                with stage('assess_risk.predict'):
+                    prediction = cached_prediction(model_path, input_data)
+                instrumentation.memory_snapshot('assess_risk.after_predict')
                 
                 # Display prediction in a professional card with two decimal places
-                st.markdown(
-                    f"""
-                    <div class="prediction-card">
-                        <h2 style="color:#1f2937; margin-bottom:1rem;">✅ Prediction Results</h2>
-                        <div class="prediction-value">${prediction:,.2f}K USD</div>
-                        <p style="color:#6b7280; font-size:1.1rem;">Estimated Property Damage</p>
-                        <p style="color:#4f46e5; font-weight:500;">Based on provided storm parameters</p>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+                with stage('assess_risk.render'):
+                    st.markdown(
+                        f"""
+                        <div class="prediction-card">
+                            <h2 style="color:#1f2937; margin-bottom:1rem;">✅ Prediction Results</h2>
+                            <div class="prediction-value">${prediction:,.2f}K USD</div>
+                            <p style="color:#6b7280; font-size:1.1rem;">Estimated Property Damage</p>
+                            <p style="color:#4f46e5; font-weight:500;">Based on provided storm parameters</p>
+                        </div>
+                        """,
+                        unsafe_allow_html=True
+                    )
                 
-                # Optional: Show input summary
-                with st.expander("📋 Input Summary", expanded=False):
-                    st.json({
-                        "State": state,
-                        "Event Type": event_type,
-                        "Month": month_name,
-                        "Magnitude": f"{magnitude} mph ({magnitude_type})",
-                        "Location": f"Lat: {begin_lat}, Lon: {begin_lon}",
-                        "Duration": f"{duration_hours:.1f} hours"
-                    })
+                    # Optional: Show input summary
+                    with st.expander("📋 Input Summary", expanded=False):
+                        st.json({
+                            "State": state,
+                            "Event Type": event_type,
+                            "Month": month_name,
+                            "Magnitude": f"{magnitude} mph ({magnitude_type})",
+                            "Location": f"Lat: {begin_lat}, Lon: {begin_lon}",
+                            "Duration": f"{duration_hours:.1f} hours"
+                        })
                     
             except Exception as e:
                 st.error(f"❌ Prediction failed: {str(e)}")
 
+# Hidden diagnostics panel: open the page with ?diagnostics=1 (timings need STORM_INSTRUMENTATION=1)
+if st.query_params.get("diagnostics") in ("1", "true"):
+    with st.expander("🔧 Diagnostics", expanded=True):
+        diagnostics = instrumentation.snapshot()
+        if not diagnostics['enabled']:
+            st.info("Stage timing is off. Start the app with STORM_INSTRUMENTATION=1 to record it.")
+        if diagnostics['stages']:
+            st.dataframe(
+                [{"stage": name, **{k: round(v, 6) if isinstance(v, float) else v for k, v in values.items()}}
+                 for name, values in sorted(diagnostics['stages'].items())],
+                use_container_width=True,
+            )
+        st.caption(
+            f"RSS {format_bytes(diagnostics['rss_bytes'])}, peak {format_bytes(diagnostics['peak_rss_bytes'])}"
+        )
+        st.code(instrumentation.prometheus_text(), language="text")
+
 # Footer
 st.markdown("---")
 col_footer1, col_footer2 = st.columns([3, 1])
@@ -1,4 +1,8 @@
 import streamlit as st
+import os
+from datetime import datetime
+
+from utils.evaluation import load_report
 
 # Set the page title and layout
 st.set_page_config(page_title="About the Storm Damage Prediction Model", layout="wide")
@@ -40,6 +44,57 @@ st.write(
     "5. Evaluation: Assessing model performance using cross-validation and various metrics."
 )
 
+# Evaluation: the report saved next to the model by utils.train / utils.evaluation (nothing is recomputed here)
+st.header("Model Evaluation")
+report = load_report()
+if report is None or report["metrics"] is None:
+    st.info(
+        "No evaluation report found for the model. Train it with `python -m utils.train ... --output "
+        "damage_model_pipeline.pkl` or run `python -m utils.evaluation <test CSV>` to create one."
+    )
+else:
+    metrics = report["metrics"]
+    meta = report.get("meta", {})
+    source = os.path.basename(meta["data"]) if meta.get("data") else "unknown data"
+    split = " (held-out test split)" if meta.get("split") == "test" else ""
+    st.caption(
+        f"{metrics['rows']:,} events from {source}{split}, evaluated "
+        f"{datetime.fromtimestamp(report['created_at']):%Y-%m-%d %H:%M}."
+    )
+    if report["stale"]:
+        st.warning("The model file has changed since this report was written.")
+
+    def percent(value):
+        return "n/a" if value is None else f"{value * 100:.1f}%"
+
+    def usd(value):
+        return f"{'-' if value < 0 else ''}${abs(value):,.0f}"
+
+    cols = st.columns(4)
+    cols[0].metric("MAE", usd(metrics["MAE"]))
+    cols[1].metric("MedAE", usd(metrics["MedAE"]))
+    cols[2].metric("RMSE", usd(metrics["RMSE"]))
+    cols[3].metric("RMSLE", f"{metrics['RMSLE']:.3f}")
+    cols = st.columns(4)
+    cols[0].metric("MAPE", percent(metrics["MAPE"]))
+    cols[1].metric("SMAPE", percent(metrics["SMAPE"]))
+    cols[2].metric("WAPE", percent(metrics["WAPE"]))
+    cols[3].metric("Mean residual", usd(metrics["bias"]))
+
+    st.subheader("Residual quantiles (predicted - actual, USD)")
+    st.table({f"{float(q) * 100:g}%": [f"{value:,.0f}"] for q, value in report["residual_quantiles"].items()})
+
+    for column, label in (("EVENT_TYPE", "Event Type"), ("STATE", "State")):
+        rows = report["breakdowns"].get(column)
+        if rows:
+            with st.expander(f"📋 Metrics by {label}", expanded=False):
+                st.dataframe(
+                    [{label: row[column], "Events": row["rows"],
+                      **{name: row[name] for name in ("MAE", "MedAE", "RMSE", "RMSLE", "WAPE")}}
+                     for row in rows],
+                    use_container_width=True,
+                )
+
 # Acknowledgments
 st.header("Acknowledgments")
 st.write(
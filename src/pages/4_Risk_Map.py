@@ -0,0 +1,85 @@
+import streamlit as st
+import numpy as np
+import plotly.graph_objects as go
+
+from utils.instrumentation import stage
+from utils.model_utils import EVENT_TYPES, MAGNITUDE_TYPES, MONTHS, STATES, default_model_path
+from utils.risk_surface import MAX_LEVEL, DEFAULT_STEP, compute_surface, make_scenario
+
+# Set the page config for better layout
+st.set_page_config(page_title="Storm Damage Risk Map", layout="wide")
+
+st.title("🗺️ Storm Damage Risk Map")
+st.write(
+    "Predicted property damage across the contiguous US for one storm scenario. "
+    "Every grid point is scored by the same model as the Assess Risk page, using the "
+    "state nearest to the point unless a state is fixed below."
+)
+
+# Scenario: everything except the location
+with st.form("risk_map_form"):
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        event_type = st.selectbox("Event Type", options=EVENT_TYPES)
+        month_name = st.selectbox("Month", options=MONTHS)
+    with col2:
+        magnitude_type = st.selectbox("Magnitude Type", options=MAGNITUDE_TYPES)
+        magnitude = st.number_input("Magnitude (mph)", min_value=0.0, max_value=300.0, value=50.0, step=0.1)
+    with col3:
+        duration_hours = st.number_input("Duration (hours)", min_value=0.0, max_value=720.0, value=1.0, step=0.5)
+        state = st.selectbox("State", options=["Nearest to each point"] + STATES)
+    level = st.select_slider(
+        "Grid detail",
+        options=list(range(MAX_LEVEL)),
+        format_func=lambda lvl: f"{DEFAULT_STEP / 2 ** lvl:g}°",
+        help="Finer grids reuse the coarser ones already computed and only score the points in between",
+    )
+    log_scale = st.checkbox("Logarithmic colour scale", value=True)
+    st.form_submit_button("🗺️ Draw Map", use_container_width=True, type="primary")
+
+scenario = make_scenario(
+    EVENT_TYPE=event_type,
+    MONTH_NAME=month_name,
+    MAGNITUDE=magnitude,
+    MAGNITUDE_TYPE=magnitude_type,
+    DURATION_HOURS=duration_hours,
+    STATE=None if state not in STATES else state,
+)
+
+# Grids are cached on disk per model and scenario, so a repeated scenario is only read back.
+# Scored in-process: a process pool forked from the server per request costs more than it saves.
+try:
+    with st.spinner("Scoring the grid..."), stage('risk_map.surface'):
+        surface = compute_surface(scenario, level, model_path=default_model_path(), n_workers=1)
+except FileNotFoundError:
+    st.error("Model file not found. Please ensure 'damage_model_pipeline.pkl' is in the correct location.")
+    st.stop()
+
+damage = surface['damage']
+if surface['computed_points']:
+    st.caption(f"Scored {surface['computed_points']:,} grid points in {surface['seconds']:.2f}s.")
+else:
+    st.caption(f"{damage.size:,} grid points served from the cache.")
+
+with stage('risk_map.render'):
+    z = np.log10(damage + 1.0) if log_scale else damage
+    colorbar = {'title': 'Damage'}
+    if log_scale:
+        ticks = np.arange(np.floor(z.min()), np.ceil(z.max()) + 1)
+        colorbar.update(tickvals=ticks, ticktext=[f"{10 ** t:,.0f}" for t in ticks])
+    fig = go.Figure(go.Heatmap(
+        x=surface['lons'], y=surface['lats'], z=z, customdata=damage,
+        colorscale='YlOrRd', colorbar=colorbar,
+        hovertemplate="Lat %{y:.2f}, Lon %{x:.2f}<br>Predicted damage %{customdata:,.2f}<extra></extra>",
+    ))
+    fig.update_layout(
+        height=650, margin=dict(l=0, r=0, t=30, b=0),
+        xaxis_title="Longitude", yaxis_title="Latitude",
+        yaxis=dict(scaleanchor='x', scaleratio=1.25),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Lowest", f"{damage.min():,.2f}")
+col2.metric("Median", f"{np.median(damage):,.2f}")
+col3.metric("Highest", f"{damage.max():,.2f}")
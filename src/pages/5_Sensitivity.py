@@ -0,0 +1,101 @@
+import streamlit as st
+import numpy as np
+
+from utils.instrumentation import stage
+from utils.model_utils import (
+    EVENT_TYPES,
+    MAGNITUDE_TYPES,
+    MONTHS,
+    STATES,
+    default_model_path,
+    get_model_info,
+    load_model,
+)
+from utils.sweep import make_sweep, run_sweep, sweep_size
+
+# Set the page config for better layout
+st.set_page_config(page_title="Storm Damage Sensitivity", layout="wide")
+
+st.title("📈 Storm Damage Sensitivity")
+st.write(
+    "How the predicted damage responds to magnitude and duration, averaged over every "
+    "combination of the other inputs selected below (a partial-dependence curve). "
+    "For each state, the event is placed at the state's centre."
+)
+
+AXIS_LABELS = {"MAGNITUDE": "Magnitude (mph)", "DURATION_HOURS": "Duration (hours)"}
+GROUP_LABELS = {"EVENT_TYPE": "Event Type", "STATE": "State", "MONTH_NAME": "Month", None: "Nothing"}
+
+with st.form("sweep_form"):
+    col1, col2 = st.columns(2)
+    with col1:
+        magnitude_range = st.slider("Magnitude (mph)", 0, 300, (0, 300))
+        magnitude_step = st.number_input("Magnitude step", min_value=1, max_value=100, value=10)
+        duration_range = st.slider("Duration (hours)", 0, 72, (0, 72))
+        duration_step = st.number_input("Duration step", min_value=1, max_value=24, value=6)
+    with col2:
+        event_types = st.multiselect("Event Types", options=EVENT_TYPES, default=EVENT_TYPES)
+        states = st.multiselect("States", options=STATES, default=STATES)
+        months = st.multiselect("Months", options=MONTHS, default=["September"])
+        magnitude_type = st.selectbox("Magnitude Type", options=MAGNITUDE_TYPES)
+    col3, col4 = st.columns(2)
+    with col3:
+        x_axis = st.selectbox("Curve over", options=list(AXIS_LABELS), format_func=AXIS_LABELS.get)
+    with col4:
+        group_by = st.selectbox("One line per", options=list(GROUP_LABELS), format_func=GROUP_LABELS.get)
+    st.form_submit_button("📈 Run Sweep", use_container_width=True, type="primary")
+
+if not (event_types and states and months):
+    st.warning("Select at least one event type, state and month.")
+    st.stop()
+
+sweep = make_sweep(
+    {
+        "MAGNITUDE": np.arange(magnitude_range[0], magnitude_range[1] + 1, magnitude_step, dtype=float),
+        "DURATION_HOURS": np.arange(duration_range[0], duration_range[1] + 1, duration_step, dtype=float),
+        "EVENT_TYPE": event_types,
+        "STATE": states,
+        "MONTH_NAME": months,
+    },
+    fixed={"MAGNITUDE_TYPE": magnitude_type},
+)
+
+
+# Results are kept per sweep and model content (its hash), so switching the chart options does not
+# rescore, and a model retrained at the same path is not served old curves
+@st.cache_data(max_entries=16, show_spinner=False)
+def sensitivity(model_path, model_sha256, axes, magnitude_type):
+    summary, stats = run_sweep(make_sweep(axes, fixed={"MAGNITUDE_TYPE": magnitude_type}), model_path)
+    curves = {name: summary.curve(name) for name in ("MAGNITUDE", "DURATION_HOURS")}
+    tables = {
+        (name, by): summary.table(name, by)
+        for name in ("MAGNITUDE", "DURATION_HOURS") for by in ("EVENT_TYPE", "STATE", "MONTH_NAME")
+    }
+    return curves, tables, stats
+
+
+try:
+    with st.spinner(f"Scoring {sweep_size(sweep):,} scenarios..."), stage('sensitivity.sweep'):
+        model_path = default_model_path()
+        load_model(model_path)  # (re)loads a changed file, so the hash below is current
+        model_sha256 = get_model_info(model_path)['sha256']
+        curves, tables, stats = sensitivity(model_path, model_sha256, sweep['axes'], magnitude_type)
+except FileNotFoundError:
+    st.error("Model file not found. Please ensure 'damage_model_pipeline.pkl' is in the correct location.")
+    st.stop()
+
+st.caption(f"{stats['rows']:,} scenarios scored in {stats['seconds']:.2f}s ({stats['rows_per_second']:,.0f} per second).")
+
+st.subheader(f"Predicted damage by {AXIS_LABELS[x_axis].lower()}")
+if group_by is None:
+    st.line_chart(curves[x_axis][["mean", "min", "max"]])
+else:
+    table = tables[(x_axis, group_by)]
+    if table.shape[1] > 15:
+        # Keep the chart readable: the lines with the highest average damage
+        table = table[table.mean().sort_values(ascending=False).index[:15]]
+        st.caption(f"Showing the 15 {GROUP_LABELS[group_by].lower()} values with the highest average damage.")
+    st.line_chart(table)
+
+with st.expander("📋 Curve data", expanded=False):
+    st.dataframe(curves[x_axis], use_container_width=True)
@@ -0,0 +1,22 @@
+# tests/test_features.py - utils.features timestamp parsing
+#
+# Usage (from the src directory):
+#   python -m pytest tests
+
+import numpy as np
+
+from utils.features import calendar_features, parse_datetimes
+
+
+def test_archive_years_before_1969_stay_in_the_1900s():
+    # Fixed-width path and the pandas fallback (one-digit day)
+    times = parse_datetimes(['28-APR-50 14:00:00', '8-APR-50 14:00:00', '01-JUN-68 00:00:00'])
+    expected = np.array(['1950-04-28T14:00:00', '1950-04-08T14:00:00', '1968-06-01T00:00:00'], dtype='datetime64[s]')
+    np.testing.assert_array_equal(times, expected)
+    assert calendar_features(['28-APR-50 14:00:00'])['YEAR'][0] == 1950
+
+
+def test_recent_years_are_in_the_2000s():
+    times = parse_datetimes(['19-DEC-23 13:02:00', '1-JAN-00 00:00:00'])
+    expected = np.array(['2023-12-19T13:02:00', '2000-01-01T00:00:00'], dtype='datetime64[s]')
+    np.testing.assert_array_equal(times, expected)
@@ -0,0 +1,39 @@
+# tests/test_flat_model.py - utils.flat_model against the pipeline it was exported from
+#
+# Usage (from the src directory):
+#   python -m pytest tests
+
+import numpy as np
+import pytest
+
+from utils.flat_model import FlatModel, verify_flat_model
+from utils.synthetic import generate_events
+from utils.train import build_pipeline
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    events = generate_events(2000, seed=1, missing_rate=0.05)
+    rng = np.random.default_rng(1)
+    y = np.log1p(events['MAGNITUDE'].fillna(0) * 100) + rng.normal(0, 0.5, len(events))
+    return build_pipeline('gb', n_estimators=20, max_depth=4).fit(events, y)
+
+
+def test_export_matches_the_pipeline_on_missing_and_unseen_values(pipeline):
+    events = generate_events(500, seed=2, missing_rate=0.2)
+    events.loc[::7, 'STATE'] = None
+    events.loc[::11, 'EVENT_TYPE'] = None
+    events.loc[::5, 'MONTH_NAME'] = 'Smarch'
+    events.loc[::13, 'MAGNITUDE_TYPE'] = 'XX'
+    flat = FlatModel.from_pipeline(pipeline)
+    assert verify_flat_model(pipeline, flat, events) == (0, 0)
+
+
+def test_infinite_numerics_are_rejected_like_the_pipeline(pipeline):
+    events = generate_events(5, seed=3)
+    events.loc[2, 'DURATION_HOURS'] = np.inf
+    flat = FlatModel.from_pipeline(pipeline)
+    with pytest.raises(ValueError):
+        pipeline.predict(events)
+    with pytest.raises(ValueError):
+        flat.predict(events)
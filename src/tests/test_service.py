@@ -0,0 +1,50 @@
+# tests/test_service.py - utils.service request validation and HTTP handling
+#
+# Usage (from the src directory):
+#   python -m pytest tests
+
+import http.client
+import json
+import threading
+
+import pytest
+
+from utils.service import ValidationError, make_server, parse_request
+
+EVENT = {'STATE': 'TEXAS', 'EVENT_TYPE': 'Hail', 'MONTH_NAME': 'May', 'MAGNITUDE': 1.75, 'MAGNITUDE_TYPE': 'EG',
+         'BEGIN_LAT': 32.7, 'BEGIN_LON': -97.3, 'DURATION_HOURS': 0.5}
+
+
+def test_valid_event():
+    events, single = parse_request(json.dumps({'event': EVENT}))
+    assert single and events[0]['MAGNITUDE'] == 1.75
+
+
+def test_integer_too_large_for_a_float_is_a_validation_error():
+    body = json.dumps({'event': EVENT}).replace('1.75', '1' + '0' * 400)
+    with pytest.raises(ValidationError) as e:
+        parse_request(body)
+    assert e.value.details == [{'index': 0, 'errors': ['MAGNITUDE must be a finite number or null']}]
+
+
+@pytest.fixture
+def server():
+    # The Content-Length checks run before the service is used, so none is needed
+    server = make_server(None, port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('length', ['abc', '-5'])
+def test_invalid_content_length_is_a_400(server, length):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    connection.putrequest('POST', '/predict')
+    connection.putheader('Content-Length', length)
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == 400
+    assert 'Content-Length' in json.loads(response.read())['error']
+    connection.close()
@@ -0,0 +1,67 @@
+# utils/batch_score.py - Command-line batch scoring of storm event files
+#
+# Usage (from the src directory):
+#   python -m utils.batch_score events.csv predictions.parquet
+#   python -m utils.batch_score events.parquet out.csv --model damage_model_pipeline.pkl --chunk-size 100000
+#   python -m utils.batch_score archive.csv rescored.parquet --stream   # bounded memory
+#   python -m utils.batch_score events.csv out.csv --workers 0          # one process per core
+
+import argparse
+import sys
+
+from .memory import format_bytes, peak_rss_bytes
+from .model_utils import DEFAULT_CHUNK_SIZE, FEATURES, score_file, score_file_streaming
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m utils.batch_score',
+        description='Predict property damage for every storm event in a CSV or Parquet file. '
+                    f"The input must contain the columns: {', '.join(FEATURES)}.",
+    )
+    parser.add_argument('input', help='input .csv or .parquet file of storm events')
+    parser.add_argument('output', help='output .csv or .parquet file (input columns + PREDICTED_DAMAGE)')
+    parser.add_argument('--model', default=None,
+                        help='trained pipeline (.pkl), flat export (.npz) or model artifact directory; '
+                             'default: the up-to-date model in src/')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'rows per vectorized predict call (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--stream', action='store_true',
+                        help='read, score and write chunk by chunk so memory stays flat for any file size')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes to score on (0 = one per core, default: 1)')
+    return parser
+
+
+def print_report(stats, out=sys.stdout):
+    """Print the throughput report returned by the scoring functions."""
+    print(f"Scored {stats['rows']:,} events in {stats['total_seconds']:.2f}s "
+          f"({stats['rows_per_second']:,.0f} rows/s)", file=out)
+    for stage in ('load', 'read', 'predict', 'write'):
+        key = f'{stage}_seconds'
+        if key in stats:
+            print(f"  {stage:<8}{stats[key]:8.2f}s", file=out)
+    print(f"  peak RSS {format_bytes(peak_rss_bytes())}", file=out)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.chunk_size <= 0:
+        print('error: --chunk-size must be positive', file=sys.stderr)
+        return 2
+    if args.workers < 0:
+        print('error: --workers must be 0 or positive', file=sys.stderr)
+        return 2
+    score = score_file_streaming if args.stream else score_file
+    try:
+        stats = score(args.input, args.output, model_path=args.model, chunk_size=args.chunk_size,
+                      n_workers=args.workers or None)
+    except (FileNotFoundError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    print_report(stats)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
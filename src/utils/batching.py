@@ -0,0 +1,293 @@
+# utils/batching.py - Coalesce concurrent prediction requests into vectorized batches
+#
+# A one-row model.predict costs almost as much as a few hundred rows, since
+# most of the time goes into per-call pipeline overhead. A MicroBatcher
+# collects the events of concurrent callers for at most max_wait_ms (or
+# until max_batch_rows events are waiting), scores them with one call and
+# hands every caller back its own slice of the results.
+#
+# MicroBatcher serves threaded callers (e.g. the HTTP service);
+# AsyncMicroBatcher does the same for coroutines on an asyncio event loop.
+
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from .model_utils import default_model_path, load_model, make_prediction, postprocess_prediction
+
+DEFAULT_MAX_BATCH_ROWS = 1024
+DEFAULT_MAX_WAIT_MS = 5.0
+
+# Upper bounds of the batch size histogram buckets (rows per predict call)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+
+class BatchStats:
+    """Counters describing how requests were coalesced (shared by the batchers)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_batch_rows_seen = 0
+        self.predict_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    def record(self, n_requests, n_rows, predict_seconds, wait_seconds, failed=False):
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if n_rows <= bound),
+                      len(BATCH_SIZE_BUCKETS))
+        with self._lock:
+            self.requests += n_requests
+            self.rows += n_rows
+            self.batches += 1
+            self.errors += int(failed)
+            self.max_batch_rows_seen = max(self.max_batch_rows_seen, n_rows)
+            self.predict_seconds += predict_seconds
+            self.wait_seconds += wait_seconds
+            self.histogram[bucket] += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f'<={bound}' for bound in BATCH_SIZE_BUCKETS] + [f'>{BATCH_SIZE_BUCKETS[-1]}']
+            return {
+                'requests': self.requests,
+                'rows': self.rows,
+                'batches': self.batches,
+                'errors': self.errors,
+                'mean_batch_rows': self.rows / self.batches if self.batches else 0.0,
+                'mean_requests_per_batch': self.requests / self.batches if self.batches else 0.0,
+                'max_batch_rows': self.max_batch_rows_seen,
+                'predict_seconds': self.predict_seconds,
+                'mean_queue_wait_ms': 1000 * self.wait_seconds / self.requests if self.requests else 0.0,
+                'batch_rows_histogram': dict(zip(labels, self.histogram)),
+            }
+
+
+def split_results(results, sizes):
+    """Split one batch of results into consecutive slices of the given sizes."""
+    results = np.asarray(results)
+    if len(results) != sum(sizes):
+        raise ValueError(f"Batch returned {len(results)} results for {sum(sizes)} events")
+    return np.split(results, np.cumsum(sizes)[:-1])
+
+
+def damage_predictor(model_path=None):
+    """Return predict_fn(events) -> damage array for a model file, for use with the batchers.
+
+    Each call goes through make_prediction() on the registry's warm model
+    (reloaded only if the file changed) and applies the usual clip + expm1.
+    """
+    model_path = model_path or default_model_path()
+    load_model(model_path)  # fail fast, and keep it warm
+
+    def predict_fn(events):
+        return postprocess_prediction(make_prediction(load_model(model_path), events))
+
+    return predict_fn
+
+
+class MicroBatcher:
+    """Thread-based request coalescer around a vectorized predict function.
+
+    predict_fn(events) receives a list of event dicts and must return one
+    result per event, in order (e.g. damage predictions). submit() may be
+    called from any number of threads; a single background thread forms the
+    batches. A request larger than max_batch_rows is still scored, as its
+    own batch. max_wait_ms trades latency for throughput: 0 scores whatever
+    is queued immediately, larger values wait for more company.
+    """
+
+    def __init__(self, predict_fn, max_batch_rows=DEFAULT_MAX_BATCH_ROWS, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait_ms = max_wait_ms
+        self.stats = BatchStats()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, events):
+        """Queue a list of events; returns a Future resolving to their results (an array)."""
+        if self._closed:
+            raise RuntimeError('MicroBatcher is closed')
+        future = Future()
+        events = list(events)
+        if not events:
+            future.set_result(np.empty(0))
+            return future
+        self._queue.put((events, future, time.perf_counter()))
+        return future
+
+    def predict(self, events, timeout=None):
+        """Score a list of events through the batcher and wait for the results."""
+        return self.submit(events).result(timeout)
+
+    def _collect(self, first):
+        batch, rows = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            started = time.perf_counter()
+            events = [event for item in batch for event in item[0]]
+            try:
+                results = split_results(self.predict_fn(events), [len(item[0]) for item in batch])
+            except Exception as e:
+                failed = True
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                failed = False
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            self.stats.record(len(batch), len(events), time.perf_counter() - started,
+                              sum(started - queued for _, _, queued in batch), failed=failed)
+
+    def close(self):
+        """Score what is already queued, then stop the background thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncMicroBatcher:
+    """asyncio request coalescer around a vectorized predict function.
+
+    await predict(events) queues the events and resolves once the batch
+    they joined has been scored. A batch is scored when max_batch_rows
+    events are waiting or the oldest has waited max_wait_ms, whichever
+    comes first; while one batch runs (in a worker thread, so the event
+    loop stays responsive) the next one fills up. Batch sizes and queueing
+    delay are recorded in stats (a BatchStats).
+
+    Create and use it from within a running event loop; call aclose() (or
+    use "async with") to flush the queue and stop the background task.
+    """
+
+    def __init__(self, predict_fn, max_batch_rows=DEFAULT_MAX_BATCH_ROWS, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 executor=None):
+        self.predict_fn = predict_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait_ms = max_wait_ms
+        self.executor = executor
+        self.stats = BatchStats()
+        self._pending = deque()  # (events, future, queued_at)
+        self._pending_rows = 0
+        self._nonempty = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = None
+        self._closed = False
+
+    async def predict(self, events):
+        """Score a list of events as part of a batch; returns their results (an array)."""
+        if self._closed:
+            raise RuntimeError('AsyncMicroBatcher is closed')
+        events = list(events)
+        if not events:
+            return np.empty(0)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((events, future, time.perf_counter()))
+        self._pending_rows += len(events)
+        self._nonempty.set()
+        if self._pending_rows >= self.max_batch_rows:
+            self._full.set()
+        return await future
+
+    async def predict_one(self, event):
+        """Score a single event dict; returns its result as a float."""
+        return float((await self.predict([event]))[0])
+
+    def _take_batch(self):
+        batch, rows = [], 0
+        while self._pending and (not batch or rows + len(self._pending[0][0]) <= self.max_batch_rows):
+            item = self._pending.popleft()
+            batch.append(item)
+            rows += len(item[0])
+        self._pending_rows -= rows
+        if not self._pending and not self._closed:
+            self._nonempty.clear()
+        if self._pending_rows < self.max_batch_rows:
+            self._full.clear()
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._nonempty.wait()
+            if not self._pending:
+                return  # closed and drained
+            if not self._full.is_set() and self.max_wait_ms > 0 and not self._closed:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait_ms / 1000.0)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._take_batch()
+            # Callers that gave up (cancelled) need no result
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            events = [event for item in batch for event in item[0]]
+            try:
+                results = await loop.run_in_executor(self.executor, self.predict_fn, events)
+                results = split_results(results, [len(item[0]) for item in batch])
+            except Exception as e:
+                failed = True
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                failed = False
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            self.stats.record(len(batch), len(events), time.perf_counter() - started,
+                              sum(started - queued for _, _, queued in batch), failed=failed)
+
+    async def aclose(self):
+        """Score what is already queued, then stop the background task."""
+        self._closed = True
+        if self._task is not None:
+            self._nonempty.set()
+            await self._task
+            self._task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
@@ -0,0 +1,196 @@
+# utils/data_utils.py - Local-first, cached loading of the StormEvents dataset
+#
+# The dataset is read from a local CSV when one is available. The first
+# load converts it into an uncompressed Feather (Arrow IPC) file with
+# compact dtypes, and later loads memory-map that file instead of parsing
+# the CSV again. The GitHub copy is only downloaded when there is neither a
+# local CSV nor a cache (and never when STORM_DATA_URL is set to "").
+
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+DATA_URL = os.environ.get(
+    'STORM_DATA_URL',
+    'https://raw.githubusercontent.com/NMAnuda/storm-damage-prediction-app/refs/heads/main/src/StormEvents_cleaned1.csv',
+)
+DEFAULT_DATA_PATH = os.environ.get(
+    'STORM_DATA_PATH',
+    os.path.join(os.path.dirname(__file__), '..', 'StormEvents_cleaned1.csv'),
+)
+DEFAULT_CACHE_DIR = os.environ.get(
+    'STORM_CACHE_DIR',
+    os.path.join(os.path.dirname(__file__), '..', '.cache'),
+)
+
+# Suffix multipliers of NOAA damage strings ("10.00K", "1.5M", "2B")
+DAMAGE_MULTIPLIERS = {'K': 1e3, 'M': 1e6, 'B': 1e9}
+# Spellings of "no damage" (compared after strip + upper-casing)
+_ZERO_DAMAGE = ['', '0', '0.0', 'NONE', 'NA', 'NAN']
+
+# Bump when the cached representation changes so old caches are rebuilt
+CACHE_VERSION = 1
+
+# Text columns with at most this share of distinct values become categoricals
+_CATEGORY_MAX_RATIO = 0.5
+
+
+def _parse_damage_strings(text):
+    """Parse an array of distinct damage strings; see parse_damage()."""
+    text = pd.Series(text, dtype='string').str.strip().str.upper()
+    suffix = text.str[-1]
+    has_suffix = suffix.isin(list(DAMAGE_MULTIPLIERS)).fillna(False)
+    multiplier = suffix.map(DAMAGE_MULTIPLIERS).where(has_suffix, 1.0).astype('float64')
+    body = text.where(~has_suffix, text.str[:-1]).str.replace(',', '', regex=False)
+
+    value = pd.to_numeric(body, errors='coerce').astype('float64')
+    # Junk like "$1,5O0K": keep only digits and dots, as the notebook's fallback did
+    bad = value.isna() & body.notna()
+    if bad.any():
+        digits = body[bad].str.replace(r'[^0-9.]', '', regex=True)
+        value[bad] = pd.to_numeric(digits, errors='coerce').astype('float64')
+
+    value = value * multiplier
+    value[text.isna() | text.isin(_ZERO_DAMAGE)] = 0.0
+    return value.fillna(0.0).to_numpy(dtype='float64')
+
+
+def parse_damage(values, clip_upper=None):
+    """Convert NOAA damage strings such as "10.00K", "1.5M" or "2B" to dollars.
+
+    Vectorized replacement for the row-by-row convert_damage() of the
+    training notebook, shared by training and the Statistics page. K/M/B
+    suffixes, thousands separators, blanks, "NONE"/"NA" and junk characters
+    are handled with pandas string operations over the distinct values only,
+    so the cost depends on the number of distinct strings rather than rows.
+    Unparseable and missing values become 0. Numeric input passes through.
+    Returns a float64 Series aligned with values (clipped at clip_upper if
+    given).
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        result = series.astype('float64').fillna(0.0)
+    else:
+        codes, uniques = pd.factorize(series.astype('object'), use_na_sentinel=True)
+        parsed = _parse_damage_strings(uniques.astype(str))
+        # NaN (code -1) maps to the appended 0.0
+        result = pd.Series(np.append(parsed, 0.0)[codes], index=series.index, name=series.name)
+    if clip_upper is not None:
+        result = result.clip(upper=clip_upper)
+    return result
+
+
+def _cache_paths(source_path, cache_dir):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    base = os.path.join(cache_dir, stem)
+    return base + '.feather', base + '.meta.json'
+
+
+def _source_signature(path):
+    st = os.stat(path)
+    return {'source': os.path.abspath(path), 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def optimize_dtypes(df):
+    """Return df with low-cardinality text columns as categoricals and integers downcast."""
+    df = df.copy()
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if len(series) and series.nunique(dropna=True) <= _CATEGORY_MAX_RATIO * len(series):
+                df[col] = series.astype('category')
+        elif pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast='integer')
+    return df
+
+
+def _write_cache(df, cache_path, meta_path, meta):
+    from pyarrow import feather
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    # Uncompressed so that later reads can memory-map the columns
+    feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path)
+    with open(meta_path, 'w') as f:
+        json.dump(dict(meta, version=CACHE_VERSION, rows=len(df), written_at=time.time()), f)
+
+
+def _read_cache(cache_path):
+    from pyarrow import feather
+
+    return feather.read_table(cache_path, memory_map=True).to_pandas()
+
+
+def _have_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def dataset_signature(path=DEFAULT_DATA_PATH, cache_dir=DEFAULT_CACHE_DIR):
+    """Return a string identifying the current version of the dataset, or None.
+
+    It changes whenever the local CSV changes (or, without a local CSV,
+    whenever the cache is rebuilt), so it can key caches of derived results.
+    """
+    if os.path.exists(path):
+        sig = _source_signature(path)
+        return f"{sig['source']}:{sig['mtime_ns']}:{sig['size']}"
+    meta = _read_meta(_cache_paths(path, cache_dir)[1])
+    if meta is None:
+        return None
+    return f"{meta.get('source')}:{meta.get('written_at')}"
+
+
+def load_dataset(path=DEFAULT_DATA_PATH, cache_dir=DEFAULT_CACHE_DIR, remote_url=DATA_URL):
+    """Load the StormEvents dataset, preferring local and cached copies.
+
+    Order of preference:
+      1. the Feather cache, if it was built from the current local CSV;
+      2. the local CSV at path (the cache is (re)built from it);
+      3. an existing cache when the local CSV is missing (offline use);
+      4. remote_url, if set (the download is cached too).
+    Raises FileNotFoundError when none of these is available.
+    """
+    cache_path, meta_path = _cache_paths(path, cache_dir)
+    use_cache = _have_pyarrow()
+    meta = _read_meta(meta_path) if use_cache and os.path.exists(cache_path) else None
+    if meta is not None and meta.get('version') != CACHE_VERSION:
+        meta = None
+
+    if os.path.exists(path):
+        signature = _source_signature(path)
+        if meta is not None and all(meta.get(k) == v for k, v in signature.items()):
+            return _read_cache(cache_path)
+        df = optimize_dtypes(pd.read_csv(path, low_memory=False))
+        if use_cache:
+            _write_cache(df, cache_path, meta_path, signature)
+        return df
+
+    if meta is not None:
+        return _read_cache(cache_path)
+
+    if remote_url:
+        df = optimize_dtypes(pd.read_csv(remote_url, low_memory=False))
+        if use_cache:
+            _write_cache(df, cache_path, meta_path, {'source': remote_url})
+        return df
+
+    raise FileNotFoundError(
+        f"Dataset not found at {os.path.abspath(path)} and no cached copy exists "
+        "(remote download is disabled)"
+    )
@@ -0,0 +1,293 @@
+# utils/evaluation.py - Single-pass evaluation reports of the damage model
+#
+# EvaluationAccumulator takes (y_true, y_pred) in chunks. Each chunk is
+# traversed once: the per-row error terms are computed as one set of
+# arrays and summed with np.bincount, overall and per EVENT_TYPE / STATE.
+# The error quantiles (MedAE and the residual quantiles) come from a
+# histogram of the residuals on a fine signed log1p grid, so nothing grows
+# with the number of rows and the quantiles are within about 0.5% of the
+# exact ones. The report (MAE, MedAE, RMSE, RMSLE, MAPE, SMAPE, WAPE, the
+# breakdowns and the quantiles) is versioned JSON saved next to the model
+# (damage_model_pipeline.evaluation.json), which the About page displays.
+#
+# Usage (from the src directory):
+#   python -m utils.evaluation StormEvents_holdout.csv --model damage_model_pipeline.pkl
+#   python -m utils.evaluation --show
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from .model_utils import DEFAULT_CHUNK_SIZE, DEFAULT_MODEL_PATH
+
+REPORT_FORMAT = 'storm-damage-evaluation'
+# Bump when the layout of the report changes
+REPORT_VERSION = 1
+
+GROUP_COLUMNS = ('EVENT_TYPE', 'STATE')
+RESIDUAL_QUANTILES = (0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+METRICS = ('MAE', 'MedAE', 'RMSE', 'RMSLE', 'MAPE', 'SMAPE', 'WAPE')
+
+# Residual histogram: bins of _STEP in sign(r) * log1p(|r|), symmetric around 0 and wide
+# enough for any damage up to about 1e10 USD (larger residuals land in the outer bins)
+_STEP = 0.005
+_HALF_BINS = int(np.ceil(np.log1p(1e10) / _STEP))
+# Per-row terms summed per group, in column order
+_TERMS = ('rows', 'abs', 'squared', 'squared_log', 'residual', 'true', 'pred', 'ape', 'ape_rows', 'sape')
+
+
+class _GroupSums:
+    """Sums of the error terms and residual histogram for each label of one grouping."""
+
+    def __init__(self):
+        self.labels = []
+        self.sums = np.zeros((0, len(_TERMS)))
+        self.histogram = np.zeros((0, 2 * _HALF_BINS), dtype=np.int64)
+
+    def codes(self, values):
+        import pandas as pd
+
+        values = pd.Series(np.asarray(values, dtype=object)).fillna('Unknown')
+        known = set(self.labels)
+        self.labels.extend(v for v in pd.unique(values) if v not in known)
+        grow = len(self.labels) - len(self.sums)
+        if grow:
+            self.sums = np.vstack([self.sums, np.zeros((grow, len(_TERMS)))])
+            self.histogram = np.vstack([self.histogram, np.zeros((grow, 2 * _HALF_BINS), dtype=np.int64)])
+        return pd.Index(self.labels, dtype=object).get_indexer(values)
+
+    def add(self, codes, terms, bins):
+        n = len(self.labels)
+        for j in range(terms.shape[1]):
+            self.sums[:, j] += np.bincount(codes, weights=terms[:, j], minlength=n)
+        cells = np.bincount(codes * (2 * _HALF_BINS) + bins, minlength=n * 2 * _HALF_BINS)
+        self.histogram += cells.reshape(n, 2 * _HALF_BINS)
+
+
+def _bin_index(residual):
+    scaled = np.sign(residual) * np.log1p(np.abs(residual)) / _STEP
+    return np.clip(np.floor(scaled).astype(np.int64) + _HALF_BINS, 0, 2 * _HALF_BINS - 1)
+
+
+def _histogram_quantiles(counts, quantiles, signed=True):
+    """Quantiles of the values in a signed (or folded, absolute) residual histogram, in USD."""
+    total = counts.sum()
+    if not total:
+        return [None] * len(quantiles)
+    offset = _HALF_BINS if signed else 0
+    cumulative = np.cumsum(counts)
+    results = []
+    for q in quantiles:
+        rank = q * total
+        i = int(np.searchsorted(cumulative, rank, side='left'))
+        i = min(i, len(counts) - 1)
+        before = cumulative[i] - counts[i]
+        fraction = (rank - before) / counts[i] if counts[i] else 0.0
+        scaled = (i - offset + fraction) * _STEP
+        results.append(float(np.sign(scaled) * np.expm1(abs(scaled))))
+    return results
+
+
+def _metrics(sums, histogram):
+    s = dict(zip(_TERMS, sums))
+    n = s['rows']
+    # |residual| histogram: fold the negative half onto the positive one
+    absolute = histogram[_HALF_BINS:] + histogram[:_HALF_BINS][::-1]
+    return {
+        'rows': int(n),
+        'MAE': float(s['abs'] / n),
+        'MedAE': _histogram_quantiles(absolute, [0.5], signed=False)[0],
+        'RMSE': float(np.sqrt(s['squared'] / n)),
+        'RMSLE': float(np.sqrt(s['squared_log'] / n)),
+        'MAPE': float(s['ape'] / s['ape_rows']) if s['ape_rows'] else None,
+        'SMAPE': float(s['sape'] / n),
+        'WAPE': float(s['abs'] / s['true']) if s['true'] else None,
+        'bias': float(s['residual'] / n),
+        'mean_true': float(s['true'] / n),
+        'mean_pred': float(s['pred'] / n),
+    }
+
+
+class EvaluationAccumulator:
+    """Streaming evaluation of damage predictions (USD), overall and per group column.
+
+    update() may be called any number of times with chunks of rows;
+    report() summarizes everything seen so far. MAPE skips events without
+    damage; SMAPE counts a zero prediction for a zero damage as exact.
+    """
+
+    def __init__(self, group_columns=GROUP_COLUMNS):
+        self.group_columns = list(group_columns)
+        self._overall = _GroupSums()
+        self._overall.codes(['all'])
+        self._groups = {col: _GroupSums() for col in self.group_columns}
+
+    def update(self, y_true, y_pred, groups=None):
+        """Add a chunk; groups maps each group column to the chunk's labels (e.g. a DataFrame)."""
+        y_true = np.asarray(y_true, dtype=np.float64)
+        y_pred = np.asarray(y_pred, dtype=np.float64)
+        residual = y_pred - y_true
+        abs_error = np.abs(residual)
+        log_error = np.log1p(np.clip(y_pred, 0, None)) - np.log1p(y_true)
+        has_damage = y_true > 0
+        scale = np.abs(y_true) + np.abs(y_pred)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ape = np.where(has_damage, abs_error / y_true, 0.0)
+            sape = np.where(scale > 0, 2 * abs_error / scale, 0.0)
+        terms = np.column_stack([np.ones(len(y_true)), abs_error, residual ** 2, log_error ** 2, residual,
+                                 y_true, y_pred, ape, has_damage, sape])
+        bins = _bin_index(residual)
+        self._overall.add(np.zeros(len(y_true), dtype=np.int64), terms, bins)
+        for col in self.group_columns:
+            if groups is not None and col in groups:
+                sums = self._groups[col]
+                sums.add(sums.codes(groups[col]), terms, bins)
+
+    @property
+    def rows(self):
+        return int(self._overall.sums[0, 0])
+
+    def report(self, **meta):
+        """The evaluation report dict (REPORT_VERSION layout); meta is stored under 'meta'."""
+        histogram = self._overall.histogram[0]
+        breakdowns = {}
+        for col, sums in self._groups.items():
+            rows = [dict({col: label}, **_metrics(sums.sums[i], sums.histogram[i]))
+                    for i, label in enumerate(sums.labels) if sums.sums[i, 0]]
+            breakdowns[col] = sorted(rows, key=lambda row: -row['rows'])
+        return {
+            'format': REPORT_FORMAT,
+            'version': REPORT_VERSION,
+            'created_at': time.time(),
+            'meta': meta,
+            'metrics': _metrics(self._overall.sums[0], histogram) if self.rows else None,
+            'residual_quantiles': dict(zip((str(q) for q in RESIDUAL_QUANTILES),
+                                           _histogram_quantiles(histogram, RESIDUAL_QUANTILES))),
+            'breakdowns': breakdowns,
+        }
+
+
+def evaluate(y_true, y_pred, groups=None, **meta):
+    """Evaluation report of one set of predictions (see EvaluationAccumulator)."""
+    accumulator = EvaluationAccumulator()
+    accumulator.update(y_true, y_pred, groups)
+    return accumulator.report(**meta)
+
+
+def report_path(model_path=DEFAULT_MODEL_PATH):
+    """Where the evaluation report of a model file is kept: <model stem>.evaluation.json next to it."""
+    return os.path.splitext(os.path.normpath(model_path))[0] + '.evaluation.json'
+
+
+def model_signature(model_path):
+    st = os.stat(model_path)
+    return {'model_mtime_ns': st.st_mtime_ns, 'model_size': st.st_size}
+
+
+def save_report(report, model_path=DEFAULT_MODEL_PATH):
+    """Write report next to model_path (recording the model file's signature) and return the path."""
+    report = dict(report, model=dict(model_signature(model_path), path=os.path.basename(model_path)))
+    path = report_path(model_path)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_report(model_path=DEFAULT_MODEL_PATH):
+    """The saved report of model_path, or None; report['stale'] is True if the model changed since."""
+    try:
+        with open(report_path(model_path)) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if report.get('format') != REPORT_FORMAT or report.get('version') != REPORT_VERSION:
+        return None
+    try:
+        current = model_signature(model_path)
+    except OSError:
+        current = None
+    recorded = report.get('model') or {}
+    report['stale'] = current is None or any(recorded.get(key) != value for key, value in current.items())
+    return report
+
+
+def evaluate_file(model_path, data_path, chunk_rows=DEFAULT_CHUNK_SIZE):
+    """Stream a StormEvents CSV through the model chunk by chunk and return its evaluation report."""
+    import pandas as pd
+
+    from .model_utils import load_model, make_prediction, postprocess_prediction
+    from .train import SOURCE_COLUMNS, prepare_training_frame
+
+    start = time.perf_counter()
+    model = load_model(model_path)
+    accumulator = EvaluationAccumulator()
+    with pd.read_csv(data_path, usecols=lambda col: col in SOURCE_COLUMNS, chunksize=chunk_rows,
+                     low_memory=False) as reader:
+        for chunk in reader:
+            X, y = prepare_training_frame(chunk)
+            if len(X):
+                accumulator.update(y, postprocess_prediction(make_prediction(model, X)), X)
+    return accumulator.report(data=os.path.abspath(data_path), seconds=time.perf_counter() - start)
+
+
+def format_report(report):
+    """Plain-text summary of a report."""
+    m = report['metrics']
+    if m is None:
+        return 'No rows evaluated.'
+    lines = [f"{m['rows']:,} events"]
+    for name in METRICS:
+        value = m[name]
+        if value is None:
+            text = 'n/a'
+        elif name in ('MAPE', 'SMAPE', 'WAPE'):
+            text = f'{value * 100:.2f}%'
+        elif name == 'RMSLE':
+            text = f'{value:.4f}'
+        else:
+            text = f'{value:,.2f} USD'
+        lines.append(f'{name:<6} : {text}')
+    quantiles = ', '.join(f'{float(q) * 100:g}%: {v:,.0f}' for q, v in report['residual_quantiles'].items())
+    lines.append(f'Residual quantiles (USD, predicted - actual): {quantiles}')
+    for col, rows in report['breakdowns'].items():
+        lines.append(f'By {col}:')
+        for row in rows[:10]:
+            lines.append(f"  {str(row[col]):<16} {row['rows']:>9,}  MAE {row['MAE']:>16,.2f}  RMSLE {row['RMSLE']:.4f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.evaluation',
+                                     description='Evaluate the damage model and save the report next to it.')
+    parser.add_argument('data', nargs='?', help='StormEvents CSV to evaluate on (e.g. a held-out year)')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help='model file (default: damage_model_pipeline.pkl)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--show', action='store_true', help='print the saved report of --model instead')
+    args = parser.parse_args(argv)
+
+    if args.show:
+        report = load_report(args.model)
+        if report is None:
+            print(f'error: no evaluation report for {args.model}', file=sys.stderr)
+            return 1
+    elif args.data:
+        try:
+            report = evaluate_file(args.model, args.data, args.chunk_rows)
+        except (FileNotFoundError, ValueError) as e:
+            print(f'error: {e}', file=sys.stderr)
+            return 1
+        print(f'Report saved to {save_report(report, args.model)}')
+    else:
+        parser.error('give a CSV to evaluate on, or --show')
+    print(format_report(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,349 @@
+# utils/feature_matrix.py - Out-of-core training from a compact on-disk feature matrix
+#
+# utils.train reads the whole CSV into pandas, where every event costs a few
+# hundred bytes of object columns, so the RAM budget caps how much history
+# can be trained on. Here the CSV is streamed in chunks into a directory of
+# raw, memory-mappable arrays:
+#
+#   <dir>/manifest.json    rows, dtypes, category vocabularies, source signature
+#   <dir>/numeric.f32      float32 numeric features          (rows x 4)
+#   <dir>/codes.i16        int16 category codes, -1 missing  (rows x 4)
+#   <dir>/target.f32       float32 property damage in USD    (rows)
+#
+# i.e. 28 bytes per event. The histogram boosting model is then fitted from
+# a float32 scratch memmap of the training rows. While fitting, scikit-learn
+# still holds a float64 copy of its input (about 100 bytes per training row
+# with the bins, gradients and predictions), so max_train_rows caps the rows
+# it sees with a uniform sample. The train/test split is stratified on
+# damage quintiles like utils.train's, and the test rows are always all
+# scored, in chunks. The fitted model is wrapped in the same pipeline as
+# `utils.train --engine hist`, so it takes the app's raw feature DataFrames.
+#
+# Usage (from the src directory):
+#   python -m utils.feature_matrix build StormEvents_archive.csv --dir .cache/train_matrix
+#   python -m utils.train StormEvents_archive.csv --engine hist --out-of-core .cache/train_matrix
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from .data_utils import DEFAULT_CACHE_DIR, _source_signature
+from .memory import format_bytes, peak_rss_bytes
+from .model_utils import CATEGORICAL_FEATURES, DEFAULT_CHUNK_SIZE, NUMERIC_FEATURES
+
+DEFAULT_MATRIX_DIR = os.path.join(DEFAULT_CACHE_DIR, 'train_matrix')
+# Target values read to estimate the damage quintiles of the train/test split
+QUANTILE_SAMPLE_ROWS = 1_000_000
+
+# Bump when the layout of the matrix directory changes
+MATRIX_VERSION = 1
+
+_MANIFEST = 'manifest.json'
+_FILES = {
+    'numeric': ('numeric.f32', np.float32, len(NUMERIC_FEATURES)),
+    'codes': ('codes.i16', np.int16, len(CATEGORICAL_FEATURES)),
+    'target': ('target.f32', np.float32, None),
+}
+_MAX_CODES = np.iinfo(np.int16).max
+
+
+class FeatureMatrix:
+    """Read-only view of a matrix directory; numeric, codes and target are np.memmap arrays."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, _MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != MATRIX_VERSION:
+            raise ValueError(f'{path}: unsupported feature matrix version {self.manifest.get("version")}')
+        self.rows = self.manifest['rows']
+        self.categories = self.manifest['categories']
+        for name, (filename, dtype, width) in _FILES.items():
+            shape = (self.rows,) if width is None else (self.rows, width)
+            array = np.memmap(os.path.join(path, filename), dtype=dtype, mode='r', shape=shape) if self.rows else \
+                np.empty(shape, dtype=dtype)
+            setattr(self, name, array)
+
+    def model_block(self, rows):
+        """Float64 model input of rows (a slice or row indices): the numerics, then the codes (NaN = missing)."""
+        numeric = self.numeric[rows]
+        codes = self.codes[rows]
+        block = np.empty((len(numeric), numeric.shape[1] + codes.shape[1]), dtype=np.float64)
+        block[:, :numeric.shape[1]] = numeric
+        block[:, numeric.shape[1]:] = np.where(codes < 0, np.nan, codes)
+        return block
+
+
+def matrix_is_current(data_path, matrix_dir=DEFAULT_MATRIX_DIR):
+    try:
+        with open(os.path.join(matrix_dir, _MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifest.get('version') == MATRIX_VERSION and manifest.get('source') == _source_signature(data_path)
+
+
+def _encode_categories(values, vocabulary):
+    """int16 codes of values, adding unseen categories to vocabulary (a list, in first-seen order)."""
+    import pandas as pd
+
+    present = values[values.notna()]
+    known = set(vocabulary)
+    vocabulary.extend(v for v in pd.unique(present) if v not in known)
+    if len(vocabulary) > _MAX_CODES:
+        raise ValueError(f'{values.name} has more than {_MAX_CODES} categories')
+    return pd.Index(vocabulary, dtype=object).get_indexer(values).astype(np.int16)
+
+
+def build_feature_matrix(data_path, matrix_dir=DEFAULT_MATRIX_DIR, chunk_rows=DEFAULT_CHUNK_SIZE):
+    """Stream a StormEvents CSV into a feature matrix directory and return its manifest.
+
+    Each chunk goes through the same preparation as utils.train
+    (prepare_training_frame) and is appended to the raw array files, so
+    only one chunk is in memory at a time. The directory is written under
+    a temporary name and renamed into place when complete.
+    """
+    import pandas as pd
+
+    from .train import SOURCE_COLUMNS, prepare_training_frame
+
+    start = time.perf_counter()
+    source = _source_signature(data_path)
+    matrix_dir = os.path.abspath(matrix_dir)
+    tmp_dir = f'{matrix_dir}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    vocabularies = {col: [] for col in CATEGORICAL_FEATURES}
+    rows = source_rows = 0
+    try:
+        files = {name: open(os.path.join(tmp_dir, filename), 'wb') for name, (filename, _, _) in _FILES.items()}
+        try:
+            with pd.read_csv(data_path, usecols=lambda col: col in SOURCE_COLUMNS, chunksize=chunk_rows,
+                             low_memory=False) as reader:
+                for chunk in reader:
+                    source_rows += len(chunk)
+                    X, y = prepare_training_frame(chunk)
+                    X[NUMERIC_FEATURES].to_numpy(dtype=np.float32, na_value=np.nan).tofile(files['numeric'])
+                    codes = np.column_stack([_encode_categories(X[col], vocabularies[col])
+                                             for col in CATEGORICAL_FEATURES])
+                    codes.tofile(files['codes'])
+                    y.to_numpy(dtype=np.float32).tofile(files['target'])
+                    rows += len(X)
+        finally:
+            for f in files.values():
+                f.close()
+        manifest = {
+            'version': MATRIX_VERSION,
+            'source': source,
+            'rows': rows,
+            'source_rows': source_rows,
+            'numeric_features': NUMERIC_FEATURES,
+            'categorical_features': CATEGORICAL_FEATURES,
+            'categories': [vocabularies[col] for col in CATEGORICAL_FEATURES],
+            'bytes': sum(os.path.getsize(os.path.join(tmp_dir, filename)) for filename, _, _ in _FILES.values()),
+            'build_seconds': time.perf_counter() - start,
+            'created_at': time.time(),
+        }
+        with open(os.path.join(tmp_dir, _MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        shutil.rmtree(matrix_dir, ignore_errors=True)
+        os.replace(tmp_dir, matrix_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return manifest
+
+
+def open_feature_matrix(data_path, matrix_dir=DEFAULT_MATRIX_DIR, chunk_rows=DEFAULT_CHUNK_SIZE, rebuild=False):
+    """FeatureMatrix for data_path, (re)building the directory when it is missing or out of date."""
+    if rebuild or not matrix_is_current(data_path, matrix_dir):
+        build_feature_matrix(data_path, matrix_dir, chunk_rows)
+    return FeatureMatrix(matrix_dir)
+
+
+def split_rows(target, test_size=0.2, random_state=42, chunk_rows=DEFAULT_CHUNK_SIZE):
+    """Boolean test-row mask stratified on damage quintiles, like utils.train.split_data.
+
+    The quintile edges are exact up to QUANTILE_SAMPLE_ROWS rows; beyond
+    that they are estimated from a uniform sample of that many target values
+    (so only the sample, not the memory-mapped target, is held in RAM) and
+    are approximate. round(test_size * n) rows of each quintile are drawn as
+    test rows.
+    """
+    rng = np.random.default_rng(random_state)
+    if len(target) > QUANTILE_SAMPLE_ROWS:
+        sample = np.asarray(target[np.sort(rng.choice(len(target), QUANTILE_SAMPLE_ROWS, replace=False))])
+    else:
+        sample = np.asarray(target)
+    edges = np.unique(np.quantile(sample, np.linspace(0, 1, 6)))
+    del sample
+    # Quintile of each row as in pd.qcut(..., duplicates='drop'): intervals closed on the right
+    bins = np.empty(len(target), dtype=np.int8)
+    for start in range(0, len(target), chunk_rows):
+        stop = min(start + chunk_rows, len(target))
+        bins[start:stop] = np.searchsorted(edges[1:-1], target[start:stop], side='left')
+    mask = np.zeros(len(target), dtype=bool)
+    for b in range(max(len(edges) - 1, 1)):
+        rows = np.flatnonzero(bins == b)
+        mask[rng.choice(rows, int(round(test_size * len(rows))), replace=False)] = True
+    return mask
+
+
+def serving_pipeline(model, categories):
+    """Wrap a model fitted on matrix rows in the `--engine hist` pipeline layout (raw DataFrame in)."""
+    import pandas as pd
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, OrdinalEncoder
+
+    # The model was fitted on float32 numerics: round inputs the same way so they fall on the same side
+    # of every split. The encoder maps each category to its matrix code, so it only needs the vocabularies.
+    preprocessor = ColumnTransformer([
+        ('num', FunctionTransformer(np.asarray, kw_args={'dtype': np.float32}), NUMERIC_FEATURES),
+        ('cat', OrdinalEncoder(categories=[np.array(cats, dtype=object) for cats in categories],
+                               handle_unknown='use_encoded_value', unknown_value=np.nan,
+                               encoded_missing_value=np.nan), CATEGORICAL_FEATURES),
+    ])
+    width = max(len(cats) for cats in categories)
+    sample = {col: np.zeros(width) for col in NUMERIC_FEATURES}
+    for col, cats in zip(CATEGORICAL_FEATURES, categories):
+        sample[col] = np.array([cats[i % len(cats)] if cats else np.nan for i in range(width)], dtype=object)
+    preprocessor.fit(pd.DataFrame(sample))
+    return Pipeline([('preprocessor', preprocessor), ('model', model)])
+
+
+def train_out_of_core(data_path, matrix_dir=DEFAULT_MATRIX_DIR, params=None, test_size=0.2,
+                      chunk_rows=DEFAULT_CHUNK_SIZE, rebuild=False, max_train_rows=None):
+    """Build (or reuse) the feature matrix, fit the hist engine from it and evaluate; returns (pipeline, report).
+
+    With max_train_rows, the model is fitted on a uniform sample of that
+    many training rows. The report has the layout of utils.train.train()'s
+    (without CV).
+    """
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    from .evaluation import EvaluationAccumulator
+    from .train import DEFAULT_PARAMS
+
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    model_params = dict(params)
+    timings = {}
+    start = time.perf_counter()
+    matrix = open_feature_matrix(data_path, matrix_dir, chunk_rows, rebuild)
+    timings['load_seconds'] = time.perf_counter() - start
+    if not matrix.rows:
+        raise ValueError(f'{data_path}: no rows with coordinates to train on')
+
+    is_test = split_rows(matrix.target, test_size, params['random_state'], chunk_rows)
+    is_train = ~is_test
+    train_rows = int(is_train.sum())
+    if max_train_rows and train_rows > max_train_rows:
+        rng = np.random.default_rng(params['random_state'])
+        sample = rng.choice(np.flatnonzero(is_train), max_train_rows, replace=False)
+        is_train[:] = False
+        is_train[sample] = True
+        train_rows = max_train_rows
+    n_numeric = len(NUMERIC_FEATURES)
+    width = n_numeric + len(CATEGORICAL_FEATURES)
+    model = HistGradientBoostingRegressor(
+        loss='absolute_error',
+        max_iter=model_params.pop('n_estimators'),
+        categorical_features=list(range(n_numeric, width)),
+        early_stopping=False,
+        **model_params,
+    )
+
+    t = time.perf_counter()
+    scratch_path = os.path.join(matrix.path, f'fit.{os.getpid()}.f32')
+    try:
+        # float32 holds the numerics and the small codes exactly
+        X_train = np.memmap(scratch_path, dtype=np.float32, mode='w+', shape=(train_rows, width))
+        y_train = np.empty(train_rows, dtype=np.float64)
+        done = 0
+        for block_start in range(0, matrix.rows, chunk_rows):
+            block_stop = min(block_start + chunk_rows, matrix.rows)
+            keep = is_train[block_start:block_stop]
+            block = matrix.model_block(slice(block_start, block_stop))[keep]
+            X_train[done:done + len(block)] = block
+            y_train[done:done + len(block)] = np.log1p(matrix.target[block_start:block_stop][keep])
+            done += len(block)
+        X_train.flush()
+        model.fit(X_train, y_train)
+        del X_train, y_train
+    finally:
+        if os.path.exists(scratch_path):
+            os.remove(scratch_path)
+    timings['fit_seconds'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    test_index = np.flatnonzero(is_test)
+    accumulator = EvaluationAccumulator()
+    # Code -1 (missing) picks the trailing None
+    labels = {col: np.array(cats + [None], dtype=object)
+              for col, cats in zip(CATEGORICAL_FEATURES, matrix.categories)}
+    for i in range(0, len(test_index), chunk_rows):
+        rows = test_index[i:i + chunk_rows]
+        y_pred = np.expm1(np.clip(model.predict(matrix.model_block(rows)), 0, None))
+        codes = matrix.codes[rows]
+        groups = {col: labels[col][codes[:, j]] for j, col in enumerate(CATEGORICAL_FEATURES)}
+        accumulator.update(matrix.target[rows], y_pred, groups)
+    evaluation = accumulator.report(data=os.path.abspath(data_path), split='test', engine='hist')
+    metrics = dict(evaluation['metrics'])
+    timings['evaluate_seconds'] = time.perf_counter() - t
+    timings['total_seconds'] = time.perf_counter() - start
+
+    report = {
+        'engine': 'hist',
+        'out_of_core': True,
+        'params': params,
+        'data': os.path.abspath(data_path),
+        'matrix': {'path': matrix.path, 'bytes': matrix.manifest['bytes'],
+                   'source_rows': matrix.manifest['source_rows']},
+        'rows': {'train': train_rows, 'test': len(test_index),
+                 'unused': int(matrix.rows - train_rows - len(test_index))},
+        'metrics': metrics,
+        'cv_r2': None,
+        'cv_jobs': None,
+        'timings': timings,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'trained_at': time.time(),
+        'evaluation': evaluation,
+    }
+    return serving_pipeline(model, matrix.categories), report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.feature_matrix',
+                                     description='Build the on-disk feature matrix for out-of-core training.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='stream a StormEvents CSV into a feature matrix directory')
+    build.add_argument('data', help='StormEvents CSV (e.g. StormEvents_cleaned.csv)')
+    build.add_argument('--dir', default=DEFAULT_MATRIX_DIR, help=f'matrix directory (default: {DEFAULT_MATRIX_DIR})')
+    build.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_SIZE)
+    info = sub.add_parser('info', help='describe a feature matrix directory')
+    info.add_argument('--dir', default=DEFAULT_MATRIX_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'build':
+            manifest = build_feature_matrix(args.data, args.dir, args.chunk_rows)
+        else:
+            manifest = FeatureMatrix(args.dir).manifest
+    except (OSError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    print(f"{manifest['rows']:,} of {manifest['source_rows']:,} events, {format_bytes(manifest['bytes'])} "
+          f"({manifest['bytes'] / max(manifest['rows'], 1):.0f} bytes per event), built in "
+          f"{manifest['build_seconds']:.1f}s; peak RSS {format_bytes(peak_rss_bytes())}")
+    for col, cats in zip(manifest['categorical_features'], manifest['categories']):
+        print(f'  {col}: {len(cats)} categories')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
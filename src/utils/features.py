@@ -0,0 +1,196 @@
+# utils/features.py - Vectorized event features shared by training and prediction
+#
+# Everything here works on whole columns with NumPy:
+#   parse_datetimes   StormEvents timestamps ("19-DEC-23 13:02:00") to
+#                     datetime64[s], decoded from the fixed-width character
+#                     codes instead of one strptime call per row
+#   duration_hours    END_DATE_TIME - BEGIN_DATE_TIME in hours (DURATION_HOURS)
+#   haversine_km      great-circle distance between coordinate arrays
+#   calendar_features year, month, month name, day of year/week and hour
+#   event_features    all of the above for a StormEvents frame
+#
+# Usage:
+#   from utils.features import duration_hours, event_features
+#   df['DURATION_HOURS'] = duration_hours(df['BEGIN_DATE_TIME'], df['END_DATE_TIME'])
+
+import datetime
+
+import numpy as np
+
+from .model_utils import MONTHS
+
+# Timestamp format of the StormEvents BEGIN_/END_DATE_TIME columns
+DATETIME_FORMAT = '%d-%b-%y %H:%M:%S'
+# Mean Earth radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+# Character layout of DATETIME_FORMAT with a two-digit day ("19-DEC-23 13:02:00")
+_WIDTH = 18
+_SEPARATORS = {2: '-', 6: '-', 9: ' ', 12: ':', 15: ':'}
+_MONTH_ABBREVIATIONS = [m[:3].upper() for m in MONTHS]
+
+
+def _month_table():
+    # Month number (1-12) of every three upper-case letter code, 0 for anything else
+    table = np.zeros(26 ** 3, dtype=np.int64)
+    for number, abbreviation in enumerate(_MONTH_ABBREVIATIONS, start=1):
+        a, b, c = (ord(ch) - ord('A') for ch in abbreviation)
+        table[(a * 26 + b) * 26 + c] = number
+    return table
+
+
+_MONTH_TABLE = _month_table()
+
+
+def _century_pivot():
+    # Two-digit years above this one are 19xx: the archive starts in 1950, so
+    # strptime's %y pivot (00-68 as 20xx) would date 1950-1968 events in 2050-2068
+    return datetime.date.today().year % 100
+
+
+def _fixed_width_datetimes(chars):
+    """Decode an (n, _WIDTH + 1) uint32 array of character codes; returns (datetime64[s], valid mask)."""
+    valid = (chars[:, _WIDTH] == 0) & (chars[:, _WIDTH - 1] != 0)
+    for position, separator in _SEPARATORS.items():
+        valid &= chars[:, position] == ord(separator)
+
+    def number(*positions):
+        value = np.zeros(len(chars), dtype=np.int64)
+        for position in positions:
+            digit = chars[:, position].astype(np.int64) - ord('0')
+            valid[(digit < 0) | (digit > 9)] = False
+            value = value * 10 + digit
+        return value
+
+    day, year, hour, minute, second = number(0, 1), number(7, 8), number(10, 11), number(13, 14), number(16, 17)
+    letters = (chars[:, 3:6].astype(np.int64) & ~0x20) - ord('A')  # & ~0x20 upper-cases ASCII letters
+    valid &= ((letters >= 0) & (letters < 26)).all(axis=1)
+    month = _MONTH_TABLE[np.where(valid, (letters[:, 0] * 26 + letters[:, 1]) * 26 + letters[:, 2], 0)]
+    year = np.where(year > _century_pivot(), 1900 + year, 2000 + year)
+    valid &= (month > 0) & (hour < 24) & (minute < 60) & (second < 60)
+
+    month_start = ((year - 1970) * 12 + np.maximum(month, 1) - 1).astype('datetime64[M]')
+    days_in_month = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    valid &= (day >= 1) & (day <= days_in_month)
+    seconds = (day - 1) * 86400 + hour * 3600 + minute * 60 + second
+    result = month_start.astype('datetime64[s]') + seconds.astype('timedelta64[s]')
+    result[~valid] = np.datetime64('NaT')
+    return result, valid
+
+
+def parse_datetimes(values, format=DATETIME_FORMAT):
+    """datetime64[s] array of timestamp strings in format; NaT for missing or unparseable values.
+
+    Strings laid out like DATETIME_FORMAT with a two-digit day are decoded
+    arithmetically from their character codes. Anything else (another
+    format, a one-digit day) goes through pandas.to_datetime with the
+    explicit format, so both paths accept exactly the same strings. Two-digit
+    years (%y) after the current year are dated in the 1900s.
+    """
+    if isinstance(values, str):
+        return parse_datetimes([values], format)[0]
+    chars = np.asarray(values, dtype=f'U{_WIDTH + 1}')
+    shape = chars.shape
+    chars = chars.reshape(-1)
+    if format == DATETIME_FORMAT:
+        result, valid = _fixed_width_datetimes(chars.view(np.uint32).reshape(len(chars), _WIDTH + 1))
+    else:
+        result, valid = np.full(len(chars), np.datetime64('NaT'), dtype='datetime64[s]'), np.zeros(len(chars), bool)
+    rest = np.flatnonzero(~valid)
+    if len(rest):
+        import pandas as pd
+
+        original = np.asarray(values, dtype=object).reshape(-1)[rest]
+        parsed = pd.to_datetime(pd.Series(original, dtype=object), format=format, errors='coerce')
+        if '%y' in format:
+            future = parsed.dt.year > 2000 + _century_pivot()
+            parsed = parsed.mask(future, parsed - pd.DateOffset(years=100))
+        result[rest] = parsed.to_numpy(dtype='datetime64[s]')
+    return result.reshape(shape)
+
+
+def as_datetimes(values, format=DATETIME_FORMAT):
+    """datetime64[s] array (or scalar) of datetime-like values or timestamp strings."""
+    array = np.asarray(values)
+    if array.dtype.kind == 'M':
+        return array.astype('datetime64[s]')
+    if array.dtype.kind in 'US':
+        return parse_datetimes(array, format)
+    if array.dtype == object:
+        first = next((v for v in array.flat if v is not None and v == v), None)
+        if isinstance(first, (datetime.date, np.datetime64)):
+            try:
+                return array.astype('datetime64[s]')
+            except (TypeError, ValueError):
+                # Datetimes mixed with NaN or pandas NaT
+                import pandas as pd
+
+                times = pd.to_datetime(pd.Series(array.reshape(-1)))
+                return times.to_numpy(dtype='datetime64[s]').reshape(array.shape)
+        return parse_datetimes(array, format)
+    return array.astype('datetime64[s]')
+
+
+def duration_hours(begin, end, format=DATETIME_FORMAT):
+    """Hours from begin to end (DURATION_HOURS); NaN when either time is unknown.
+
+    begin and end are arrays, Series or scalars of timestamp strings (in
+    format) or datetime-like values.
+    """
+    delta = as_datetimes(end, format) - as_datetimes(begin, format)
+    return delta / np.timedelta64(3600, 's')
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between (lat1, lon1) and (lat2, lon2), in degrees; NaN when any is missing."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def calendar_features(times, format=DATETIME_FORMAT):
+    """Calendar columns of times as a dict of arrays.
+
+    YEAR, MONTH, DAY_OF_YEAR, DAY_OF_WEEK (0 is Monday) and HOUR are
+    floats, NaN when the time is unknown; MONTH_NAME holds month names or
+    None.
+    """
+    times = np.atleast_1d(as_datetimes(times, format))
+    known = ~np.isnat(times)
+    year = times.astype('datetime64[Y]')
+    month = times.astype('datetime64[M]')
+    day = times.astype('datetime64[D]')
+
+    def column(values):
+        return np.where(known, values, np.nan)
+
+    month_number = (month - year.astype('datetime64[M]')).astype(np.int64) + 1
+    names = np.array(MONTHS + [None], dtype=object)
+    return {
+        'YEAR': column(year.astype(np.int64) + 1970),
+        'MONTH': column(month_number),
+        'MONTH_NAME': names[np.where(known, month_number - 1, len(MONTHS))],
+        'DAY_OF_YEAR': column((day - year.astype('datetime64[D]')).astype(np.int64) + 1),
+        # 1970-01-01 was a Thursday
+        'DAY_OF_WEEK': column((day.astype(np.int64) + 3) % 7),
+        'HOUR': column((times - day).astype('timedelta64[h]').astype(np.int64)),
+    }
+
+
+def event_features(df, format=DATETIME_FORMAT):
+    """DURATION_HOURS, TRACK_LENGTH_KM and the BEGIN_DATE_TIME calendar features of a StormEvents frame.
+
+    Returns a DataFrame on df's index; features whose input columns are
+    not in df are left out.
+    """
+    import pandas as pd
+
+    features = {}
+    if 'BEGIN_DATE_TIME' in df.columns:
+        begin = as_datetimes(df['BEGIN_DATE_TIME'], format)
+        if 'END_DATE_TIME' in df.columns:
+            features['DURATION_HOURS'] = (as_datetimes(df['END_DATE_TIME'], format) - begin) / np.timedelta64(3600, 's')
+        features.update(calendar_features(begin))
+    if {'BEGIN_LAT', 'BEGIN_LON', 'END_LAT', 'END_LON'} <= set(df.columns):
+        features['TRACK_LENGTH_KM'] = haversine_km(df['BEGIN_LAT'], df['BEGIN_LON'], df['END_LAT'], df['END_LON'])
+    return pd.DataFrame(features, index=df.index)
@@ -0,0 +1,132 @@
+# utils/figures.py - Statistics page charts rendered once per dataset version
+#
+# Charts are drawn on standalone matplotlib Figure objects (not through
+# pyplot, which keeps every figure alive until it is closed), saved to
+# PNG or SVG bytes and stored under <cache dir>/figures/. A rerun of the
+# page only reads the stored bytes; the figure is redrawn when the dataset
+# version changes, and older renderings of the same chart are removed.
+# matplotlib and seaborn are only imported when a chart is actually drawn.
+
+import hashlib
+import io
+import os
+
+from .data_utils import DEFAULT_CACHE_DIR
+
+# Bump when the look of the charts changes so stored renderings are redrawn
+FIGURES_VERSION = 1
+
+# Text sizes shared by all charts
+FIGURE_RC = {
+    'font.size': 12,
+    'axes.titlesize': 16,
+    'axes.labelsize': 14,
+    'xtick.labelsize': 11,
+    'ytick.labelsize': 11,
+    'legend.fontsize': 12,
+}
+
+
+def _to_bytes(fig, fmt):
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, bbox_inches='tight', dpi=100)
+    # Drop the figure's references to its artists right away
+    fig.clear()
+    return buf.getvalue()
+
+
+def _styled():
+    """Context applying the page style (seaborn whitegrid + FIGURE_RC) to new figures."""
+    import matplotlib
+    import seaborn as sns
+
+    style = dict(sns.axes_style('whitegrid'), **FIGURE_RC)
+    return matplotlib.rc_context(style)
+
+
+def render_event_counts(event_counts, fmt='png'):
+    """Horizontal bar chart of the top 10 event types; returns image bytes."""
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    event_counts = event_counts.head(10).astype(int)
+    with _styled():
+        fig = Figure(figsize=(12, 8))
+        ax = fig.subplots()
+        colors = sns.color_palette("viridis", len(event_counts))
+        sns.barplot(y=event_counts.index, x=event_counts.values, ax=ax, palette=colors)
+        ax.set_title("Top 10 Storm Event Types by Count", fontsize=18, fontweight='bold', pad=20)
+        ax.set_xlabel("Count", fontsize=14)
+        ax.set_ylabel("Event Type", fontsize=14)
+        ax.grid(True, alpha=0.3, axis='x')
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        ax.spines['left'].set_visible(True)
+        ax.spines['left'].set_color('gray')
+        ax.spines['left'].set_linewidth(0.5)
+        # Add value labels on bars
+        for i, v in enumerate(event_counts.values):
+            ax.text(v + max(event_counts.values) * 0.01, i, str(v), va='center', fontsize=11)
+        return _to_bytes(fig, fmt)
+
+
+def render_correlation(correlation_matrix, fmt='png'):
+    """Lower-triangle annotated correlation heatmap; returns image bytes."""
+    import numpy as np
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    with _styled():
+        fig = Figure(figsize=(14, 12))
+        ax = fig.subplots()
+        mask = np.triu(np.ones_like(correlation_matrix, dtype=bool))
+        sns.heatmap(correlation_matrix, annot=True, fmt=".2f", cmap='coolwarm', center=0,
+                    square=True, ax=ax, cbar_kws={'shrink': 0.8}, mask=mask,
+                    annot_kws={"fontsize": 8})
+        ax.set_title("Feature Correlation Heatmap", fontsize=18, fontweight='bold', pad=20)
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right')
+        ax.tick_params(axis='y', labelrotation=0)
+        return _to_bytes(fig, fmt)
+
+
+def figure_path(name, version, fmt='png', cache_dir=DEFAULT_CACHE_DIR):
+    key = hashlib.sha256(f'{FIGURES_VERSION}:{version}'.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, 'figures', f'{name}-{key}.{fmt}')
+
+
+def _remove_stale(path):
+    directory, filename = os.path.split(path)
+    prefix = filename.rsplit('-', 1)[0] + '-'
+    suffix = os.path.splitext(filename)[1]
+    for other in os.listdir(directory):
+        if other != filename and other.startswith(prefix) and other.endswith(suffix) \
+                and len(other) == len(filename):
+            try:
+                os.remove(os.path.join(directory, other))
+            except OSError:
+                pass
+
+
+def cached_figure(name, version, render, data, fmt='png', cache_dir=DEFAULT_CACHE_DIR):
+    """Return the image bytes of chart name for a dataset version, rendering it at most once.
+
+    render(data, fmt=fmt) is only called when no rendering is stored for
+    this version; the result is written to disk for later reruns and
+    processes, and renderings for other versions are deleted.
+    """
+    path = figure_path(name, version, fmt, cache_dir)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        pass
+    image = render(data, fmt=fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(image)
+    os.replace(tmp_path, path)
+    _remove_stale(path)
+    return image
@@ -0,0 +1,514 @@
+# utils/flat_model.py - Array-backed export of the damage model pipeline
+#
+# The sklearn pipeline spends most of a prediction in per-call overhead:
+# ColumnTransformer dispatch, a dense one-hot matrix and a Python-level loop
+# over 200 trees. FlatModel holds the same fitted state as a handful of flat
+# numpy arrays (imputer/scaler parameters, category vocabularies and the
+# node feature/threshold/child/value arrays of every tree) and evaluates all
+# trees at once with vectorized numpy, producing exactly the same floats as
+# pipeline.predict. Events are fed through preprocess_input's FeatureEncoder
+# fast path, so splits on one-hot columns are evaluated as comparisons on
+# integer category codes and the one-hot matrix is never built.
+#
+# A model is saved either as a single .npz file or as an artifact
+# directory: a manifest.json (format version, model metadata, and the
+# dtype, shape and sha256 of every array) next to one .npy file per array,
+# including the split tables compiled for prediction. Artifacts are opened
+# with read-only memory maps, so loading reads only the headers and every
+# process serving the same artifact shares one copy in the page cache.
+# Neither format involves unpickling.
+#
+# Usage (from the src directory):
+#   python -m utils.flat_model damage_model_pipeline.pkl damage_model_flat.npz --verify events.csv
+#   python -m utils.flat_model damage_model_pipeline.pkl damage_model_artifact
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from .instrumentation import stage
+from .model_utils import ARTIFACT_MANIFEST, FeatureEncoder, _file_sha256, preprocess_input, read_events
+
+FORMAT_NAME = 'storm-damage-flat-model'
+FORMAT_VERSION = 1
+
+ARTIFACT_FORMAT = 'storm-damage-model-artifact'
+ARTIFACT_VERSION = 1
+
+# Prediction tables derived from the tree arrays, stored in artifacts so
+# memory-mapped loads need not rebuild (and copy) them
+_COMPILED = ('node_col', 'node_lo', 'node_hi', 'node_children')
+
+# Kinds of transformed (model input) columns
+NUMERIC = 0
+ONE_HOT = 1
+
+# Rows evaluated together; bounds the (trees x rows) traversal state
+_BLOCK_ROWS = 1024
+
+
+def _steps(transformer):
+    """Return the fitted steps of a ColumnTransformer entry as a name -> estimator dict."""
+    from sklearn.pipeline import Pipeline
+
+    if isinstance(transformer, Pipeline):
+        return {type(step).__name__: step for _, step in transformer.steps}
+    return {type(transformer).__name__: transformer}
+
+
+def _export_numeric(steps, columns):
+    allowed = {'SimpleImputer', 'StandardScaler'}
+    if set(steps) - allowed:
+        raise ValueError(f"Unsupported numeric preprocessing steps: {sorted(set(steps) - allowed)}")
+    n = len(columns)
+    fill = np.full(n, np.nan)
+    mean = np.zeros(n)
+    scale = np.ones(n)
+    imputer = steps.get('SimpleImputer')
+    if imputer is not None:
+        if getattr(imputer, 'add_indicator', False) or len(imputer.statistics_) != n:
+            raise ValueError("Unsupported numeric SimpleImputer configuration")
+        fill = np.asarray(imputer.statistics_, dtype=np.float64)
+    scaler = steps.get('StandardScaler')
+    if scaler is not None:
+        if scaler.mean_ is not None:
+            mean = np.asarray(scaler.mean_, dtype=np.float64)
+        if scaler.scale_ is not None:
+            scale = np.asarray(scaler.scale_, dtype=np.float64)
+    return fill, mean, scale
+
+
+def _export_categorical(steps, columns):
+    allowed = {'SimpleImputer', 'OneHotEncoder'}
+    if set(steps) - allowed or 'OneHotEncoder' not in steps:
+        raise ValueError(f"Unsupported categorical preprocessing steps: {sorted(steps)}")
+    ohe = steps['OneHotEncoder']
+    if ohe.drop is not None or getattr(ohe, '_infrequent_enabled', False):
+        raise ValueError("OneHotEncoder with drop or infrequent categories is not supported")
+    if ohe.handle_unknown not in ('ignore', 'infrequent_if_exist'):
+        raise ValueError("OneHotEncoder must use handle_unknown='ignore'")
+    fills = [None] * len(columns)
+    imputer = steps.get('SimpleImputer')
+    if imputer is not None:
+        if imputer.strategy != 'constant' or getattr(imputer, 'add_indicator', False):
+            raise ValueError("Only SimpleImputer(strategy='constant') is supported for categories")
+        fills = [str(v) for v in imputer.statistics_]
+    categories = []
+    for col, cats in zip(columns, ohe.categories_):
+        if not all(isinstance(c, str) for c in cats):
+            raise ValueError(f"Categories of '{col}' must all be strings")
+        categories.append(np.asarray(cats, dtype=str))
+    return fills, categories
+
+
+def _export_trees(gbr):
+    from sklearn.dummy import DummyRegressor
+
+    if gbr.estimators_.shape[1] != 1:
+        raise ValueError("Only single-output regressors are supported")
+    if isinstance(gbr.init_, str) and gbr.init_ == 'zero':
+        init = 0.0
+    elif isinstance(gbr.init_, DummyRegressor):
+        init = float(np.ravel(gbr.init_.constant_)[0])
+    else:
+        raise ValueError("Only the default (constant) init estimator is supported")
+
+    roots, feature, threshold, left, right, value = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in gbr.estimators_[:, 0]:
+        tree = est.tree_
+        ids = np.arange(tree.node_count, dtype=np.int32) + offset
+        is_leaf = tree.children_left == -1
+        # Leaves point at themselves so a fixed number of steps can be taken
+        left.append(np.where(is_leaf, ids, tree.children_left + offset).astype(np.int32))
+        right.append(np.where(is_leaf, ids, tree.children_right + offset).astype(np.int32))
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+        value.append(tree.value[:, 0, 0].astype(np.float64))
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {
+        'tree_roots': np.asarray(roots, dtype=np.int32),
+        'node_feature': np.concatenate(feature),
+        'node_threshold': np.concatenate(threshold),
+        'node_left': np.concatenate(left),
+        'node_right': np.concatenate(right),
+        'node_value': np.concatenate(value),
+    }
+    return arrays, init, max_depth
+
+
+class FlatModel:
+    """Array-backed damage model with the predict() contract of the sklearn pipeline.
+
+    Build one with FlatModel.from_pipeline(pipeline) (or export_flat_model),
+    persist it with save() and read it back with FlatModel.load(). predict()
+    accepts the same event DataFrames as the pipeline and returns the same
+    raw log-scale predictions, bit for bit.
+    """
+
+    def __init__(self, arrays, meta, compiled=None):
+        self.arrays = arrays
+        self.meta = meta
+        self.numeric_features = list(meta['numeric_features'])
+        self.categorical_features = list(meta['categorical_features'])
+        self.learning_rate = float(meta['learning_rate'])
+        self.init = float(meta['init'])
+        self.max_depth = int(meta['max_depth'])
+        self.encoder = FeatureEncoder(
+            self.numeric_features, arrays['num_fill'], arrays['num_mean'], arrays['num_scale'],
+            self.categorical_features,
+            [arrays[f'categories_{i}'].tolist() for i in range(len(self.categorical_features))],
+            meta['categorical_fill'],
+        )
+        if compiled is None:
+            compiled = self._compile_nodes()
+        self._node_col = _as_intp(compiled['node_col'])
+        self._node_lo = compiled['node_lo']
+        self._node_hi = compiled['node_hi']
+        self._node_children = _as_intp(compiled['node_children'])
+
+    def _compile_nodes(self):
+        """Re-target every split from the one-hot layout onto the encoder's compact rows.
+
+        A row goes right at a node when lo < x <= hi. Numeric splits use
+        (threshold, inf], i.e. "not x <= threshold" as in sklearn. A split on
+        one-hot column "category c" becomes (c - 0.5, c] on the code column,
+        i.e. "code == c", which is where the 0/1 indicator would go right.
+        """
+        a = self.arrays
+        kind, source, code = a['col_kind'], a['col_source'], a['col_code']
+        n_numeric = len(self.numeric_features)
+        compact_col = np.where(kind == NUMERIC, source, n_numeric + source)
+
+        feature = a['node_feature']
+        threshold = a['node_threshold']
+        is_leaf = a['node_left'] == np.arange(len(feature))
+        is_hot = (kind[feature] == ONE_HOT) & ~is_leaf
+        hot_threshold = threshold[is_hot]
+        if np.any((hot_threshold < 0) | (hot_threshold >= 1)):
+            raise ValueError("One-hot split thresholds must lie in [0, 1)")
+        node_code = code[feature].astype(np.float64)
+
+        # Features are float32, so "x <= threshold" is exactly "x <= t" with t
+        # the largest float32 not above the float64 threshold
+        threshold32 = threshold.astype(np.float32)
+        rounded_up = threshold32 > threshold
+        threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+
+        return {
+            'node_col': compact_col[feature].astype(np.intp),
+            'node_lo': np.where(is_hot, node_code - 0.5, threshold32).astype(np.float32),
+            'node_hi': np.where(is_hot, node_code, np.inf).astype(np.float32),
+            # children[2 * node + went_right] -> next node
+            'node_children': np.stack([a['node_left'], a['node_right']], axis=1).ravel().astype(np.intp),
+        }
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Export a fitted preprocessor + GradientBoostingRegressor pipeline."""
+        from sklearn.ensemble import GradientBoostingRegressor
+
+        preprocessor = pipeline.named_steps['preprocessor']
+        gbr = pipeline.named_steps['model']
+        if not isinstance(gbr, GradientBoostingRegressor):
+            raise ValueError(f"Cannot flatten a {type(gbr).__name__}; only GradientBoostingRegressor is supported")
+
+        numeric_features, categorical_features = [], []
+        num_fill, num_mean, num_scale = [], [], []
+        cat_fill, cat_categories = [], []
+        # Layout of the transformed matrix: (kind, source column, category code)
+        col_kind, col_source, col_code = [], [], []
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            if transformer == 'passthrough':
+                raise ValueError("Passthrough columns are not supported")
+            steps = _steps(transformer)
+            columns = list(columns)
+            if 'OneHotEncoder' in steps:
+                fills, categories = _export_categorical(steps, columns)
+                for col, fill, cats in zip(columns, fills, categories):
+                    source = len(categorical_features)
+                    categorical_features.append(col)
+                    cat_fill.append(fill)
+                    cat_categories.append(cats)
+                    col_kind += [ONE_HOT] * len(cats)
+                    col_source += [source] * len(cats)
+                    col_code += list(range(len(cats)))
+            else:
+                fill, mean, scale = _export_numeric(steps, columns)
+                for i, col in enumerate(columns):
+                    col_kind.append(NUMERIC)
+                    col_source.append(len(numeric_features))
+                    col_code.append(-1)
+                    numeric_features.append(col)
+                    num_fill.append(fill[i])
+                    num_mean.append(mean[i])
+                    num_scale.append(scale[i])
+
+        if len(col_kind) != gbr.n_features_in_:
+            raise ValueError("Preprocessor output does not match the model's input width")
+
+        arrays, init, max_depth = _export_trees(gbr)
+        arrays.update({
+            'num_fill': np.asarray(num_fill, dtype=np.float64),
+            'num_mean': np.asarray(num_mean, dtype=np.float64),
+            'num_scale': np.asarray(num_scale, dtype=np.float64),
+            'col_kind': np.asarray(col_kind, dtype=np.int8),
+            'col_source': np.asarray(col_source, dtype=np.int32),
+            'col_code': np.asarray(col_code, dtype=np.int32),
+        })
+        for i, cats in enumerate(cat_categories):
+            arrays[f'categories_{i}'] = cats
+        meta = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'numeric_features': numeric_features,
+            'categorical_features': categorical_features,
+            'categorical_fill': cat_fill,
+            'learning_rate': float(gbr.learning_rate),
+            'init': init,
+            'max_depth': max_depth,
+            'n_trees': int(len(arrays['tree_roots'])),
+        }
+        return cls(arrays, meta)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r', verify=False):
+        """Read a model written by save() or save_artifact(); no pickled objects are involved.
+
+        Artifact directories are memory-mapped with mmap_mode ('r' by
+        default; None reads the arrays into memory). verify=True also checks
+        every array file against the sha256 recorded in the manifest.
+        """
+        if os.path.isdir(path):
+            return cls._load_artifact(path, mmap_mode, verify)
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        meta = json.loads(str(arrays.pop('meta')))
+        if meta.get('format') != FORMAT_NAME or meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} flat damage model")
+        return cls(arrays, meta)
+
+    @classmethod
+    def _load_artifact(cls, path, mmap_mode, verify):
+        manifest_path = os.path.join(path, ARTIFACT_MANIFEST)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != ARTIFACT_FORMAT or manifest.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"{path} is not a version {ARTIFACT_VERSION} damage model artifact")
+        meta = manifest['model']
+        if meta.get('format') != FORMAT_NAME or meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"{path} holds an unsupported flat model version")
+        arrays, compiled = {}, {}
+        for name, entry in manifest['arrays'].items():
+            file_path = os.path.join(path, entry['file'])
+            if verify and _file_sha256(file_path) != entry['sha256']:
+                raise ValueError(f"{file_path} does not match its checksum in {ARTIFACT_MANIFEST}")
+            array = np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
+            if str(array.dtype) != entry['dtype'] or list(array.shape) != entry['shape']:
+                raise ValueError(f"{file_path} does not match the dtype/shape in {ARTIFACT_MANIFEST}")
+            if name.startswith('compiled_'):
+                compiled[name[len('compiled_'):]] = array
+            else:
+                arrays[name] = array
+        if set(compiled) != set(_COMPILED):
+            compiled = None
+        return cls(arrays, meta, compiled)
+
+    def save(self, path):
+        """Write the model to a single .npz file."""
+        np.savez(path, meta=np.asarray(json.dumps(self.meta)), **self.arrays)
+
+    def save_artifact(self, path):
+        """Write the model as a memory-mappable artifact directory, replacing any existing one.
+
+        The directory is written under a temporary name and renamed into
+        place, so readers never see a partial artifact; processes that
+        still map the old files keep using them until they reload.
+        """
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        tmp_path = os.path.join(parent, f'.{os.path.basename(path)}.{os.getpid()}.tmp')
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            arrays = dict(self.arrays)
+            arrays.update({f'compiled_{name}': getattr(self, f'_{name}') for name in _COMPILED})
+            entries = {}
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                if array.dtype == np.intp:
+                    array = array.astype(np.int64)
+                filename = f'{name}.npy'
+                np.save(os.path.join(tmp_path, filename), array, allow_pickle=False)
+                entries[name] = {
+                    'file': filename,
+                    'dtype': str(array.dtype),
+                    'shape': list(array.shape),
+                    'sha256': _file_sha256(os.path.join(tmp_path, filename)),
+                }
+            manifest = {
+                'format': ARTIFACT_FORMAT,
+                'version': ARTIFACT_VERSION,
+                'created_at': time.time(),
+                'model': self.meta,
+                'arrays': entries,
+            }
+            with open(os.path.join(tmp_path, ARTIFACT_MANIFEST), 'w') as f:
+                json.dump(manifest, f, indent=2)
+            old_path = None
+            if os.path.exists(path):
+                old_path = os.path.join(parent, f'.{os.path.basename(path)}.{os.getpid()}.old')
+                os.replace(path, old_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        if old_path is not None:
+            shutil.rmtree(old_path, ignore_errors=True)
+        return path
+
+    @property
+    def n_trees(self):
+        return len(self.arrays['tree_roots'])
+
+    def transform(self, data):
+        """Return the dense float32 matrix the sklearn preprocessor would produce.
+
+        Prediction never builds this matrix; it is kept for checking the
+        encoder against ColumnTransformer.transform.
+        """
+        encoded = preprocess_input(data, encoder=self.encoder)
+        kind = self.arrays['col_kind']
+        source = self.arrays['col_source']
+        n_numeric = len(self.numeric_features)
+        out = np.empty((len(encoded), len(kind)), dtype=np.float32)
+        num_cols = kind == NUMERIC
+        out[:, num_cols] = encoded[:, source[num_cols]]
+        hot_cols = ~num_cols
+        out[:, hot_cols] = encoded[:, n_numeric + source[hot_cols]] == self.arrays['col_code'][hot_cols]
+        return out
+
+    def _predict_encoded(self, X):
+        roots = self.arrays['tree_roots'].astype(np.intp)
+        node_col, lo, hi = self._node_col, self._node_lo, self._node_hi
+        children = self._node_children
+        value = self.arrays['node_value']
+        n_cols = X.shape[1]
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), _BLOCK_ROWS):
+            block = np.ascontiguousarray(X[start:start + _BLOCK_ROWS])
+            n = len(block)
+            cells = block.ravel()
+            row_base = (np.arange(n, dtype=np.intp) * n_cols)[None, :]
+            # Traversal state for every (tree, row) pair, advanced one level per step
+            nodes = np.repeat(roots[:, None], n, axis=1)
+            idx = np.empty_like(nodes)
+            x = np.empty(nodes.shape, dtype=np.float32)
+            went_right = np.empty(nodes.shape, dtype=bool)
+            below_hi = np.empty(nodes.shape, dtype=bool)
+            for _ in range(self.max_depth):
+                np.take(node_col, nodes, out=idx)
+                idx += row_base
+                np.take(cells, idx, out=x)
+                np.less(np.take(lo, nodes), x, out=went_right)
+                np.less_equal(x, np.take(hi, nodes), out=below_hi)
+                went_right &= below_hi
+                nodes *= 2
+                nodes += went_right
+                np.take(children, nodes, out=nodes)
+            leaves = np.take(value, nodes)
+            # Accumulate tree by tree, exactly like sklearn's predict_stages
+            raw = np.full(n, self.init)
+            for tree_leaves in leaves:
+                raw += self.learning_rate * tree_leaves
+            out[start:start + n] = raw
+        return out
+
+    def predict(self, data):
+        """Return raw (log-scale) predictions, identical to pipeline.predict."""
+        encoded = preprocess_input(data, encoder=self.encoder)
+        with stage('tree_eval'):
+            return self._predict_encoded(encoded)
+
+
+def _as_intp(array):
+    # Index arrays are stored as int64; only a 32-bit platform needs a converted copy
+    return array if array.dtype == np.intp else array.astype(np.intp)
+
+
+def export_flat_model(pipeline, path=None):
+    """Convert a fitted pipeline (or a path to its pickle) into a FlatModel.
+
+    When path is given the model is also saved there: a .npz path writes a
+    single file, any other path an artifact directory (see save_artifact).
+    """
+    if isinstance(pipeline, str):
+        import joblib
+
+        pipeline = joblib.load(pipeline)
+    flat = FlatModel.from_pipeline(pipeline)
+    if path is not None:
+        if path.endswith('.npz'):
+            flat.save(path)
+        else:
+            flat.save_artifact(path)
+    return flat
+
+
+def verify_flat_model(pipeline, flat, data):
+    """Compare a FlatModel with the pipeline it was exported from.
+
+    Returns (feature_mismatches, prediction_mismatches): the number of rows
+    whose encoded features, expanded back to one-hot, differ from the
+    ColumnTransformer output, and the number of rows whose predictions
+    differ at all. Both are 0 for a faithful export.
+    """
+    frame = preprocess_input(data)
+    expected_features = pipeline.named_steps['preprocessor'].transform(frame).astype(np.float32)
+    feature_mismatches = int(np.sum(np.any(flat.transform(frame) != expected_features, axis=1)))
+    prediction_mismatches = int(np.sum(pipeline.predict(frame) != flat.predict(frame)))
+    return feature_mismatches, prediction_mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.flat_model',
+                                     description='Export the damage pipeline to a flat array model.')
+    parser.add_argument('pipeline', help='trained pipeline pickle (damage_model_pipeline.pkl)')
+    parser.add_argument('output', help='output .npz file (e.g. damage_model_flat.npz), or an artifact '
+                                       'directory to memory-map (e.g. damage_model_artifact)')
+    parser.add_argument('--verify', metavar='EVENTS',
+                        help='CSV/Parquet events file to check the export against pipeline.predict')
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    pipeline = joblib.load(args.pipeline)
+    try:
+        flat = export_flat_model(pipeline, args.output)
+    except ValueError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    print(f"Exported {flat.n_trees} trees ({len(flat.arrays['node_value']):,} nodes) to {args.output}")
+
+    if args.verify:
+        events = read_events(args.verify)
+        feature_mismatches, prediction_mismatches = verify_flat_model(pipeline, flat, events)
+        print(f"Verified on {len(events):,} events: {feature_mismatches} rows with mismatching features, "
+              f"{prediction_mismatches} mismatching predictions")
+        return 1 if feature_mismatches or prediction_mismatches else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,447 @@
+# utils/ingest.py - Incremental ingestion of StormEvents files into a partitioned store
+#
+# Each new event file (e.g. a monthly NOAA StormEvents details CSV) is
+# appended to an on-disk store instead of being merged into one big CSV:
+#
+#   <store>/manifest.json                          ingested sources and partition files
+#   <store>/events/year=2023/month=12/part-<id>.parquet
+#   <store>/events/year=2023/month=12/part-<id>.agg.json
+#   <store>/totals.json                            merged aggregates of all parts
+#
+# Every part carries mergeable aggregates (counts, sums, min/max and
+# pairwise mean / co-moment matrices), so the Statistics page aggregates
+# are updated by merging the new parts into the running totals rather than
+# rescanning the history. Files already in the manifest (by content hash)
+# are skipped, so re-running an ingest is harmless.
+#
+# Usage (from the src directory):
+#   python -m utils.ingest StormEvents_cleaned1.csv              # initial load
+#   python -m utils.ingest StormEvents_details_d2024_c20250101.csv.gz
+#   python -m utils.ingest --status
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .features import calendar_features
+from .model_utils import MONTHS, _file_sha256
+from .stats_cache import calendar_order, month_names, prepare_frame
+
+DEFAULT_STORE_DIR = os.environ.get(
+    'STORM_STORE_DIR',
+    os.path.join(os.path.dirname(__file__), '..', 'event_store'),
+)
+
+# Bump when the layout of the store or of the aggregates changes
+STORE_VERSION = 1
+
+_UNKNOWN_PARTITION = (0, 0)
+
+
+class Moments:
+    """Mergeable first and second moments of a set of numeric columns.
+
+    For every pair of columns (i, j) the statistics are taken over the rows
+    where both are present, which is what DataFrame.corr() does:
+    n[i, j] rows, mean[i, j] the mean of column i, m2[i, j] the sum of
+    squared deviations of column i and c[i, j] the co-moment of i and j.
+    The diagonal holds the per-column count, mean and M2. Two Moments are
+    combined with the pairwise update of Chan et al., which keeps the
+    result numerically stable however many parts are merged.
+    """
+
+    def __init__(self, columns, n, mean, m2, c, minimum, maximum):
+        self.columns = list(columns)
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.c = c
+        self.min = minimum
+        self.max = maximum
+
+    @classmethod
+    def empty(cls, columns):
+        k = len(columns)
+        zeros = lambda: np.zeros((k, k))
+        return cls(columns, zeros(), zeros(), zeros(), zeros(), np.full(k, np.inf), np.full(k, -np.inf))
+
+    @classmethod
+    def from_frame(cls, df):
+        columns = list(df.select_dtypes(include=[np.number]).columns)
+        x = df[columns].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(x)
+        counts = valid.sum(axis=0)
+        # Shift each column by its own mean so the one-pass sums do not cancel
+        shift = np.where(counts > 0, np.nansum(x, axis=0) / np.maximum(counts, 1), 0.0)
+        xc = np.where(valid, x - shift, 0.0)
+        v = valid.astype(np.float64)
+
+        n = v.T @ v
+        sx = xc.T @ v
+        sxx = (xc * xc).T @ v
+        sxy = xc.T @ xc
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, sx / n, 0.0)
+            m2 = np.where(n > 0, sxx - sx * mean, 0.0)
+            c = np.where(n > 0, sxy - sx * mean.T, 0.0)
+        mean = np.where(n > 0, mean + shift[:, None], 0.0)
+        minimum = np.where(counts > 0, np.nanmin(np.where(valid, x, np.inf), axis=0, initial=np.inf), np.inf)
+        maximum = np.where(counts > 0, np.nanmax(np.where(valid, x, -np.inf), axis=0, initial=-np.inf), -np.inf)
+        return cls(columns, n, mean, np.maximum(m2, 0.0), c, minimum, maximum)
+
+    def _aligned(self, columns):
+        """Return these moments over columns (absent columns have no rows)."""
+        if columns == self.columns:
+            return self
+        out = Moments.empty(columns)
+        pos = {col: i for i, col in enumerate(columns)}
+        idx = np.array([pos[col] for col in self.columns], dtype=np.intp)
+        grid = np.ix_(idx, idx)
+        for name in ('n', 'mean', 'm2', 'c'):
+            getattr(out, name)[grid] = getattr(self, name)
+        out.min[idx] = self.min
+        out.max[idx] = self.max
+        return out
+
+    def merge(self, other):
+        """Return the moments of the union of both row sets."""
+        columns = self.columns + [col for col in other.columns if col not in self.columns]
+        a, b = self._aligned(columns), other._aligned(columns)
+        n = a.n + b.n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, a.n * b.n / n, 0.0)
+            delta = b.mean - a.mean
+            mean = np.where(n > 0, a.mean + delta * np.where(n > 0, b.n / n, 0.0), 0.0)
+        m2 = a.m2 + b.m2 + delta * delta * weight
+        c = a.c + b.c + delta * delta.T * weight
+        return Moments(columns, n, mean, m2, c, np.minimum(a.min, b.min), np.maximum(a.max, b.max))
+
+    def count(self, column):
+        i = self.columns.index(column)
+        return self.n[i, i]
+
+    def describe(self):
+        """count/mean/std/min/max per column, laid out like DataFrame.describe()."""
+        count = np.diag(self.n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(np.where(count > 1, np.diag(self.m2) / (count - 1), np.nan))
+        empty = count == 0
+        rows = {
+            'count': count,
+            'mean': np.where(empty, np.nan, np.diag(self.mean)),
+            'std': std,
+            'min': np.where(empty, np.nan, self.min),
+            'max': np.where(empty, np.nan, self.max),
+        }
+        return pd.DataFrame(rows, index=self.columns).T
+
+    def corr(self):
+        """Pearson correlation matrix with pairwise-complete rows, like DataFrame.corr()."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = self.c / np.sqrt(self.m2 * self.m2.T)
+        r = np.where(np.isfinite(r) & (self.n > 1), np.clip(r, -1.0, 1.0), np.nan)
+        return pd.DataFrame(r, index=self.columns, columns=self.columns)
+
+    def to_dict(self):
+        return {
+            'columns': self.columns,
+            'n': self.n.tolist(), 'mean': self.mean.tolist(), 'm2': self.m2.tolist(), 'c': self.c.tolist(),
+            'min': self.min.tolist(), 'max': self.max.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        k = len(d['columns'])
+        matrix = lambda key: np.array(d[key], dtype=np.float64).reshape(k, k)
+        return cls(d['columns'], matrix('n'), matrix('mean'), matrix('m2'), matrix('c'),
+                   np.array(d['min'], dtype=np.float64), np.array(d['max'], dtype=np.float64))
+
+
+def _add_counts(a, b):
+    out = dict(a)
+    for key, value in b.items():
+        out[key] = out.get(key, 0) + value
+    return out
+
+
+def frame_aggregates(df):
+    """Mergeable aggregates of a prepared frame (see merge_aggregates / aggregates_to_stats)."""
+    agg = {
+        'rows': int(len(df)),
+        'moments': Moments.from_frame(df).to_dict(),
+        'event_counts': {},
+        'state_counts': {},
+        'damage_by_state': {},
+        'damage_by_month': {},
+    }
+    if 'EVENT_TYPE' in df.columns:
+        agg['event_counts'] = {str(k): int(v) for k, v in df['EVENT_TYPE'].astype('object').value_counts().items()}
+    if 'STATE' in df.columns:
+        states = df['STATE'].astype('object')
+        agg['state_counts'] = {str(k): int(v) for k, v in states.value_counts().items()}
+        if 'DAMAGE_PROPERTY' in df.columns:
+            agg['damage_by_state'] = {str(k): float(v) for k, v in df['DAMAGE_PROPERTY'].groupby(states).sum().items()}
+    months = month_names(df)
+    if months is not None and 'DAMAGE_PROPERTY' in df.columns:
+        agg['damage_by_month'] = {str(k): float(v) for k, v in df['DAMAGE_PROPERTY'].groupby(months).sum().items()}
+    return agg
+
+
+def merge_aggregates(a, b):
+    """Combine the aggregates of two disjoint sets of events."""
+    if a is None:
+        return b
+    return {
+        'rows': a['rows'] + b['rows'],
+        'moments': Moments.from_dict(a['moments']).merge(Moments.from_dict(b['moments'])).to_dict(),
+        'event_counts': _add_counts(a['event_counts'], b['event_counts']),
+        'state_counts': _add_counts(a['state_counts'], b['state_counts']),
+        'damage_by_state': _add_counts(a['damage_by_state'], b['damage_by_state']),
+        'damage_by_month': _add_counts(a['damage_by_month'], b['damage_by_month']),
+    }
+
+
+def aggregates_to_stats(agg):
+    """Convert merged aggregates into the page statistics of stats_cache.compute_stats().
+
+    The summary table has count/mean/std/min/max only: quantiles cannot be
+    merged exactly from per-part aggregates.
+    """
+    moments = Moments.from_dict(agg['moments'])
+    numeric = moments.columns
+    has_damage = 'DAMAGE_PROPERTY' in numeric and moments.count('DAMAGE_PROPERTY') > 0
+    describe = moments.describe() if numeric else None
+    series = lambda d: pd.Series(d, dtype='float64') if d else None
+    stats = {
+        'rows': agg['rows'],
+        'unique_states': len(agg['state_counts']),
+        'describe': describe,
+        'correlation': moments.corr() if len(numeric) > 1 else None,
+        'event_counts': series(agg['event_counts']),
+        'avg_property_damage': float(describe.loc['mean', 'DAMAGE_PROPERTY']) if has_damage else None,
+        'max_property_damage': float(describe.loc['max', 'DAMAGE_PROPERTY']) if has_damage else None,
+        'damage_by_state': series(agg['damage_by_state']),
+        'damage_by_month': series(agg['damage_by_month']),
+    }
+    if stats['event_counts'] is not None:
+        stats['event_counts'] = stats['event_counts'].sort_values(ascending=False)
+    if stats['damage_by_state'] is not None:
+        stats['damage_by_state'] = stats['damage_by_state'].sort_values(ascending=False)
+    if stats['damage_by_month'] is not None:
+        stats['damage_by_month'] = calendar_order(stats['damage_by_month'])
+    return stats
+
+
+def _write_json(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _manifest_path(store_dir):
+    return os.path.join(store_dir, 'manifest.json')
+
+
+def _totals_path(store_dir):
+    return os.path.join(store_dir, 'totals.json')
+
+
+def read_manifest(store_dir=DEFAULT_STORE_DIR):
+    """Return the store manifest, or an empty one if the store does not exist yet."""
+    manifest = _read_json(_manifest_path(store_dir))
+    if manifest is None or manifest.get('version') != STORE_VERSION:
+        return {'version': STORE_VERSION, 'generation': 0, 'sources': {}, 'partitions': {}}
+    return manifest
+
+
+def store_signature(store_dir=DEFAULT_STORE_DIR):
+    """Return a string that changes with every ingest, or None if the store is empty."""
+    manifest = read_manifest(store_dir)
+    if not manifest['partitions']:
+        return None
+    last = max(source['ingested_at'] for source in manifest['sources'].values())
+    return f"{os.path.abspath(store_dir)}:{manifest['generation']}:{last}"
+
+
+def event_partitions(df):
+    """Return a (year, month) pair per event as two integer arrays (0, 0 when unknown)."""
+    if 'BEGIN_YEARMONTH' in df.columns:
+        yearmonth = pd.to_numeric(df['BEGIN_YEARMONTH'], errors='coerce')
+        year, month = yearmonth // 100, yearmonth % 100
+    elif 'BEGIN_DATE_TIME' in df.columns:
+        calendar = calendar_features(df['BEGIN_DATE_TIME'])
+        year, month = pd.Series(calendar['YEAR']), pd.Series(calendar['MONTH'])
+    elif 'YEAR' in df.columns and 'MONTH_NAME' in df.columns:
+        year = pd.to_numeric(df['YEAR'], errors='coerce')
+        month = df['MONTH_NAME'].astype('object').map({m: i + 1 for i, m in enumerate(MONTHS)})
+    else:
+        year = month = pd.Series(np.nan, index=df.index)
+    known = year.notna() & month.notna()
+    year = np.where(known, year, _UNKNOWN_PARTITION[0]).astype(np.int64)
+    month = np.where(known, month, _UNKNOWN_PARTITION[1]).astype(np.int64)
+    return year, month
+
+
+def _partition_key(year, month):
+    return f'{year:04d}-{month:02d}'
+
+
+def _read_source(path):
+    lower = path.lower()
+    if lower.endswith('.parquet'):
+        return pd.read_parquet(path)
+    # Plain or compressed CSV (NOAA publishes .csv.gz)
+    return pd.read_csv(path, low_memory=False)
+
+
+def ingest_file(path, store_dir=DEFAULT_STORE_DIR):
+    """Append one event file to the store and fold it into the running aggregates.
+
+    Returns a dict with the rows and partitions written; files whose content
+    was already ingested are skipped ('skipped': True).
+    """
+    manifest = read_manifest(store_dir)
+    sha256 = _file_sha256(path)
+    if sha256 in manifest['sources']:
+        return {'source': path, 'rows': 0, 'partitions': [], 'skipped': True}
+
+    df = prepare_frame(_read_source(path))
+    years, months = event_partitions(df)
+    part_id = sha256[:16]
+    new_parts = []
+    batch_agg = None
+    for (year, month), index in df.groupby([years, months], sort=True).groups.items():
+        part = df.loc[index]
+        rel_dir = os.path.join('events', f'year={year:04d}', f'month={month:02d}')
+        os.makedirs(os.path.join(store_dir, rel_dir), exist_ok=True)
+        rel_path = os.path.join(rel_dir, f'part-{part_id}.parquet')
+        part.reset_index(drop=True).to_parquet(os.path.join(store_dir, rel_path), index=False)
+        agg = frame_aggregates(part)
+        _write_json(os.path.join(store_dir, rel_path[:-len('.parquet')] + '.agg.json'), agg)
+        batch_agg = merge_aggregates(batch_agg, agg)
+        new_parts.append((_partition_key(year, month), rel_path, len(part)))
+
+    # Fold the new parts into the totals, but only if the totals were current
+    totals = _read_json(_totals_path(store_dir))
+    current = totals is not None and totals.get('generation') == manifest['generation']
+    generation = manifest['generation'] + 1
+    if current and batch_agg is not None:
+        _write_json(_totals_path(store_dir), {
+            'generation': generation,
+            'aggregates': merge_aggregates(totals['aggregates'], batch_agg),
+        })
+
+    # The manifest is written last: parts it does not list are ignored
+    for key, rel_path, rows in new_parts:
+        partition = manifest['partitions'].setdefault(key, {'files': [], 'rows': 0})
+        partition['files'].append(rel_path)
+        partition['rows'] += rows
+    manifest['sources'][sha256] = {
+        'path': os.path.abspath(path),
+        'rows': int(len(df)),
+        'ingested_at': time.time(),
+    }
+    manifest['generation'] = generation
+    _write_json(_manifest_path(store_dir), manifest)
+    return {'source': path, 'rows': int(len(df)), 'partitions': sorted({p[0] for p in new_parts}), 'skipped': False}
+
+
+def rebuild_totals(store_dir=DEFAULT_STORE_DIR):
+    """Recompute the totals by merging every part's aggregates (no event data is read)."""
+    manifest = read_manifest(store_dir)
+    totals = None
+    for key in sorted(manifest['partitions']):
+        for rel_path in manifest['partitions'][key]['files']:
+            agg = _read_json(os.path.join(store_dir, rel_path[:-len('.parquet')] + '.agg.json'))
+            if agg is None:
+                # Missing aggregate file: derive it from the part once
+                agg = frame_aggregates(pd.read_parquet(os.path.join(store_dir, rel_path)))
+            totals = merge_aggregates(totals, agg)
+    payload = {'generation': manifest['generation'], 'aggregates': totals}
+    _write_json(_totals_path(store_dir), payload)
+    return totals
+
+
+def store_aggregates(store_dir=DEFAULT_STORE_DIR):
+    """Return the merged aggregates of the whole store (None if it is empty)."""
+    manifest = read_manifest(store_dir)
+    if not manifest['partitions']:
+        return None
+    totals = _read_json(_totals_path(store_dir))
+    if totals is None or totals.get('generation') != manifest['generation']:
+        return rebuild_totals(store_dir)
+    return totals['aggregates']
+
+
+def load_store_stats(store_dir=DEFAULT_STORE_DIR):
+    """Statistics page aggregates of the store; raises FileNotFoundError if it is empty."""
+    agg = store_aggregates(store_dir)
+    if agg is None:
+        raise FileNotFoundError(f"No events have been ingested into {os.path.abspath(store_dir)}")
+    return aggregates_to_stats(agg)
+
+
+def read_store(store_dir=DEFAULT_STORE_DIR, partitions=None, columns=None):
+    """Read the ingested events (optionally only some 'YYYY-MM' partitions) into a DataFrame."""
+    manifest = read_manifest(store_dir)
+    keys = sorted(manifest['partitions']) if partitions is None else sorted(partitions)
+    frames = [
+        pd.read_parquet(os.path.join(store_dir, rel_path), columns=columns)
+        for key in keys
+        for rel_path in manifest['partitions'].get(key, {}).get('files', [])
+    ]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.ingest',
+                                     description='Append StormEvents files to the partitioned event store.')
+    parser.add_argument('files', nargs='*', help='.csv, .csv.gz or .parquet event files to ingest')
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help='store directory (default: src/event_store)')
+    parser.add_argument('--status', action='store_true', help='list the ingested partitions')
+    parser.add_argument('--rebuild-totals', action='store_true',
+                        help='recompute the totals from the per-part aggregates')
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        start = time.perf_counter()
+        try:
+            result = ingest_file(path, args.store)
+        except (FileNotFoundError, ValueError) as e:
+            print(f'error: {path}: {e}', file=sys.stderr)
+            return 1
+        if result['skipped']:
+            print(f'{path}: already ingested, skipped')
+        else:
+            print(f"{path}: {result['rows']:,} events into {len(result['partitions'])} partitions "
+                  f"({time.perf_counter() - start:.2f}s)")
+    if args.rebuild_totals:
+        rebuild_totals(args.store)
+    if args.status or not args.files:
+        manifest = read_manifest(args.store)
+        for key in sorted(manifest['partitions']):
+            partition = manifest['partitions'][key]
+            print(f"{key}  {partition['rows']:>10,} events  {len(partition['files'])} files")
+        print(f"{len(manifest['sources'])} sources, generation {manifest['generation']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
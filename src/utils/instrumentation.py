@@ -0,0 +1,233 @@
+# utils/instrumentation.py - Opt-in stage timers, counters and memory snapshots
+#
+# Enabled with STORM_INSTRUMENTATION=1 (or enable() at runtime). When
+# disabled, stage() returns a shared no-op context manager and count() /
+# memory_snapshot() return immediately, so the hooks left in the hot path
+# cost a function call and a flag check.
+#
+#   with stage('preprocess'):
+#       ...
+#   count('prediction_cache_miss')
+#   memory_snapshot('after_model_load')
+#
+# snapshot() returns everything recorded so far; prometheus_text() renders
+# it in the Prometheus text exposition format (served by the HTTP service
+# at /metrics, and shown on the Assess Risk page with ?diagnostics=1).
+
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+from .memory import current_rss_bytes, peak_rss_bytes
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_METRIC_PREFIX = 'storm'
+
+_enabled = os.environ.get('STORM_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes', 'on')
+_lock = threading.Lock()
+_stages = {}    # name -> [calls, total_seconds, max_seconds, bucket counts]
+_counters = {}  # name -> value
+_memory = {}    # label -> (rss_bytes, timestamp)
+_collectors = []
+_NULL_STAGE = nullcontext()
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """Forget everything recorded so far (registered collectors are kept)."""
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _memory.clear()
+
+
+def record_stage(name, seconds):
+    """Add one timed call of stage name."""
+    with _lock:
+        entry = _stages.get(name)
+        if entry is None:
+            entry = _stages[name] = [0, 0.0, 0.0, [0] * (len(STAGE_BUCKETS) + 1)]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                entry[3][i] += 1
+                break
+        else:
+            entry[3][-1] += 1
+
+
+class _StageTimer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_stage(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name):
+    """Context manager timing the enclosed block as stage name (no-op when disabled)."""
+    if not _enabled:
+        return _NULL_STAGE
+    return _StageTimer(name)
+
+
+def timed(name):
+    """Decorator form of stage()."""
+    def decorator(fn):
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _StageTimer(name):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """Increase counter name by n (no-op when disabled)."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def memory_snapshot(label):
+    """Record the current resident memory under label (no-op when disabled)."""
+    if not _enabled:
+        return
+    rss = current_rss_bytes()
+    with _lock:
+        _memory[label] = (rss, time.time())
+
+
+def register_collector(fn):
+    """Register fn() -> iterable of (name, help, type, value, labels) for prometheus_text().
+
+    Samples of one metric must be yielded together; histogram samples use
+    the _bucket/_sum/_count suffixes. Collectors expose state that is
+    tracked elsewhere (e.g. cache sizes) and are read at export time,
+    whether or not instrumentation is enabled.
+    """
+    if fn not in _collectors:
+        _collectors.append(fn)
+    return fn
+
+
+def unregister_collector(fn):
+    """Remove a collector added with register_collector(); unknown ones are ignored."""
+    if fn in _collectors:
+        _collectors.remove(fn)
+
+
+def snapshot():
+    """Return the recorded stages, counters and memory snapshots as plain dicts."""
+    with _lock:
+        stages = {
+            name: {
+                'calls': calls,
+                'total_seconds': total,
+                'mean_seconds': total / calls if calls else 0.0,
+                'max_seconds': longest,
+            }
+            for name, (calls, total, longest, _) in _stages.items()
+        }
+        return {
+            'enabled': _enabled,
+            'stages': stages,
+            'counters': dict(_counters),
+            'memory': {label: rss for label, (rss, _) in _memory.items()},
+            'rss_bytes': current_rss_bytes(),
+            'peak_rss_bytes': peak_rss_bytes(),
+        }
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def prometheus_text():
+    """Render all metrics in the Prometheus text exposition format (version 0.0.4)."""
+    p = _METRIC_PREFIX
+    lines = []
+
+    def family(name, help_text, kind):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    with _lock:
+        stages = {name: (calls, total, list(buckets)) for name, (calls, total, _, buckets) in _stages.items()}
+        counters = dict(_counters)
+        memory = {label: rss for label, (rss, _) in _memory.items()}
+
+    family(f'{p}_instrumentation_enabled', 'Whether stage timing is switched on.', 'gauge')
+    lines.append(f'{p}_instrumentation_enabled {int(_enabled)}')
+    if stages:
+        family(f'{p}_stage_seconds', 'Time spent per instrumented stage.', 'histogram')
+        for name, (calls, total, buckets) in sorted(stages.items()):
+            cumulative = 0
+            for bound, n in zip(STAGE_BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'{p}_stage_seconds_bucket{_labels({"stage": name, "le": bound})} {cumulative}')
+            lines.append(f'{p}_stage_seconds_bucket{_labels({"stage": name, "le": "+Inf"})} {calls}')
+            lines.append(f'{p}_stage_seconds_sum{_labels({"stage": name})} {total:.9f}')
+            lines.append(f'{p}_stage_seconds_count{_labels({"stage": name})} {calls}')
+    if counters:
+        family(f'{p}_events_total', 'Counted events by name.', 'counter')
+        for name, value in sorted(counters.items()):
+            lines.append(f'{p}_events_total{_labels({"name": name})} {value}')
+    if memory:
+        family(f'{p}_memory_snapshot_bytes', 'Resident memory when a snapshot label was last reached.', 'gauge')
+        for label, rss in sorted(memory.items()):
+            lines.append(f'{p}_memory_snapshot_bytes{_labels({"label": label})} {rss}')
+    family('process_resident_memory_bytes', 'Resident memory size in bytes.', 'gauge')
+    lines.append(f'process_resident_memory_bytes {current_rss_bytes()}')
+    family(f'{p}_process_peak_resident_memory_bytes', 'Peak resident memory size in bytes.', 'gauge')
+    lines.append(f'{p}_process_peak_resident_memory_bytes {peak_rss_bytes()}')
+
+    seen = set()
+    for collector in list(_collectors):
+        for name, help_text, kind, value, labels in collector():
+            full = f'{p}_{name}'
+            base = full
+            if kind == 'histogram':
+                # _bucket/_sum/_count samples belong to one histogram family
+                base = full.rsplit('_', 1)[0]
+            if base not in seen:
+                family(base, help_text, kind)
+                seen.add(base)
+            lines.append(f'{full}{_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
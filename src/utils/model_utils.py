@@ -1,33 +1,689 @@
 # storm-damage-prediction-app/storm-damage-prediction-app/src/utils/model_utils.py
 
-import joblib
-import pandas as pd
+import hashlib
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
 import numpy as np
 
-def load_model(model_path):
-    """Load the trained model from the specified path."""
-    model = joblib.load(model_path)
-    return model
+from .instrumentation import count, is_enabled, memory_snapshot, register_collector, stage
+from .memory import current_rss_bytes
+
+# Default location of the trained pipeline (src/damage_model_pipeline.pkl)
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'damage_model_pipeline.pkl')
+# Array-backed export of the same pipeline (see utils.flat_model)
+DEFAULT_FLAT_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'damage_model_flat.npz')
+# Memory-mappable artifact directory of the same export (see save_model_artifact)
+DEFAULT_ARTIFACT_PATH = os.path.join(os.path.dirname(__file__), '..', 'damage_model_artifact')
+ARTIFACT_MANIFEST = 'manifest.json'
+
+# Model input schema, in the order the pipeline was trained on
+NUMERIC_FEATURES = ['MAGNITUDE', 'BEGIN_LAT', 'BEGIN_LON', 'DURATION_HOURS']
+CATEGORICAL_FEATURES = ['STATE', 'EVENT_TYPE', 'MONTH_NAME', 'MAGNITUDE_TYPE']
+FEATURES = [
+    'STATE', 'EVENT_TYPE', 'MONTH_NAME',
+    'MAGNITUDE', 'MAGNITUDE_TYPE',
+    'BEGIN_LAT', 'BEGIN_LON',
+    'DURATION_HOURS',
+]
+PREDICTION_COLUMN = 'PREDICTED_DAMAGE'
+
+# Choices offered by the Assess Risk form (also used to generate synthetic events)
+STATES = ["AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", "HI", "ID", "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY"]
+EVENT_TYPES = ["Flood", "Hurricane", "Tornado", "Thunderstorm", "Winter Storm"]
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+MAGNITUDE_TYPES = ['EG', 'MG', 'None']
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Bounds of the process-wide prediction cache (see cached_prediction)
+PREDICTION_CACHE_SIZE = int(os.environ.get('STORM_PREDICTION_CACHE_SIZE', 4096))
+PREDICTION_CACHE_TTL = float(os.environ.get('STORM_PREDICTION_CACHE_TTL', 3600))
+
+# Process-wide model registry: absolute path -> record (see load_model).
+# Streamlit imports this module once per server process, so every session
+# and every rerun of a page shares the same deserialized pipeline.
+_MODEL_REGISTRY = {}
+_REGISTRY_LOCK = threading.Lock()
+
+def _content_path(path):
+    # An artifact directory is identified by its manifest, which records the
+    # checksum of every array file and is rewritten on every save
+    return os.path.join(path, ARTIFACT_MANIFEST) if os.path.isdir(path) else path
+
+def _file_stat_key(path):
+    st = os.stat(_content_path(path))
+    return (st.st_mtime_ns, st.st_size)
+
+def _model_bytes(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+def _file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _cached_record(path, stat_key):
+    """Return the registry record for path if it is still valid for stat_key."""
+    record = _MODEL_REGISTRY.get(path)
+    if record is None:
+        return None
+    if record['stat_key'] == stat_key:
+        return record
+    # mtime/size changed: only reload if the content actually changed
+    # (a `touch` or an identical re-copy keeps the loaded model)
+    if _file_sha256(_content_path(path)) == record['sha256']:
+        record['stat_key'] = stat_key
+        return record
+    return None
+
+def default_model_path():
+    """Return the model to serve: an up-to-date export if there is one, else the pipeline.
+
+    The memory-mapped artifact (damage_model_artifact/) is preferred, then
+    the flat model (damage_model_flat.npz). An export is only used when it
+    is at least as new as damage_model_pipeline.pkl, so a retrained
+    pipeline is never shadowed by a stale export.
+    """
+    try:
+        pipeline_mtime = os.stat(DEFAULT_MODEL_PATH).st_mtime_ns
+    except OSError:
+        pipeline_mtime = None
+    for path in (DEFAULT_ARTIFACT_PATH, DEFAULT_FLAT_MODEL_PATH):
+        try:
+            export_mtime = os.stat(_content_path(path)).st_mtime_ns
+        except OSError:
+            continue
+        if pipeline_mtime is None or export_mtime >= pipeline_mtime:
+            return path
+    return DEFAULT_MODEL_PATH
+
+def _read_model_file(path, mmap_mode=None):
+    if path.endswith('.npz') or os.path.isdir(path):
+        from .flat_model import FlatModel
+
+        # Artifact arrays are memory-mapped read-only unless told otherwise
+        return FlatModel.load(path, mmap_mode=mmap_mode or 'r')
+    import joblib
+
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+def load_model(model_path, mmap_mode=None):
+    """Load the trained model from the specified path.
+
+    Models are cached process-wide and keyed on the file's mtime, size and
+    content hash, so repeated calls are free and a changed file is reloaded
+    on the next call. Use get_model_info() to inspect the cold-start cost.
+    A .npz path or an artifact directory loads a FlatModel export (see
+    utils.flat_model; artifacts are memory-mapped); anything else is a
+    joblib pickle, for which mmap_mode is passed to joblib.load.
+    """
+    return _load_record(model_path, mmap_mode)['model']
+
+def _load_record(model_path, mmap_mode=None):
+    """load_model(), returning the whole registry record the model came from.
+
+    A reload replaces the record instead of updating it, so the model and
+    its sha256 read from one record always belong together.
+    """
+    path = os.path.abspath(model_path)
+    stat_key = _file_stat_key(path)  # raises FileNotFoundError like joblib.load
+    record = _MODEL_REGISTRY.get(path)
+    if record is not None and record['stat_key'] == stat_key:
+        record['hits'] += 1
+        count('model_registry_hit')
+        return record
+
+    with _REGISTRY_LOCK:
+        record = _cached_record(path, stat_key)
+        if record is not None:
+            # Loaded by another thread meanwhile (or touched but unchanged): still a hit
+            record['hits'] += 1
+            count('model_registry_hit')
+            return record
+
+        previous = _MODEL_REGISTRY.get(path)
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        with stage('model_load'):
+            model = _read_model_file(path, mmap_mode=mmap_mode)
+        load_seconds = time.perf_counter() - start
+        memory_bytes = max(current_rss_bytes() - rss_before, 0)
+        memory_snapshot('after_model_load')
+
+        if previous is not None:
+            # Predictions from the replaced model must not be served again
+            PREDICTION_CACHE.clear()
+        record = _MODEL_REGISTRY[path] = {
+            'model': model,
+            'path': path,
+            'stat_key': stat_key,
+            'sha256': _file_sha256(_content_path(path)),
+            'file_bytes': _model_bytes(path),
+            'load_seconds': load_seconds,
+            'memory_bytes': memory_bytes,
+            'loaded_at': time.time(),
+            'loads': previous['loads'] + 1 if previous else 1,
+            'hits': 0,
+        }
+    return record
+
+def get_model_info(model_path):
+    """Return load statistics for a model held in the registry, or None.
+
+    The dict contains the load time in seconds, the resident memory the load
+    added (RSS delta, in bytes), the file size and hash, how many times the
+    file has been (re)loaded and how many calls were served from the cache.
+    """
+    record = _MODEL_REGISTRY.get(os.path.abspath(model_path))
+    if record is None:
+        return None
+    info = {k: v for k, v in record.items() if k not in ('model', 'stat_key')}
+    info['model_type'] = type(record['model']).__name__
+    return info
+
+def save_model_artifact(model, path=DEFAULT_ARTIFACT_PATH):
+    """Save a pipeline (or its pickle path, or a FlatModel) as a memory-mappable artifact directory.
+
+    The artifact holds the flattened tree arrays and encoder vocabularies
+    as .npy files plus a versioned manifest; load_model() maps it read-only
+    without unpickling, and processes serving it share one physical copy.
+    Returns the artifact path.
+    """
+    from .flat_model import FlatModel, export_flat_model
+
+    flat = model if isinstance(model, FlatModel) else export_flat_model(model)
+    return flat.save_artifact(path)
+
+def list_loaded_models():
+    """Return get_model_info() for every model currently held in the registry."""
+    return [get_model_info(path) for path in list(_MODEL_REGISTRY)]
+
+def clear_model_cache(model_path=None):
+    """Drop one model (or all models) from the process-wide registry."""
+    with _REGISTRY_LOCK:
+        if model_path is None:
+            _MODEL_REGISTRY.clear()
+        else:
+            _MODEL_REGISTRY.pop(os.path.abspath(model_path), None)
+
+# Below this many rows category codes are looked up in plain dicts; larger
+# batches use a pandas hash index built once from the same vocabulary
+_DICT_LOOKUP_MAX_ROWS = 256
+
+class FeatureEncoder:
+    """Precomputed lookup tables for the fast path of preprocess_input().
+
+    Instead of the ColumnTransformer's dense one-hot matrix (one float per
+    category per row), each event is encoded as one compact float32 row:
+    the imputed and scaled numeric features, followed by one integer code
+    per categorical feature (-1 for a category not seen in training). Tree
+    models that understand the codes, such as utils.flat_model.FlatModel,
+    evaluate one-hot splits as code comparisons.
+    """
+
+    def __init__(self, numeric_features, numeric_fill, numeric_mean, numeric_scale,
+                 categorical_features, categories, categorical_fill):
+        self.numeric_features = list(numeric_features)
+        self.numeric_fill = np.asarray(numeric_fill, dtype=np.float64)
+        self.numeric_mean = np.asarray(numeric_mean, dtype=np.float64)
+        self.numeric_scale = np.asarray(numeric_scale, dtype=np.float64)
+        self.categorical_features = list(categorical_features)
+        self.categorical_fill = list(categorical_fill)
+        self.category_maps = [{cat: code for code, cat in enumerate(cats)} for cats in categories]
+        self.categories = [list(cats) for cats in categories]
+        self._category_index = None  # pandas Indexes for large batches, built on first use
+        self.columns = self.numeric_features + self.categorical_features
+
+    def _category_codes(self, i, values):
+        fill = self.categorical_fill[i]
+        if fill is not None:
+            # Like SimpleImputer on object data, only NaN (NaN != NaN) counts as missing
+            missing = values != values
+            if missing.any():
+                values = np.where(missing, fill, values)
+        if len(values) <= _DICT_LOOKUP_MAX_ROWS:
+            lookup = self.category_maps[i]
+            return np.fromiter((lookup.get(v, -1) for v in values), dtype=np.int32, count=len(values))
+        if self._category_index is None:
+            import pandas as pd
+
+            self._category_index = [pd.Index(cats, dtype=object) for cats in self.categories]
+        return self._category_index[i].get_indexer(values)
+
+    def encode(self, columns):
+        """Encode {feature: 1-d array} columns into the compact float32 matrix."""
+        n = len(columns[self.columns[0]])
+        n_numeric = len(self.numeric_features)
+        out = np.empty((n, len(self.columns)), dtype=np.float32)
+        if n_numeric:
+            x = np.column_stack([_as_float(columns[col]) for col in self.numeric_features])
+            missing = np.isnan(x)
+            if np.isinf(x).any():
+                # The pipeline's imputer rejects these too; NaN is the only missing marker
+                raise ValueError("Input X contains infinity or a value too large for dtype('float64').")
+            if missing.any():
+                x = np.where(missing, self.numeric_fill, x)
+            # Same operations, in the same order, as StandardScaler.transform
+            x -= self.numeric_mean
+            x /= self.numeric_scale
+            out[:, :n_numeric] = x
+        for i, col in enumerate(self.categorical_features):
+            out[:, n_numeric + i] = self._category_codes(i, np.asarray(columns[col], dtype=object))
+        return out
+
+def _as_float(values):
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        import pandas as pd
+
+        return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+
+def _feature_columns(data):
+    """Return {feature: 1-d array} for a dict, list of dicts or DataFrame of events."""
+    if _is_frame(data):
+        missing = [col for col in FEATURES if col not in data.columns]
+        columns = None if missing else {col: data[col].to_numpy() for col in FEATURES}
+    else:
+        rows = [data] if isinstance(data, dict) else list(data)
+        missing = sorted({col for row in rows for col in FEATURES if col not in row})
+        columns = None if missing else {
+            col: np.array([row[col] for row in rows], dtype=object) for col in FEATURES
+        }
+    if missing:
+        raise ValueError(f"Missing required feature columns: {', '.join(missing)}")
+    return columns
+
+def _is_frame(data):
+    # pandas is only imported once something needs it; until then nothing can be a DataFrame
+    pd = sys.modules.get('pandas')
+    return pd is not None and isinstance(data, pd.DataFrame)
+
+def preprocess_input(data, encoder=None):
+    """Preprocess the input data for prediction.
+
+    Accepts a single event dict, a list of dicts or a DataFrame and returns a
+    DataFrame with exactly the model features, in training order. Numeric
+    columns read as text are coerced, with junk becoming NaN for the imputer.
+
+    With a FeatureEncoder the fast path is taken instead: the events are
+    mapped straight to the encoder's compact float32 matrix (scaled numerics
+    + category codes), without building a DataFrame or a one-hot matrix.
+    """
+    if encoder is not None:
+        with stage('encode'):
+            return encoder.encode(_feature_columns(data))
+
+    with stage('preprocess'):
+        return _preprocess_frame(data)
+
+def _preprocess_frame(data):
+    import pandas as pd
 
-def preprocess_input(data):
-    """Preprocess the input data for prediction."""
-    # Assuming data is a dictionary with the required features
-    df = pd.DataFrame([data])
-    # Perform any necessary preprocessing steps here
+    if isinstance(data, pd.DataFrame):
+        df = data
+    elif isinstance(data, dict):
+        df = pd.DataFrame([data])
+    else:
+        df = pd.DataFrame(list(data))
+
+    missing = [col for col in FEATURES if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required feature columns: {', '.join(missing)}")
+    df = df[FEATURES]
+
+    for col in NUMERIC_FEATURES:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df = df.assign(**{col: pd.to_numeric(df[col], errors='coerce')})
     return df
 
 def make_prediction(model, input_data):
     """Make a prediction using the loaded model and preprocessed input data."""
     processed_data = preprocess_input(input_data)
-    prediction = model.predict(processed_data)
+    if is_enabled() and hasattr(model, 'steps'):
+        # Same as Pipeline.predict, but timing the transforms and the trees apart
+        with stage('pipeline_transform'):
+            transformed = model[:-1].transform(processed_data)
+        with stage('tree_eval'):
+            return model[-1].predict(transformed)
+    with stage('model_predict'):
+        prediction = model.predict(processed_data)
     return prediction
 
 def inverse_transform(prediction):
     """Inverse transform the prediction if necessary (e.g., if log-transformed)."""
     return np.expm1(prediction)  # Assuming the prediction was log-transformed
 
+def postprocess_prediction(prediction):
+    """Clip log-scale predictions at zero and map them back to damage units."""
+    return inverse_transform(np.clip(prediction, 0, None))
+
+def predict_batch(model, data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Predict damage for many events at once.
+
+    The rows are scored in vectorized chunks of chunk_size rows, which keeps
+    the pipeline's intermediate (one-hot) matrices bounded, and the same
+    clip + expm1 post-processing as the Assess Risk page is applied.
+    """
+    frame = preprocess_input(data)
+    count('rows_scored', len(frame))
+    predictions = np.empty(len(frame), dtype=np.float64)
+    for start in range(0, len(frame), chunk_size):
+        chunk = frame.iloc[start:start + chunk_size]
+        predictions[start:start + len(chunk)] = make_prediction(model, chunk)
+    return postprocess_prediction(predictions)
+
+def _file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.csv', '.txt'):
+        return 'csv'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    raise ValueError(f"Unsupported file type '{ext}' (expected .csv or .parquet)")
+
+def read_events(path):
+    """Read a CSV or Parquet file of storm events into a DataFrame."""
+    import pandas as pd
+
+    if _file_format(path) == 'parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+def write_predictions(df, path):
+    """Write scored events to a CSV or Parquet file."""
+    if _file_format(path) == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+def _throughput_stats(rows, start, end, stages):
+    total = end - start
+    stats = {'rows': rows}
+    stats.update({f'{name}_seconds': seconds for name, seconds in stages.items()})
+    stats['total_seconds'] = total
+    stats['rows_per_second'] = rows / total if total > 0 else float('inf')
+    predict = stages.get('predict', 0.0)
+    stats['predict_rows_per_second'] = rows / predict if predict > 0 else float('inf')
+    return stats
+
+def _open_scorer(model_path, n_workers, chunk_size):
+    """Return (model, close) for scoring on this process or on a worker pool."""
+    model_path = model_path or default_model_path()
+    if n_workers == 1:
+        return load_model(model_path), lambda: None
+    from .parallel import ParallelPredictor
+
+    predictor = ParallelPredictor(model_path, n_workers=n_workers, shard_size=chunk_size)
+    predictor.warm_up()
+    return predictor, predictor.close
+
+def score_file(input_path, output_path, model_path=None, chunk_size=DEFAULT_CHUNK_SIZE,
+               n_workers=1):
+    """Score every event in input_path and write them with a PREDICTED_DAMAGE column.
+
+    model_path defaults to default_model_path(). With n_workers other than 1
+    the rows are scored on a process pool (see utils.parallel; None means
+    one worker per core). Returns a dict with the
+    row count, per-stage timings (model load, read, predict, write) and the
+    overall throughput in rows per second.
+    """
+    start = time.perf_counter()
+    model, close = _open_scorer(model_path, n_workers, chunk_size)
+    try:
+        t0 = time.perf_counter()
+        events = read_events(input_path)
+        t1 = time.perf_counter()
+        # A worker pool shards the rows itself, so hand it the whole frame
+        batch_size = chunk_size if n_workers == 1 else max(len(events), 1)
+        events[PREDICTION_COLUMN] = predict_batch(model, events, chunk_size=batch_size)
+        t2 = time.perf_counter()
+        write_predictions(events, output_path)
+        t3 = time.perf_counter()
+    finally:
+        close()
+
+    return _throughput_stats(len(events), start, t3, {
+        'load': t0 - start, 'read': t1 - t0, 'predict': t2 - t1, 'write': t3 - t2,
+    })
+
+def iter_event_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the events in a CSV or Parquet file as DataFrames of at most chunk_size rows.
+
+    Only one chunk is held in memory at a time, whatever the size of the file.
+    """
+    if _file_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        import pandas as pd
+
+        with pd.read_csv(path, chunksize=chunk_size) as reader:
+            yield from reader
+
+def score_chunks(model, chunks):
+    """Score a stream of event DataFrames, yielding each with a PREDICTED_DAMAGE column."""
+    for chunk in chunks:
+        chunk[PREDICTION_COLUMN] = postprocess_prediction(make_prediction(model, chunk))
+        yield chunk
+
+def write_chunks(chunks, path):
+    """Append a stream of DataFrames to a CSV or Parquet file and return the row count.
+
+    The first chunk fixes the column layout (CSV header / Parquet schema);
+    later chunks are appended as they arrive and then released.
+    """
+    rows = 0
+    if _file_format(path) == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    with open(path, 'w', newline='') as f:
+        for chunk in chunks:
+            chunk.to_csv(f, index=False, header=(rows == 0))
+            rows += len(chunk)
+    return rows
+
+def _timed(iterable, timings, key):
+    """Pass items through, adding the time spent producing them to timings[key]."""
+    iterator = iter(iterable)
+    while True:
+        t = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings[key] += time.perf_counter() - t
+            return
+        timings[key] += time.perf_counter() - t
+        yield item
+
+def score_file_streaming(input_path, output_path, model_path=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                         n_workers=1):
+    """Score an arbitrarily large event file with bounded memory.
+
+    Works like score_file(), but the file is processed as a generator
+    pipeline (read chunk -> score chunk -> append to output), so peak memory
+    depends on chunk_size rather than on the size of the input file.
+    """
+    start = time.perf_counter()
+    model, close = _open_scorer(model_path, n_workers, chunk_size)
+    try:
+        t0 = time.perf_counter()
+        timings = {'read': 0.0, 'read+predict': 0.0}
+        chunks = _timed(iter_event_chunks(input_path, chunk_size), timings, 'read')
+        scored = _timed(score_chunks(model, chunks), timings, 'read+predict')
+        rows = write_chunks(scored, output_path)
+        end = time.perf_counter()
+    finally:
+        close()
+
+    return _throughput_stats(rows, start, end, {
+        'load': t0 - start,
+        'read': timings['read'],
+        'predict': timings['read+predict'] - timings['read'],
+        'write': (end - t0) - timings['read+predict'],
+    })
+
+_MISSING = object()
+
+class PredictionCache:
+    """Thread-safe LRU cache of predictions with a time-to-live.
+
+    Holds at most maxsize entries; the least recently used entry is evicted
+    first and entries older than ttl_seconds are treated as misses. Hit,
+    miss, eviction and expiry counters are available from stats().
+    """
+
+    def __init__(self, maxsize=PREDICTION_CACHE_SIZE, ttl_seconds=PREDICTION_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+# Shared by every session of the app (cleared when a model is reloaded)
+PREDICTION_CACHE = PredictionCache()
+
+# Cache-key stand-in for NaN, which never compares equal to itself
+_NAN_KEY = ('NaN',)
+
+def _normalize_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        value = float(value)
+        return _NAN_KEY if math.isnan(value) else value
+    return str(value)
+
+def normalize_event(input_data):
+    """Return the eight model features of one event as a hashable tuple.
+
+    input_data is a dict or a one-row DataFrame. Numbers become floats (so
+    50 and 50.0 share a key) and NaN gets a stable stand-in. Values the
+    model could treat differently (e.g. None vs NaN in a categorical
+    column, or padded strings) keep distinct keys.
+    """
+    if _is_frame(input_data):
+        if len(input_data) != 1:
+            raise ValueError("normalize_event expects exactly one event")
+        input_data = input_data.iloc[0].to_dict()
+    missing = [col for col in FEATURES if col not in input_data]
+    if missing:
+        raise ValueError(f"Missing required feature columns: {', '.join(missing)}")
+    return tuple(_normalize_value(input_data[col]) for col in FEATURES)
+
+def cached_prediction(model_path, input_data, cache=None):
+    """Predict the damage for one event, reusing earlier results for identical inputs.
+
+    The cache key combines the model file (path + content hash, so a changed
+    model never serves stale results) with normalize_event(input_data).
+    Returns the post-processed damage as a float.
+    """
+    cache = PREDICTION_CACHE if cache is None else cache
+    # The model and its hash come from one registry record, so a concurrent
+    # reload or clear_model_cache() cannot pair the old model with the new hash
+    record = _load_record(model_path)
+    model = record['model']
+    key = (record['path'], record['sha256'], normalize_event(input_data))
+    damage = cache.get(key, _MISSING)
+    if damage is _MISSING:
+        count('prediction_cache_miss')
+        damage = float(postprocess_prediction(make_prediction(model, input_data))[0])
+        cache.put(key, damage)
+    else:
+        count('prediction_cache_hit')
+    return damage
+
+@register_collector
+def _cache_metrics():
+    """Prediction cache and model registry state, for instrumentation.prometheus_text()."""
+    stats = PREDICTION_CACHE.stats()
+    for key in ('hits', 'misses', 'evictions', 'expirations'):
+        yield ('prediction_cache_' + key + '_total', f'Prediction cache {key}.', 'counter', stats[key], None)
+    yield ('prediction_cache_entries', 'Predictions currently cached.', 'gauge', stats['size'], None)
+    for info in list_loaded_models():
+        labels = {'path': info['path'], 'type': info['model_type']}
+        yield ('model_load_seconds', 'Time the last load of a model file took.', 'gauge', info['load_seconds'], labels)
+    for info in list_loaded_models():
+        labels = {'path': info['path'], 'type': info['model_type']}
+        yield ('model_memory_bytes', 'Resident memory added by loading a model file.', 'gauge', info['memory_bytes'], labels)
+
 def get_feature_importance(model, feature_names):
     """Get feature importance from the model."""
+    import pandas as pd
+
     importance = model.feature_importances_
     feature_importance = pd.DataFrame({'Feature': feature_names, 'Importance': importance})
     return feature_importance.sort_values(by='Importance', ascending=False)
\ No newline at end of file
@@ -0,0 +1,119 @@
+# utils/parallel.py - Multi-core batch prediction with a process pool
+#
+# sklearn's GradientBoostingRegressor.predict walks its trees on a single
+# core, so large batches are sharded across worker processes instead. Each
+# worker loads the pipeline once (in the pool initializer) and then scores
+# the shards it is sent; results are reassembled in input order.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .model_utils import (
+    DEFAULT_CHUNK_SIZE,
+    default_model_path,
+    load_model,
+    make_prediction,
+    postprocess_prediction,
+    preprocess_input,
+)
+
+# The pipeline held by this process when it is a pool worker
+_worker_model = None
+
+
+def _init_worker(model_path, mmap_mode):
+    global _worker_model
+    _worker_model = load_model(model_path, mmap_mode=mmap_mode)
+
+
+def _predict_shard(shard):
+    return make_prediction(_worker_model, shard)
+
+
+def default_workers():
+    """Number of worker processes to use when none is given: one per usable core."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ParallelPredictor:
+    """Score DataFrames of events on a pool of worker processes.
+
+    predict() has the same contract as the pipeline's predict (raw log-scale
+    output, one value per row, in input order), so an instance can be passed
+    anywhere a loaded model is expected, e.g. make_prediction() or
+    score_chunks(). Rows are split into shards of shard_size rows.
+
+    Workers load the model with joblib's mmap_mode='r', which maps the
+    arrays stored in the pickle read-only instead of copying them. Note that
+    sklearn's tree objects copy their node arrays on unpickling, so for the
+    GradientBoosting pipeline each worker still holds its own copy of the
+    trees; the shared part is whatever stays in plain numpy arrays.
+
+    Use as a context manager (or call close()) to shut the pool down.
+    """
+
+    def __init__(self, model_path=None, n_workers=None, shard_size=DEFAULT_CHUNK_SIZE,
+                 mmap_mode='r'):
+        model_path = model_path or default_model_path()
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        self.model_path = model_path
+        self.n_workers = n_workers or default_workers()
+        self.shard_size = shard_size
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            initializer=_init_worker,
+            initargs=(model_path, mmap_mode),
+        )
+
+    def predict(self, data):
+        """Return raw (log-scale) predictions for every row of data, in order."""
+        frame = preprocess_input(data)
+        if len(frame) == 0:
+            return np.empty(0, dtype=np.float64)
+        # Use at least one shard per worker so small batches still spread out
+        shard_size = max(1, min(self.shard_size, -(-len(frame) // self.n_workers)))
+        shards = (frame.iloc[start:start + shard_size] for start in range(0, len(frame), shard_size))
+        return np.concatenate(list(self._executor.map(_predict_shard, shards)))
+
+    def predict_damage(self, data):
+        """Return damage predictions with the usual clip + expm1 post-processing."""
+        return postprocess_prediction(self.predict(data))
+
+    def warm_up(self, max_rounds=20):
+        """Block until the workers have started and loaded the model.
+
+        Useful before timing, so the one-off model loads are not measured.
+        """
+        seen = set()
+        for _ in range(max_rounds):
+            seen.update(self._executor.map(_worker_pid, range(self.n_workers)))
+            if len(seen) >= self.n_workers:
+                break
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _worker_pid(_):
+    # Linger briefly so the tasks spread over all workers instead of one
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def predict_parallel(data, model_path=None, n_workers=None, shard_size=DEFAULT_CHUNK_SIZE):
+    """Predict damage for data on a temporary worker pool (see ParallelPredictor)."""
+    with ParallelPredictor(model_path, n_workers=n_workers, shard_size=shard_size) as predictor:
+        return predictor.predict_damage(data)
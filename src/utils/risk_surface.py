@@ -0,0 +1,289 @@
+# utils/risk_surface.py - Predicted damage over a lat/lon grid for one storm scenario
+#
+# A scenario fixes everything but the location (event type, month,
+# magnitude, ...); the model is then evaluated at every point of a regular
+# lat/lon grid in vectorized batches, optionally on a process pool. Grids
+# are refinable: level L halves the spacing of level L-1, whose points it
+# contains, so a refinement only scores the new points. Every level is
+# cached on disk per model and scenario.
+#
+# Usage (from the src directory):
+#   python -m utils.risk_surface --event-type Tornado --month May --magnitude 80 --level 2
+#   python -m utils.risk_surface --event-type Hail --level 3 --workers 4 --state TX
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .data_utils import DEFAULT_CACHE_DIR
+from .model_utils import (
+    DEFAULT_CHUNK_SIZE,
+    EVENT_TYPES,
+    MAGNITUDE_TYPES,
+    MONTHS,
+    STATES,
+    default_model_path,
+    get_model_info,
+    load_model,
+    make_prediction,
+    postprocess_prediction,
+)
+
+# Bump when the grid layout or the scenario encoding changes so cached grids are recomputed
+SURFACE_VERSION = 1
+
+# Contiguous United States
+DEFAULT_BOUNDS = (24.5, 49.5, -125.0, -66.5)  # lat_min, lat_max, lon_min, lon_max
+DEFAULT_STEP = 0.5  # degrees between level-0 grid points
+MAX_LEVEL = 4
+
+# Below this many new points a process pool costs more than it saves
+PARALLEL_MIN_POINTS = 100_000
+
+# Approximate geographic centre (lat, lon) of each state, used to give every
+# grid point the STATE of the nearest centre
+STATE_CENTROIDS = {
+    'AL': (32.8, -86.8), 'AK': (64.7, -152.0), 'AZ': (34.3, -111.7), 'AR': (34.9, -92.4),
+    'CA': (37.2, -119.4), 'CO': (39.0, -105.5), 'CT': (41.6, -72.7), 'DE': (39.0, -75.5),
+    'FL': (28.6, -82.4), 'GA': (32.7, -83.4), 'HI': (20.3, -156.4), 'ID': (44.4, -114.6),
+    'IL': (40.0, -89.2), 'IN': (39.9, -86.3), 'IA': (42.1, -93.5), 'KS': (38.5, -98.4),
+    'KY': (37.5, -85.3), 'LA': (31.1, -92.0), 'ME': (45.4, -69.2), 'MD': (39.0, -76.8),
+    'MA': (42.3, -71.8), 'MI': (44.3, -85.4), 'MN': (46.3, -94.3), 'MS': (32.7, -89.7),
+    'MO': (38.4, -92.5), 'MT': (47.0, -109.6), 'NE': (41.5, -99.8), 'NV': (39.3, -116.6),
+    'NH': (43.7, -71.6), 'NJ': (40.2, -74.7), 'NM': (34.4, -106.1), 'NY': (42.9, -75.5),
+    'NC': (35.6, -79.4), 'ND': (47.5, -100.5), 'OH': (40.3, -82.8), 'OK': (35.6, -97.5),
+    'OR': (43.9, -120.6), 'PA': (40.9, -77.8), 'RI': (41.7, -71.5), 'SC': (33.9, -80.9),
+    'SD': (44.4, -100.2), 'TN': (35.9, -86.4), 'TX': (31.5, -99.3), 'UT': (39.3, -111.7),
+    'VT': (44.1, -72.7), 'VA': (37.5, -78.9), 'WA': (47.4, -120.5), 'WV': (38.6, -80.6),
+    'WI': (44.6, -89.9), 'WY': (43.0, -107.6),
+}
+
+_SCENARIO_DEFAULTS = {
+    'EVENT_TYPE': EVENT_TYPES[0],
+    'MONTH_NAME': MONTHS[0],
+    'MAGNITUDE': 50.0,
+    'MAGNITUDE_TYPE': MAGNITUDE_TYPES[0],
+    'DURATION_HOURS': 1.0,
+    'STATE': None,  # None = the state nearest to each grid point
+}
+
+
+def make_scenario(**features):
+    """Return a complete scenario dict (model features except the location).
+
+    Missing features get defaults; STATE=None assigns every grid point the
+    state whose centre is nearest.
+    """
+    unknown = set(features) - set(_SCENARIO_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown scenario features: {', '.join(sorted(unknown))}")
+    scenario = dict(_SCENARIO_DEFAULTS, **features)
+    scenario['MAGNITUDE'] = float(scenario['MAGNITUDE'])
+    scenario['DURATION_HOURS'] = float(scenario['DURATION_HOURS'])
+    return scenario
+
+
+def grid_axes(bounds=DEFAULT_BOUNDS, step=DEFAULT_STEP, level=0):
+    """Return (lats, lons) of the grid at a refinement level.
+
+    Level L has spacing step / 2**L; its every other point is a point of
+    level L-1, so refinements reuse the coarser values.
+    """
+    lat_min, lat_max, lon_min, lon_max = bounds
+    if lat_max <= lat_min or lon_max <= lon_min or step <= 0:
+        raise ValueError(f"Invalid grid bounds {bounds} or step {step}")
+    scale = 2 ** level
+    n_lat = int(np.floor((lat_max - lat_min) / step + 1e-9)) * scale + 1
+    n_lon = int(np.floor((lon_max - lon_min) / step + 1e-9)) * scale + 1
+    spacing = step / scale
+    return lat_min + spacing * np.arange(n_lat), lon_min + spacing * np.arange(n_lon)
+
+
+def nearest_states(lats, lons, chunk_size=65_536):
+    """STATE code of the nearest state centre for each (lat, lon) point."""
+    codes = np.array(list(STATE_CENTROIDS), dtype=object)
+    centres = np.array(list(STATE_CENTROIDS.values()), dtype=np.float64)
+    lats, lons = np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+    nearest = np.empty(len(lats), dtype=np.intp)
+    for start in range(0, len(lats), chunk_size):
+        lat = lats[start:start + chunk_size, None]
+        lon = lons[start:start + chunk_size, None]
+        # Equirectangular distance is plenty to pick the nearest centre
+        dx = (lon - centres[:, 1]) * np.cos(np.radians((lat + centres[:, 0]) / 2))
+        dy = lat - centres[:, 0]
+        nearest[start:start + len(lat)] = np.argmin(dx * dx + dy * dy, axis=1)
+    return codes[nearest]
+
+
+def scenario_events(scenario, lats, lons):
+    """DataFrame of model inputs for the scenario at each (lat, lon) point."""
+    n = len(lats)
+    state = scenario['STATE']
+    return pd.DataFrame({
+        'STATE': nearest_states(lats, lons) if state is None else np.full(n, state, dtype=object),
+        'EVENT_TYPE': np.full(n, scenario['EVENT_TYPE'], dtype=object),
+        'MONTH_NAME': np.full(n, scenario['MONTH_NAME'], dtype=object),
+        'MAGNITUDE': np.full(n, scenario['MAGNITUDE']),
+        'MAGNITUDE_TYPE': np.full(n, scenario['MAGNITUDE_TYPE'], dtype=object),
+        'BEGIN_LAT': np.asarray(lats, dtype=np.float64),
+        'BEGIN_LON': np.asarray(lons, dtype=np.float64),
+        'DURATION_HOURS': np.full(n, scenario['DURATION_HOURS']),
+    })
+
+
+def _score_points(model_path, scenario, lats, lons, n_workers, batch_rows, pool=None):
+    """Post-processed damage predictions at the given points, scored in batches of batch_rows.
+
+    pool is an open ParallelPredictor to use when the points warrant one.
+    """
+    events = scenario_events(scenario, lats, lons)
+    if n_workers is None:
+        from .parallel import default_workers
+
+        n_workers = default_workers() if len(events) >= PARALLEL_MIN_POINTS else 1
+    if n_workers > 1 and len(events) > batch_rows:
+        if pool is not None:
+            return postprocess_prediction(pool.predict(events))
+        from .parallel import ParallelPredictor
+
+        with ParallelPredictor(model_path, n_workers=n_workers, shard_size=batch_rows) as pool:
+            return postprocess_prediction(pool.predict(events))
+    model = load_model(model_path)
+    damage = np.empty(len(events), dtype=np.float64)
+    for start in range(0, len(events), batch_rows):
+        chunk = events.iloc[start:start + batch_rows]
+        damage[start:start + len(chunk)] = postprocess_prediction(make_prediction(model, chunk))
+    return damage
+
+
+def surface_key(model_path, scenario, bounds, step, level):
+    """Cache key of one grid: model content, scenario, grid and level."""
+    info = get_model_info(model_path) or {}
+    payload = json.dumps({
+        'version': SURFACE_VERSION,
+        'model': info.get('sha256') or os.path.abspath(model_path),
+        'scenario': scenario,
+        'bounds': list(bounds),
+        'step': step,
+        'level': level,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def surface_path(key, level, cache_dir=DEFAULT_CACHE_DIR):
+    return os.path.join(cache_dir, 'risk_surface', f'{key}-L{level}.npz')
+
+
+def _read_surface(path):
+    try:
+        with np.load(path) as f:
+            return {'lats': f['lats'], 'lons': f['lons'], 'damage': f['damage']}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _write_surface(path, surface):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(tmp_path, lats=surface['lats'], lons=surface['lons'], damage=surface['damage'])
+    os.replace(tmp_path, path)
+
+
+def compute_surface(scenario, level=0, bounds=DEFAULT_BOUNDS, step=DEFAULT_STEP, model_path=None,
+                    n_workers=None, batch_rows=DEFAULT_CHUNK_SIZE, cache_dir=DEFAULT_CACHE_DIR,
+                    use_cache=True, pool=None):
+    """Return the damage grid of a scenario at a refinement level.
+
+    The result is a dict with 'lats' (n_lat,), 'lons' (n_lon,) and
+    'damage' (n_lat, n_lon) of post-processed predictions, plus 'computed_points' and
+    'seconds' for this call. A cached grid is returned as is; otherwise
+    level L starts from level L-1 (computed or cached first) and only the
+    points it adds are scored. n_workers=None uses a process pool (one worker
+    per core) for large grids, 1 always scores in-process. One pool is shared
+    by all the levels computed in a call; pool passes in an open
+    ParallelPredictor to use instead.
+    """
+    if not 0 <= level <= MAX_LEVEL:
+        raise ValueError(f"level must be between 0 and {MAX_LEVEL}")
+    scenario = make_scenario(**scenario)
+    model_path = model_path or default_model_path()
+    load_model(model_path)  # registers the model so its hash is known for the cache key
+    path = surface_path(surface_key(model_path, scenario, bounds, step, level), level, cache_dir)
+    if use_cache:
+        cached = _read_surface(path)
+        if cached is not None:
+            return dict(cached, computed_points=0, seconds=0.0)
+
+    if pool is None and n_workers != 1:
+        from .parallel import ParallelPredictor
+
+        # Worker processes only start (and load the model) if a level needs them
+        with ParallelPredictor(model_path, n_workers=n_workers, shard_size=batch_rows) as pool:
+            return compute_surface(scenario, level, bounds, step, model_path, n_workers,
+                                   batch_rows, cache_dir, use_cache, pool)
+
+    start = time.perf_counter()
+    lats, lons = grid_axes(bounds, step, level)
+    damage = np.full((len(lats), len(lons)), np.nan)
+    computed = 0
+    if level > 0:
+        coarse = compute_surface(scenario, level - 1, bounds, step, model_path, n_workers,
+                                 batch_rows, cache_dir, use_cache, pool)
+        damage[::2, ::2] = coarse['damage']
+        computed = coarse['computed_points']
+    todo = np.isnan(damage)
+    rows, cols = np.nonzero(todo)
+    if len(rows):
+        damage[rows, cols] = _score_points(model_path, scenario, lats[rows], lons[cols], n_workers,
+                                           batch_rows, pool)
+    surface = {'lats': lats, 'lons': lons, 'damage': damage}
+    if use_cache:
+        _write_surface(path, surface)
+    return dict(surface, computed_points=computed + len(rows), seconds=time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.risk_surface',
+                                     description='Precompute the predicted damage grid of a storm scenario.')
+    parser.add_argument('--event-type', default=_SCENARIO_DEFAULTS['EVENT_TYPE'])
+    parser.add_argument('--month', default=_SCENARIO_DEFAULTS['MONTH_NAME'])
+    parser.add_argument('--magnitude', type=float, default=_SCENARIO_DEFAULTS['MAGNITUDE'])
+    parser.add_argument('--magnitude-type', default=_SCENARIO_DEFAULTS['MAGNITUDE_TYPE'])
+    parser.add_argument('--duration-hours', type=float, default=_SCENARIO_DEFAULTS['DURATION_HOURS'])
+    parser.add_argument('--state', choices=STATES, default=None,
+                        help='use this STATE everywhere (default: the nearest state to each point)')
+    parser.add_argument('--level', type=int, default=0, help=f'refinement level 0-{MAX_LEVEL} (default: 0)')
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP,
+                        help=f'level-0 grid spacing in degrees (default: {DEFAULT_STEP})')
+    parser.add_argument('--bounds', type=float, nargs=4, default=DEFAULT_BOUNDS,
+                        metavar=('LAT_MIN', 'LAT_MAX', 'LON_MIN', 'LON_MAX'))
+    parser.add_argument('--model', default=None, help='model file (default: the up-to-date model in src/)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: a pool for large grids, 1 = in-process)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    scenario = make_scenario(EVENT_TYPE=args.event_type, MONTH_NAME=args.month, MAGNITUDE=args.magnitude,
+                             MAGNITUDE_TYPE=args.magnitude_type, DURATION_HOURS=args.duration_hours,
+                             STATE=args.state)
+    try:
+        surface = compute_surface(scenario, args.level, tuple(args.bounds), args.step, args.model,
+                                  args.workers, cache_dir=args.cache_dir)
+    except (FileNotFoundError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    damage = surface['damage']
+    print(f"{damage.shape[0]} x {damage.shape[1]} grid: scored {surface['computed_points']:,} points "
+          f"in {surface['seconds']:.2f}s; damage {damage.min():,.0f} - {damage.max():,.0f} "
+          f"(median {np.median(damage):,.0f})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+# utils/search.py - Successive-halving hyperparameter search on cached preprocessing
+#
+# HalvingRandomSearchCV scores many random candidates on a small sample of
+# the training rows, keeps the best 1/factor of them and rescores those
+# on factor times more rows, until one candidate has seen all of them. The
+# candidates differ only in the boosting parameters, so the preprocessor of
+# every (fold, sample size) is fitted once and then read back from the
+# training cache (utils.train_cache) for all other candidates; the report
+# includes the fit time that saved.
+#
+# Usage (from the src directory):
+#   python -m utils.search StormEvents_cleaned.csv --engine hist --candidates 32
+#   python -m utils.search StormEvents_cleaned.csv --engine gb --candidates 16 --jobs 4 --json search.json
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from .memory import format_bytes, peak_rss_bytes
+from .train import DEFAULT_PARAMS, ENGINES, build_pipeline, load_training_data, split_data
+from .train_cache import DEFAULT_MAX_CACHE_BYTES, DEFAULT_TRAIN_CACHE_DIR, TransformerCache
+
+
+def param_distributions(engine):
+    """Search space of the boosting model for engine (keys are pipeline parameters)."""
+    from scipy.stats import loguniform, randint, uniform
+
+    if engine == 'gb':
+        return {
+            'model__n_estimators': randint(50, 301),
+            'model__max_depth': randint(3, 11),
+            'model__learning_rate': loguniform(0.01, 0.3),
+            'model__subsample': uniform(0.6, 0.4),
+            'model__min_samples_leaf': randint(1, 51),
+        }
+    return {
+        'model__max_iter': randint(50, 401),
+        'model__max_depth': [None, 4, 6, 8, 10],
+        'model__learning_rate': loguniform(0.01, 0.3),
+        'model__max_leaf_nodes': randint(15, 128),
+        'model__min_samples_leaf': randint(5, 101),
+        'model__l2_regularization': loguniform(1e-4, 10.0),
+    }
+
+
+def _cache_delta(before, after):
+    return {key: after[key] - before[key] for key in before}
+
+
+def halving_search(data_path, engine='hist', candidates=32, factor=3, cv=5, n_jobs=1, nrows=None,
+                   cache_dir=DEFAULT_TRAIN_CACHE_DIR, random_state=42, max_cache_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """Run a successive-halving search; returns (best_params, report).
+
+    cache_dir=None disables the preprocessing cache (e.g. to measure what
+    it saves). Afterwards the cache is pruned to max_cache_bytes.
+    """
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingRandomSearchCV
+
+    start = time.perf_counter()
+    X, y = load_training_data(data_path, nrows=nrows)
+    X_train, _, y_train, _ = split_data(X, y, random_state=random_state)
+    y_train_log = np.log1p(y_train)
+
+    cache = TransformerCache(cache_dir) if cache_dir is not None else None
+    stats_before = cache.stats() if cache else None
+    search = HalvingRandomSearchCV(
+        build_pipeline(engine, cache_dir, random_state=random_state),
+        param_distributions(engine),
+        n_candidates=candidates,
+        factor=factor,
+        cv=cv,
+        scoring='r2',
+        n_jobs=n_jobs,
+        random_state=random_state,
+        min_resources='exhaust',
+    )
+    t = time.perf_counter()
+    search.fit(X_train, y_train_log)
+    search_seconds = time.perf_counter() - t
+    cache_report = None
+    if cache:
+        cache_report = _cache_delta(stats_before, cache.stats())
+        cache_report['bytes_freed'] = cache.prune(max_cache_bytes)
+        cache_report['bytes'] = cache.size_bytes()
+
+    rounds = [
+        {'round': int(r), 'candidates': int(np.sum(search.cv_results_['iter'] == r)),
+         'rows': int(search.n_resources_[r])}
+        for r in range(search.n_iterations_)
+    ]
+    report = {
+        'engine': engine,
+        'best_params': {key.replace('model__', ''): _plain(value) for key, value in search.best_params_.items()},
+        'best_cv_r2': float(search.best_score_),
+        'rounds': rounds,
+        'fits': int(len(search.cv_results_['params']) * cv),
+        'search_seconds': search_seconds,
+        'total_seconds': time.perf_counter() - start,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'cache': cache_report,
+    }
+    return search.best_params_, report
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def print_report(report, out=sys.stdout):
+    print(f"Engine {report['engine']}: {report['fits']} fits in {report['search_seconds']:.1f}s "
+          f"(total {report['total_seconds']:.1f}s, peak RSS {format_bytes(report['peak_rss_bytes'])})", file=out)
+    for r in report['rounds']:
+        print(f"  round {r['round']}: {r['candidates']:>3} candidates on {r['rows']:,} rows", file=out)
+    print(f"Best CV R² {report['best_cv_r2']:.4f} with {json.dumps(report['best_params'])}", file=out)
+    cache = report['cache']
+    if cache is not None:
+        print(f"Preprocessing cache: {cache['hits']} hits / {cache['misses']} misses; "
+              f"{cache['seconds_computed']:.1f}s computed, {cache['seconds_saved']:.1f}s saved; "
+              f"{format_bytes(cache['bytes'])} on disk ({format_bytes(cache['bytes_freed'])} pruned)", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.search',
+                                     description='Successive-halving hyperparameter search for the damage model.')
+    parser.add_argument('data', help='StormEvents CSV (e.g. StormEvents_cleaned.csv)')
+    parser.add_argument('--engine', choices=ENGINES, default='hist')
+    parser.add_argument('--candidates', type=int, default=32, help='random candidates in the first round (default: 32)')
+    parser.add_argument('--factor', type=int, default=3,
+                        help='keep 1/FACTOR of the candidates per round, on FACTOR times more rows (default: 3)')
+    parser.add_argument('--cv', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=1, help='parallel fits (default: 1)')
+    parser.add_argument('--rows', type=int, default=None, help='only read the first ROWS rows of the CSV')
+    parser.add_argument('--cache-dir', default=DEFAULT_TRAIN_CACHE_DIR,
+                        help=f'training cache directory (default: {DEFAULT_TRAIN_CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true', help='refit the preprocessing every time')
+    parser.add_argument('--clear-cache', action='store_true', help='empty the training cache directory first')
+    parser.add_argument('--seed', type=int, default=DEFAULT_PARAMS['random_state'])
+    parser.add_argument('--json', dest='json_path', help='write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    if args.clear_cache:
+        freed = TransformerCache(args.cache_dir).clear()
+        print(f'Cleared {format_bytes(freed)} from {args.cache_dir}')
+    try:
+        _, report = halving_search(args.data, args.engine, args.candidates, args.factor, args.cv, args.jobs,
+                                   args.rows, None if args.no_cache else args.cache_dir, args.seed)
+    except (FileNotFoundError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
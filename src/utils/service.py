@@ -0,0 +1,291 @@
+# utils/service.py - HTTP JSON prediction service
+#
+# A small standard-library HTTP server for systems that cannot drive the
+# Streamlit form. The model is loaded once at start-up and kept warm in the
+# process-wide registry (a changed model file is picked up on the next
+# request), and concurrent requests are coalesced into vectorized batches by
+# a MicroBatcher.
+#
+#   GET  /health       liveness + whether the model is loaded
+#   GET  /model-info   model load statistics and batching metrics
+#   GET  /metrics      Prometheus text format (stage timings with --instrument)
+#   POST /predict      {"event": {...}} or {"events": [{...}, ...]}
+#
+# Usage (from the src directory):
+#   python -m utils.service --port 8000
+#   curl -s localhost:8000/predict -d '{"event": {"STATE": "TEXAS", "EVENT_TYPE": "Hail",
+#        "MONTH_NAME": "May", "MAGNITUDE": 1.75, "MAGNITUDE_TYPE": "EG",
+#        "BEGIN_LAT": 32.7, "BEGIN_LON": -97.3, "DURATION_HOURS": 0.5}}'
+
+import argparse
+import json
+import math
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import instrumentation
+from .batching import DEFAULT_MAX_BATCH_ROWS, DEFAULT_MAX_WAIT_MS, MicroBatcher, damage_predictor
+from .model_utils import (
+    CATEGORICAL_FEATURES,
+    FEATURES,
+    NUMERIC_FEATURES,
+    default_model_path,
+    get_model_info,
+)
+
+# Limits on a single request
+MAX_REQUEST_EVENTS = 10_000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class ValidationError(ValueError):
+    """Raised for a request body that does not describe valid events."""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or []
+
+
+def validate_event(event):
+    """Check one event and return it with exactly the model features.
+
+    Numeric features must be numbers (null = missing, imputed by the model)
+    and categorical features strings (null = missing, imputed as 'Unknown').
+    Returns (event, errors); event is None when there are errors.
+    """
+    if not isinstance(event, dict):
+        return None, ['event must be a JSON object']
+    errors = [f'missing feature {col}' for col in FEATURES if col not in event]
+    clean = {}
+    for col in NUMERIC_FEATURES:
+        value = event.get(col)
+        if value is None:
+            clean[col] = math.nan
+            continue
+        number = None
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            try:
+                number = float(value)
+            except OverflowError:
+                # An integer too large for a float (JSON allows any number of digits)
+                pass
+        if number is None or not math.isfinite(number):
+            if col in event:
+                errors.append(f'{col} must be a finite number or null')
+        else:
+            clean[col] = number
+    for col in CATEGORICAL_FEATURES:
+        value = event.get(col)
+        if value is None:
+            # The pipeline's imputer only treats NaN (not None) as missing
+            clean[col] = math.nan
+        elif not isinstance(value, str):
+            if col in event:
+                errors.append(f'{col} must be a string or null')
+        else:
+            clean[col] = value
+    if errors:
+        return None, errors
+    return {col: clean[col] for col in FEATURES}, []
+
+
+def parse_request(body):
+    """Parse a /predict body into (events, single).
+
+    Accepts {"event": {...}}, {"events": [...]}, a bare event object or a
+    JSON array of events. Raises ValidationError.
+    """
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise ValidationError(f'invalid JSON: {e}')
+    if isinstance(payload, dict) and 'events' in payload:
+        events, single = payload['events'], False
+    elif isinstance(payload, dict) and 'event' in payload:
+        events, single = [payload['event']], True
+    elif isinstance(payload, list):
+        events, single = payload, False
+    else:
+        events, single = [payload], True
+    if not isinstance(events, list) or not events:
+        raise ValidationError('events must be a non-empty array')
+    if len(events) > MAX_REQUEST_EVENTS:
+        raise ValidationError(f'at most {MAX_REQUEST_EVENTS} events per request')
+
+    clean, details = [], []
+    for i, event in enumerate(events):
+        checked, errors = validate_event(event)
+        if errors:
+            details.append({'index': i, 'errors': errors})
+        clean.append(checked)
+    if details:
+        raise ValidationError('invalid events', details)
+    return clean, single
+
+
+class PredictionService:
+    """The model and batcher behind the HTTP handlers."""
+
+    def __init__(self, model_path=None, max_batch_rows=DEFAULT_MAX_BATCH_ROWS, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.model_path = model_path or default_model_path()
+        self.started_at = time.time()
+        self.batcher = MicroBatcher(damage_predictor(self.model_path),
+                                    max_batch_rows=max_batch_rows, max_wait_ms=max_wait_ms)
+        instrumentation.register_collector(self._batching_metrics)
+
+    def _batching_metrics(self):
+        stats = self.batcher.stats.snapshot()
+        for key in ('requests', 'rows', 'batches', 'errors'):
+            yield (f'batcher_{key}_total', f'Micro-batcher {key}.', 'counter', stats[key], None)
+        yield ('batcher_predict_seconds_total', 'Time spent in batched predict calls.', 'counter',
+               stats['predict_seconds'], None)
+        cumulative = 0
+        for label, n in stats['batch_rows_histogram'].items():
+            cumulative += n
+            le = '+Inf' if label.startswith('>') else label[2:]
+            yield ('batcher_batch_rows_bucket', 'Rows per batched predict call.', 'histogram', cumulative, {'le': le})
+        yield ('batcher_batch_rows_sum', 'Rows per batched predict call.', 'histogram', stats['rows'], None)
+        yield ('batcher_batch_rows_count', 'Rows per batched predict call.', 'histogram', stats['batches'], None)
+
+    def predict(self, events):
+        return self.batcher.predict(events)
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'model_loaded': get_model_info(self.model_path) is not None,
+            'uptime_seconds': time.time() - self.started_at,
+        }
+
+    def model_info(self):
+        return {
+            'model': get_model_info(self.model_path),
+            'features': FEATURES,
+            # 'batching' holds the measured statistics (max_batch_rows is the largest batch seen)
+            'batching': self.batcher.stats.snapshot(),
+            'config': {'max_batch_rows': self.batcher.max_batch_rows, 'max_wait_ms': self.batcher.max_wait_ms},
+        }
+
+    def close(self):
+        instrumentation.unregister_collector(self._batching_metrics)
+        self.batcher.close()
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    server_version = 'StormDamageService/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if not getattr(self.server, 'quiet', False):
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == '/health':
+            self._send_json(200, service.health())
+        elif self.path == '/model-info':
+            self._send_json(200, service.model_info())
+        elif self.path == '/metrics':
+            body = instrumentation.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': f'unknown path {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be delimited, so the connection cannot be reused either
+            self.close_connection = True
+            self._send_json(400, {'error': 'Content-Length must be a non-negative integer'})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {'error': f'request body larger than {MAX_BODY_BYTES} bytes'})
+            return
+        try:
+            events, single = parse_request(self.rfile.read(length))
+        except ValidationError as e:
+            self._send_json(400, {'error': str(e), 'details': e.details})
+            return
+        try:
+            damage = self.server.service.predict(events)
+        except Exception as e:
+            self._send_json(500, {'error': f'prediction failed: {e}'})
+            return
+        if single:
+            self._send_json(200, {'predicted_damage': float(damage[0])})
+        else:
+            self._send_json(200, {'predictions': [float(d) for d in damage]})
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts of concurrent clients are what batching is for; don't refuse them
+    request_queue_size = 128
+
+
+def make_server(service, host='127.0.0.1', port=8000, quiet=False):
+    """Create (but do not start) a threaded HTTP server for service."""
+    server = PredictionServer((host, port), PredictionHandler)
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.service',
+                                     description='Serve storm damage predictions over HTTP/JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model', default=None,
+                        help='trained pipeline (.pkl), flat export (.npz) or model artifact directory; '
+                             'default: the up-to-date model in src/')
+    parser.add_argument('--max-batch-rows', type=int, default=DEFAULT_MAX_BATCH_ROWS,
+                        help=f'events per coalesced predict call (default: {DEFAULT_MAX_BATCH_ROWS})')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help=f'how long a request may wait for others to batch with (default: {DEFAULT_MAX_WAIT_MS})')
+    parser.add_argument('--quiet', action='store_true', help='do not log every request')
+    parser.add_argument('--instrument', action='store_true',
+                        help='record per-stage timings for /metrics (same as STORM_INSTRUMENTATION=1)')
+    args = parser.parse_args(argv)
+    if args.instrument:
+        instrumentation.enable()
+
+    try:
+        service = PredictionService(args.model, max_batch_rows=args.max_batch_rows, max_wait_ms=args.max_wait_ms)
+    except FileNotFoundError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    server = make_server(service, args.host, args.port, quiet=args.quiet)
+    print(f'Serving {service.model_path} on http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
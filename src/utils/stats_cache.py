@@ -0,0 +1,184 @@
+# utils/stats_cache.py - Precomputed aggregates for the Statistics page
+#
+# Summary statistics, event type counts, the correlation matrix and
+# damage totals per state and per month are computed once per dataset
+# version and stored in a small JSON file next to the dataset cache. The
+# page renders from these aggregates, so a rerun does not touch the full
+# dataset; the file is rebuilt only when dataset_signature() changes.
+#
+# Usage (from the src directory), e.g. after replacing the CSV:
+#   python -m utils.stats_cache            # build (or confirm) the cache
+#   python -m utils.stats_cache --rebuild
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .data_utils import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_DATA_PATH,
+    dataset_signature,
+    load_dataset,
+    parse_damage,
+)
+from .features import calendar_features
+from .model_utils import MONTHS
+
+# Bump when the set or layout of the aggregates changes
+STATS_VERSION = 1
+
+# Aggregates stored as tables / series (everything else is a plain scalar)
+_FRAMES = ('describe', 'correlation')
+_SERIES = ('event_counts', 'damage_by_state', 'damage_by_month')
+
+
+def stats_path(path=DEFAULT_DATA_PATH, cache_dir=DEFAULT_CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, stem + '.stats.json')
+
+
+def prepare_frame(df):
+    """Parse the damage columns of a raw dataset frame into USD (in place) and return it."""
+    for col in ('DAMAGE_PROPERTY', 'DAMAGE_CROPS'):
+        if col in df.columns:
+            df[col] = parse_damage(df[col])
+    return df
+
+
+def month_names(df):
+    """Return the month name of every event (from MONTH_NAME or BEGIN_DATE_TIME), or None."""
+    if 'MONTH_NAME' in df.columns:
+        return df['MONTH_NAME'].astype('object')
+    if 'BEGIN_DATE_TIME' in df.columns:
+        return pd.Series(calendar_features(df['BEGIN_DATE_TIME'])['MONTH_NAME'], index=df.index, dtype=object)
+    return None
+
+
+def calendar_order(series):
+    """Reorder a month-indexed series January..December (unknown labels last)."""
+    order = [m for m in MONTHS if m in series.index]
+    return series.reindex(order + [m for m in series.index if m not in order])
+
+
+def compute_stats(df):
+    """Compute the page's aggregates from a prepared frame (see prepare_frame)."""
+    numeric = df.select_dtypes(include=[np.number])
+    stats = {
+        'rows': int(len(df)),
+        'unique_states': int(df['STATE'].nunique()) if 'STATE' in df.columns else 0,
+        'describe': numeric.describe() if not numeric.empty else None,
+        'correlation': numeric.corr() if len(numeric.columns) > 1 else None,
+        'event_counts': df['EVENT_TYPE'].astype('object').value_counts() if 'EVENT_TYPE' in df.columns else None,
+        'avg_property_damage': None,
+        'max_property_damage': None,
+        'damage_by_state': None,
+        'damage_by_month': None,
+    }
+    if 'DAMAGE_PROPERTY' in df.columns:
+        damage = df['DAMAGE_PROPERTY']
+        stats['avg_property_damage'] = float(damage.mean())
+        stats['max_property_damage'] = float(damage.max())
+        if 'STATE' in df.columns:
+            stats['damage_by_state'] = (damage.groupby(df['STATE'].astype('object')).sum()
+                                        .sort_values(ascending=False))
+        months = month_names(df)
+        if months is not None:
+            stats['damage_by_month'] = calendar_order(damage.groupby(months).sum())
+    return stats
+
+
+def _to_json(stats):
+    out = {}
+    for key, value in stats.items():
+        if value is None:
+            out[key] = None
+        elif key in _FRAMES:
+            out[key] = value.to_dict(orient='split')
+        elif key in _SERIES:
+            out[key] = {'index': [str(i) for i in value.index], 'values': [float(v) for v in value.values]}
+        else:
+            out[key] = value
+    return out
+
+
+def _from_json(raw):
+    stats = {}
+    for key, value in raw.items():
+        if value is None:
+            stats[key] = None
+        elif key in _FRAMES:
+            stats[key] = pd.DataFrame(value['data'], index=value['index'], columns=value['columns'])
+        elif key in _SERIES:
+            stats[key] = pd.Series(value['values'], index=value['index'], dtype='float64')
+        else:
+            stats[key] = value
+    return stats
+
+
+def _read_stats_file(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_stats(path=DEFAULT_DATA_PATH, cache_dir=DEFAULT_CACHE_DIR):
+    """Recompute the aggregates from the dataset and write the stats file; returns them."""
+    df = prepare_frame(load_dataset(path, cache_dir))
+    stats = compute_stats(df)
+    # Read the signature after loading, since a download/cache rebuild can change it
+    payload = {
+        'version': STATS_VERSION,
+        'signature': dataset_signature(path, cache_dir),
+        'built_at': time.time(),
+        'stats': _to_json(stats),
+    }
+    out_path = stats_path(path, cache_dir)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, out_path)
+    return stats
+
+
+def load_stats(path=DEFAULT_DATA_PATH, cache_dir=DEFAULT_CACHE_DIR, rebuild=False):
+    """Return the dataset aggregates, rebuilding them only if the dataset changed.
+
+    Raises FileNotFoundError (from load_dataset) when no dataset is available.
+    """
+    if not rebuild:
+        payload = _read_stats_file(stats_path(path, cache_dir))
+        signature = dataset_signature(path, cache_dir)
+        if (payload is not None and signature is not None
+                and payload.get('version') == STATS_VERSION and payload.get('signature') == signature):
+            return _from_json(payload['stats'])
+    return build_stats(path, cache_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.stats_cache',
+                                     description='Precompute the Statistics page aggregates.')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help='StormEvents CSV (default: src/StormEvents_cleaned1.csv)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--rebuild', action='store_true', help='recompute even if the cache is current')
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        stats = load_stats(args.data, args.cache_dir, rebuild=args.rebuild)
+    except FileNotFoundError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    print(f"{stats['rows']:,} events -> {stats_path(args.data, args.cache_dir)} "
+          f"({time.perf_counter() - start:.2f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+# utils/sweep.py - Cartesian scenario sweeps with partial-dependence summaries
+#
+# A sweep varies some model features over lists of values (the axes) and
+# holds the others fixed, e.g. magnitude 0-300 mph x duration 0-72 h x every
+# event type x every state. The cartesian product is never built in one
+# piece: each chunk of rows is decoded from its flat row numbers with
+# np.unravel_index, scored in one vectorized call and, optionally, appended
+# to a CSV/Parquet file. While streaming, the mean prediction per value of
+# each axis (and per pair of axes) is accumulated, which gives
+# partial-dependence curves without keeping the rows.
+#
+# Usage (from the src directory):
+#   python -m utils.sweep --magnitude 0 300 10 --duration 0 72 6 --event-type all --state all \
+#       --output sweep.parquet
+#   python -m utils.sweep --magnitude 0 300 5 --event-type Tornado Flood --curves
+
+import argparse
+import json
+import sys
+import time
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from .model_utils import (
+    CATEGORICAL_FEATURES,
+    DEFAULT_CHUNK_SIZE,
+    EVENT_TYPES,
+    FEATURES,
+    MAGNITUDE_TYPES,
+    MONTHS,
+    NUMERIC_FEATURES,
+    PREDICTION_COLUMN,
+    STATES,
+    default_model_path,
+    load_model,
+    make_prediction,
+    postprocess_prediction,
+    write_chunks,
+)
+from .risk_surface import STATE_CENTROIDS
+
+# Values of the features that are neither swept nor fixed (the Assess Risk form defaults)
+SWEEP_DEFAULTS = {
+    'STATE': 'CO',
+    'EVENT_TYPE': EVENT_TYPES[0],
+    'MONTH_NAME': 'September',
+    'MAGNITUDE': 50.0,
+    'MAGNITUDE_TYPE': MAGNITUDE_TYPES[0],
+    'BEGIN_LAT': 39.74,
+    'BEGIN_LON': -104.99,
+    'DURATION_HOURS': 2.0,
+}
+
+# Pair tables larger than this many cells are not accumulated
+MAX_PAIR_CELLS = 1_000_000
+
+# Command line flag of each feature
+_FLAGS = {
+    'STATE': '--state', 'EVENT_TYPE': '--event-type', 'MONTH_NAME': '--month',
+    'MAGNITUDE': '--magnitude', 'MAGNITUDE_TYPE': '--magnitude-type',
+    'BEGIN_LAT': '--lat', 'BEGIN_LON': '--lon', 'DURATION_HOURS': '--duration',
+}
+
+
+def make_sweep(axes, fixed=None):
+    """Return a sweep: {'axes': {feature: values array}, 'fixed': {feature: value}}.
+
+    axes maps the swept features to their values (in sweep order); fixed
+    overrides SWEEP_DEFAULTS for the others. When STATE is swept and
+    neither BEGIN_LAT nor BEGIN_LON is, each row is placed at the centre of
+    its state instead of at a fixed location.
+    """
+    fixed = dict(fixed or {})
+    unknown = (set(axes) | set(fixed)) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}")
+    overlap = set(axes) & set(fixed)
+    if overlap:
+        raise ValueError(f"Features both swept and fixed: {', '.join(sorted(overlap))}")
+    swept = {}
+    for feature, values in axes.items():
+        dtype = np.float64 if feature in NUMERIC_FEATURES else object
+        values = np.asarray(list(values), dtype=dtype)
+        if values.ndim != 1 or len(values) == 0:
+            raise ValueError(f"Axis {feature} needs at least one value")
+        swept[feature] = values
+    locate = 'STATE' in swept and not ({'BEGIN_LAT', 'BEGIN_LON'} & (set(swept) | set(fixed)))
+    rest = {f: fixed.get(f, SWEEP_DEFAULTS[f]) for f in FEATURES if f not in swept}
+    if locate:
+        del rest['BEGIN_LAT'], rest['BEGIN_LON']
+    return {'axes': swept, 'fixed': rest, 'locate_states': locate}
+
+
+def sweep_size(sweep):
+    return int(np.prod([len(values) for values in sweep['axes'].values()], dtype=np.int64))
+
+
+def iter_sweep_chunks(sweep, chunk_rows=DEFAULT_CHUNK_SIZE):
+    """Yield (codes, frame) per chunk: the axis value indices of each row and its model inputs."""
+    names = list(sweep['axes'])
+    shape = tuple(len(sweep['axes'][name]) for name in names)
+    total = sweep_size(sweep)
+    if sweep['locate_states']:
+        states = sweep['axes']['STATE']
+        centre = np.array([STATE_CENTROIDS.get(s, (np.nan, np.nan)) for s in states], dtype=np.float64)
+    for start in range(0, total, chunk_rows):
+        index = np.arange(start, min(start + chunk_rows, total), dtype=np.int64)
+        codes = dict(zip(names, np.unravel_index(index, shape)))
+        columns = {name: sweep['axes'][name][codes[name]] for name in names}
+        for feature, value in sweep['fixed'].items():
+            columns[feature] = np.full(len(index), value, dtype=object if feature in CATEGORICAL_FEATURES else None)
+        if sweep['locate_states']:
+            columns['BEGIN_LAT'] = centre[codes['STATE'], 0]
+            columns['BEGIN_LON'] = centre[codes['STATE'], 1]
+        yield codes, pd.DataFrame({feature: columns[feature] for feature in FEATURES})
+
+
+class PartialDependence:
+    """Streaming mean prediction per axis value and per pair of axis values.
+
+    curve(feature) averages the predictions over every other swept axis
+    (the classic partial-dependence curve over the sweep grid);
+    table(feature, by) does the same for each value of a second axis.
+    """
+
+    def __init__(self, axes):
+        self.axes = {name: np.asarray(values) for name, values in axes.items()}
+        sizes = {name: len(values) for name, values in self.axes.items()}
+        self._count = {name: np.zeros(n, dtype=np.int64) for name, n in sizes.items()}
+        self._sum = {name: np.zeros(n) for name, n in sizes.items()}
+        self._min = {name: np.full(n, np.inf) for name, n in sizes.items()}
+        self._max = {name: np.full(n, -np.inf) for name, n in sizes.items()}
+        self._pair_sum = {
+            (a, b): np.zeros(sizes[a] * sizes[b])
+            for a, b in combinations(self.axes, 2) if sizes[a] * sizes[b] <= MAX_PAIR_CELLS
+        }
+        self._pair_count = {pair: np.zeros(len(sums), dtype=np.int64) for pair, sums in self._pair_sum.items()}
+
+    def update(self, codes, values):
+        values = np.asarray(values, dtype=np.float64)
+        for name, idx in codes.items():
+            n = len(self.axes[name])
+            self._count[name] += np.bincount(idx, minlength=n)
+            self._sum[name] += np.bincount(idx, weights=values, minlength=n)
+            np.minimum.at(self._min[name], idx, values)
+            np.maximum.at(self._max[name], idx, values)
+        for (a, b), sums in self._pair_sum.items():
+            cell = codes[a] * len(self.axes[b]) + codes[b]
+            sums += np.bincount(cell, weights=values, minlength=len(sums))
+            self._pair_count[(a, b)] += np.bincount(cell, minlength=len(sums))
+
+    def curve(self, feature):
+        """DataFrame indexed by the axis values with the mean, min and max prediction."""
+        count = self._count[feature]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self._sum[feature] / count
+        return pd.DataFrame({'mean': mean, 'min': self._min[feature], 'max': self._max[feature]},
+                            index=pd.Index(self.axes[feature], name=feature))
+
+    def table(self, feature, by):
+        """Mean prediction per (feature value, by value): one column per value of by."""
+        if (feature, by) in self._pair_sum:
+            pair, transpose = (feature, by), False
+        elif (by, feature) in self._pair_sum:
+            pair, transpose = (by, feature), True
+        else:
+            raise KeyError(f"No pair table for {feature} x {by}")
+        a, b = pair
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (self._pair_sum[pair] / self._pair_count[pair]).reshape(len(self.axes[a]), len(self.axes[b]))
+        frame = pd.DataFrame(mean, index=pd.Index(self.axes[a], name=a), columns=pd.Index(self.axes[b], name=b))
+        return frame.T if transpose else frame
+
+    def to_dict(self):
+        return {
+            'curves': {name: self.curve(name).reset_index().to_dict(orient='list') for name in self.axes},
+            'tables': {f'{a}|{b}': self.table(a, b).to_dict(orient='split') for a, b in self._pair_sum},
+        }
+
+
+def run_sweep(sweep, model_path=None, output_path=None, chunk_rows=DEFAULT_CHUNK_SIZE, progress=None):
+    """Score every row of a sweep; returns (PartialDependence, stats).
+
+    With output_path (.csv or .parquet) the scored rows are streamed to the
+    file chunk by chunk. progress(rows_done, rows_total) is called after
+    each chunk.
+    """
+    model = load_model(model_path or default_model_path())
+    summary = PartialDependence(sweep['axes'])
+    total = sweep_size(sweep)
+    done = 0
+    start = time.perf_counter()
+
+    def scored():
+        nonlocal done
+        for codes, frame in iter_sweep_chunks(sweep, chunk_rows):
+            damage = postprocess_prediction(make_prediction(model, frame))
+            summary.update(codes, damage)
+            frame[PREDICTION_COLUMN] = damage
+            done += len(frame)
+            if progress is not None:
+                progress(done, total)
+            yield frame
+
+    if output_path:
+        write_chunks(scored(), output_path)
+    else:
+        for _ in scored():
+            pass
+    seconds = time.perf_counter() - start
+    return summary, {'rows': done, 'seconds': seconds, 'rows_per_second': done / seconds if seconds > 0 else 0.0}
+
+
+def _numeric_axis(spec):
+    start, stop, step = spec
+    if step <= 0 or stop < start:
+        raise ValueError(f"Invalid range {start} {stop} {step}")
+    return start + step * np.arange(int(np.floor((stop - start) / step + 1e-9)) + 1)
+
+
+def _categorical_axis(values, choices):
+    return list(choices) if values == ['all'] else values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.sweep',
+                                     description='Score a cartesian sweep over the model inputs.')
+    for feature in NUMERIC_FEATURES:
+        parser.add_argument(_FLAGS[feature], dest=feature, type=float, nargs=3, metavar=('START', 'STOP', 'STEP'),
+                            help=f'sweep {feature} over a range')
+    choices = {'STATE': STATES, 'EVENT_TYPE': EVENT_TYPES, 'MONTH_NAME': MONTHS, 'MAGNITUDE_TYPE': MAGNITUDE_TYPES}
+    for feature in CATEGORICAL_FEATURES:
+        parser.add_argument(_FLAGS[feature], dest=feature, nargs='+', metavar='VALUE',
+                            help=f'sweep {feature} over these values ("all" = every form choice)')
+    parser.add_argument('--model', default=None, help='model file (default: the up-to-date model in src/)')
+    parser.add_argument('--output', help='stream the scored rows to this .csv or .parquet file')
+    parser.add_argument('--summary', help='write the partial-dependence curves and tables to this JSON file')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--curves', action='store_true', help='print the partial-dependence curves')
+    args = parser.parse_args(argv)
+
+    axes = {}
+    for feature in FEATURES:
+        spec = getattr(args, feature)
+        if spec is None:
+            continue
+        axes[feature] = _numeric_axis(spec) if feature in NUMERIC_FEATURES else _categorical_axis(spec, choices[feature])
+    if not axes:
+        parser.error('give at least one feature to sweep, e.g. --magnitude 0 300 10')
+    try:
+        sweep = make_sweep(axes)
+        summary, stats = run_sweep(sweep, args.model, args.output, args.chunk_rows)
+    except (FileNotFoundError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    shape = ' x '.join(f'{len(v)} {k}' for k, v in sweep['axes'].items())
+    print(f"Scored {stats['rows']:,} scenarios ({shape}) in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_second']:,.0f} rows/s)")
+    if args.curves:
+        for feature in sweep['axes']:
+            print(f'\n{summary.curve(feature).to_string()}')
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary.to_dict(), f, indent=2, default=str)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# utils/synthetic.py - Synthetic storm events for benchmarks and load tests
+#
+# Events follow the eight-feature model schema and draw their categories
+# from the Assess Risk form choices (STATES, EVENT_TYPES, MONTHS,
+# MAGNITUDE_TYPES), so they exercise the same paths as real user input.
+
+import numpy as np
+import pandas as pd
+
+from .model_utils import EVENT_TYPES, FEATURES, MAGNITUDE_TYPES, MONTHS, STATES
+
+# Rough bounding box of the contiguous United States
+LAT_RANGE = (24.5, 49.4)
+LON_RANGE = (-124.8, -66.9)
+
+
+def generate_events(n, seed=0, missing_rate=0.0):
+    """Return a DataFrame of n random events with exactly the model features.
+
+    missing_rate is the share of numeric values replaced by NaN, to
+    exercise the imputers. The same seed always yields the same events.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'STATE': rng.choice(STATES, n),
+        'EVENT_TYPE': rng.choice(EVENT_TYPES, n),
+        'MONTH_NAME': rng.choice(MONTHS, n),
+        'MAGNITUDE': rng.uniform(0.0, 300.0, n).round(1),
+        'MAGNITUDE_TYPE': rng.choice(MAGNITUDE_TYPES, n),
+        'BEGIN_LAT': rng.uniform(*LAT_RANGE, n).round(2),
+        'BEGIN_LON': rng.uniform(*LON_RANGE, n).round(2),
+        # Most events are short; a few last for days
+        'DURATION_HOURS': rng.exponential(2.0, n).round(2),
+    })[FEATURES]
+    if missing_rate > 0:
+        for col in ('MAGNITUDE', 'BEGIN_LAT', 'BEGIN_LON', 'DURATION_HOURS'):
+            df.loc[rng.random(n) < missing_rate, col] = np.nan
+    return df
+
+
+def generate_event(seed=0):
+    """Return one random event as the dict the Assess Risk page builds."""
+    return generate_events(1, seed=seed).iloc[0].to_dict()
@@ -0,0 +1,303 @@
+# utils/train.py - Reproducible training of the damage model (the Fianl_.ipynb pipeline as a script)
+#
+# Two engines share the data preparation, split and metrics:
+#   gb    the notebook's model: median/constant imputation, scaling and a
+#         dense one-hot matrix feeding an exact-split
+#         GradientBoostingRegressor (huber loss, 200 trees, depth 10)
+#   hist  HistGradientBoostingRegressor on binned features: multi-threaded,
+#         with native missing-value and categorical handling (categories
+#         are ordinal-encoded, no one-hot matrix)
+# Cross-validation folds are fitted in parallel worker processes.
+#
+# Usage (from the src directory):
+#   python -m utils.train StormEvents_cleaned.csv --engine hist --output damage_model_pipeline.pkl
+#   python -m utils.train StormEvents_cleaned.csv --engine gb --cv 5 --cv-jobs 5 --metrics metrics.json
+#   python -m utils.train StormEvents_archive.csv --engine hist --out-of-core .cache/train_matrix
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .data_utils import parse_damage
+from .evaluation import evaluate, save_report
+from .features import duration_hours
+from .memory import format_bytes, peak_rss_bytes
+from .model_utils import CATEGORICAL_FEATURES, FEATURES, NUMERIC_FEATURES
+
+ENGINES = ('gb', 'hist')
+TARGET = 'DAMAGE_PROPERTY'
+# Largest property damage kept as is (the notebook's clip)
+DAMAGE_CLIP = 1_200_000_000
+
+# Hyperparameters of the notebook model; the hist engine uses the same
+# number of iterations, depth and learning rate
+DEFAULT_PARAMS = {
+    'n_estimators': 200,
+    'max_depth': 10,
+    'learning_rate': 0.05,
+    'random_state': 42,
+}
+
+
+# Columns of a StormEvents CSV that training reads
+SOURCE_COLUMNS = set(FEATURES) | {TARGET, 'BEGIN_DATE_TIME', 'END_DATE_TIME', 'END_LAT', 'END_LON'}
+
+
+def prepare_training_frame(df):
+    """Return (X, y) for a DataFrame of StormEvents rows: the model features and the property damage in USD.
+
+    Follows the notebook: damage strings are parsed (property damage
+    clipped at DAMAGE_CLIP), DURATION_HOURS is derived from the begin/end
+    timestamps (0 when unknown) and rows without coordinates are dropped.
+    df itself is not modified.
+    """
+    y = parse_damage(df[TARGET], clip_upper=DAMAGE_CLIP)
+    keep = df[['BEGIN_LAT', 'BEGIN_LON', 'END_LAT', 'END_LON']].notna().all(axis=1).to_numpy()
+    rows = df.loc[keep]
+    if 'DURATION_HOURS' in df.columns:
+        X = rows[FEATURES].reset_index(drop=True)
+    else:
+        X = rows[[col for col in FEATURES if col != 'DURATION_HOURS']].reset_index(drop=True)
+        duration = duration_hours(rows['BEGIN_DATE_TIME'], rows['END_DATE_TIME'])
+        X.insert(FEATURES.index('DURATION_HOURS'), 'DURATION_HOURS', np.nan_to_num(duration, nan=0.0))
+    return X, y[keep].reset_index(drop=True)
+
+
+def load_training_data(path, nrows=None):
+    """Read a StormEvents CSV and return (X, y), see prepare_training_frame()."""
+    df = pd.read_csv(path, usecols=lambda col: col in SOURCE_COLUMNS, nrows=nrows, low_memory=False)
+    return prepare_training_frame(df)
+
+
+def split_data(X, y, test_size=0.2, random_state=42):
+    """Train/test split stratified on damage quintiles, as in the notebook."""
+    from sklearn.model_selection import train_test_split
+
+    bins = pd.qcut(y, q=5, labels=False, duplicates='drop')
+    return train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=bins)
+
+
+def build_pipeline(engine='gb', cache_dir=None, **params):
+    """Return an unfitted preprocessor + model Pipeline for engine ('gb' or 'hist').
+
+    params override DEFAULT_PARAMS (n_estimators is max_iter for hist).
+    Either pipeline takes the raw feature DataFrame, like the app's model.
+    With cache_dir the preprocessor is fitted through a disk cache (see
+    utils.train_cache), which cross-validation and searches reuse.
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+    params = dict(DEFAULT_PARAMS, **params)
+    if engine == 'gb':
+        from sklearn.ensemble import GradientBoostingRegressor
+
+        preprocessor = ColumnTransformer([
+            ('num', Pipeline([
+                ('imputer', SimpleImputer(strategy='median')),
+                ('scaler', StandardScaler()),
+            ]), NUMERIC_FEATURES),
+            ('cat', Pipeline([
+                ('imputer', SimpleImputer(strategy='constant', fill_value='Unknown')),
+                ('ohe', OneHotEncoder(handle_unknown='ignore', sparse_output=False)),
+            ]), CATEGORICAL_FEATURES),
+        ])
+        model = GradientBoostingRegressor(loss='huber', **params)
+    elif engine == 'hist':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        # Missing and unseen categories both become NaN, which the trees route natively
+        preprocessor = ColumnTransformer([
+            ('num', 'passthrough', NUMERIC_FEATURES),
+            ('cat', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan,
+                                   encoded_missing_value=np.nan), CATEGORICAL_FEATURES),
+        ])
+        n_numeric = len(NUMERIC_FEATURES)
+        model = HistGradientBoostingRegressor(
+            # huber is not available for histogram boosting; absolute error is the robust choice
+            loss='absolute_error',
+            max_iter=params.pop('n_estimators'),
+            categorical_features=list(range(n_numeric, n_numeric + len(CATEGORICAL_FEATURES))),
+            early_stopping=False,
+            **params,
+        )
+    else:
+        raise ValueError(f"Unknown engine {engine!r} (expected one of {', '.join(ENGINES)})")
+    if cache_dir is not None:
+        from .train_cache import CachedTransformer
+
+        preprocessor = CachedTransformer(preprocessor, cache_dir)
+    return Pipeline([('preprocessor', preprocessor), ('model', model)])
+
+
+def default_cv_jobs(engine, cv):
+    """Parallel CV processes: one per fold for gb; hist is already multi-threaded, so one."""
+    if engine == 'hist':
+        return 1
+    from .parallel import default_workers
+
+    return max(1, min(cv, default_workers()))
+
+
+def cross_validate(pipeline, X, y_log, cv=5, n_jobs=1):
+    """R² of each of cv folds on the log target, with the folds fitted on n_jobs processes."""
+    from sklearn.model_selection import cross_val_score
+
+    return cross_val_score(pipeline, X, y_log, cv=cv, scoring='r2', n_jobs=n_jobs)
+
+
+def train(data_path, engine='gb', cv=5, cv_jobs=None, nrows=None, params=None, cache_dir=None):
+    """Load, split, fit, cross-validate and evaluate; returns (pipeline, report).
+
+    The report holds the test-set metrics (and under 'evaluation' the full
+    utils.evaluation report with its breakdowns), the CV R² scores, the wall
+    time of every stage and the peak resident memory of this process. With
+    cache_dir, fitted preprocessing is reused from (and stored in) the
+    training cache, which is then pruned to its size limit; the returned
+    pipeline never refers to it.
+    """
+    params = dict(params or {})
+    timings = {}
+    start = time.perf_counter()
+    X, y = load_training_data(data_path, nrows=nrows)
+    timings['load_seconds'] = time.perf_counter() - start
+
+    X_train, X_test, y_train, y_test = split_data(X, y, random_state=params.get('random_state', 42))
+    y_train_log = np.log1p(y_train)
+    pipeline = build_pipeline(engine, cache_dir, **params)
+
+    t = time.perf_counter()
+    pipeline.fit(X_train, y_train_log)
+    timings['fit_seconds'] = time.perf_counter() - t
+
+    cv_scores = None
+    if cv and cv > 1:
+        cv_jobs = cv_jobs or default_cv_jobs(engine, cv)
+        t = time.perf_counter()
+        cv_scores = cross_validate(build_pipeline(engine, cache_dir, **params), X_train, y_train_log,
+                                   cv=cv, n_jobs=cv_jobs)
+        timings['cv_seconds'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    y_pred = np.expm1(np.clip(pipeline.predict(X_test), 0, None))
+    evaluation = evaluate(y_test, y_pred, X_test, data=os.path.abspath(data_path), split='test', engine=engine)
+    metrics = dict(evaluation['metrics'])
+    timings['evaluate_seconds'] = time.perf_counter() - t
+    timings['total_seconds'] = time.perf_counter() - start
+
+    if cv_scores is not None:
+        metrics['CV_R2'] = float(np.mean(cv_scores))
+    if cache_dir is not None:
+        from .train_cache import TransformerCache, unwrap_pipeline
+
+        pipeline = unwrap_pipeline(pipeline)
+        TransformerCache(cache_dir).prune()
+    report = {
+        'engine': engine,
+        'params': dict(DEFAULT_PARAMS, **params),
+        'data': os.path.abspath(data_path),
+        'rows': {'train': len(X_train), 'test': len(X_test)},
+        'metrics': metrics,
+        'cv_r2': [float(s) for s in cv_scores] if cv_scores is not None else None,
+        'cv_jobs': cv_jobs if cv_scores is not None else None,
+        'timings': timings,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'trained_at': time.time(),
+        'evaluation': evaluation,
+    }
+    return pipeline, report
+
+
+def print_report(report, out=sys.stdout):
+    m = report['metrics']
+    print(f"Engine {report['engine']}: {report['rows']['train']:,} train / {report['rows']['test']:,} test rows",
+          file=out)
+    print(f"MAE    : {m['MAE']:,.2f} USD", file=out)
+    print(f"MedAE  : {m['MedAE']:,.2f} USD", file=out)
+    print(f"RMSE   : {m['RMSE']:,.2f} USD", file=out)
+    print(f"RMSLE  : {m['RMSLE']:.4f}", file=out)
+    for name in ('MAPE', 'SMAPE', 'WAPE'):
+        if m[name] is not None:
+            print(f"{name:<6} : {m[name] * 100:.2f}%", file=out)
+    if 'CV_R2' in m:
+        print(f"CV R²  : {m['CV_R2']:.4f} ({len(report['cv_r2'])} folds, {report['cv_jobs']} at a time)", file=out)
+    t = report['timings']
+    stages = ', '.join(f"{key[:-len('_seconds')]} {value:.1f}s" for key, value in t.items() if key != 'total_seconds')
+    print(f"Wall time {t['total_seconds']:.1f}s ({stages}); peak RSS {format_bytes(report['peak_rss_bytes'])}",
+          file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.train', description='Train the storm damage model.')
+    parser.add_argument('data', help='StormEvents CSV (e.g. StormEvents_cleaned.csv)')
+    parser.add_argument('--engine', choices=ENGINES, default='gb',
+                        help='gb: the notebook GradientBoostingRegressor; hist: histogram-based boosting (default: gb)')
+    parser.add_argument('--output', help='save the fitted pipeline here (e.g. damage_model_pipeline.pkl)')
+    parser.add_argument('--metrics', help='write the training report JSON here (e.g. damage_model_metrics.json)')
+    parser.add_argument('--cv', type=int, default=5, help='cross-validation folds, 0 to skip (default: 5)')
+    parser.add_argument('--cv-jobs', type=int, default=None,
+                        help='processes fitting CV folds (default: one per fold for gb, 1 for hist)')
+    parser.add_argument('--rows', type=int, default=None, help='only read the first ROWS rows of the CSV')
+    parser.add_argument('--n-estimators', type=int, default=DEFAULT_PARAMS['n_estimators'])
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_PARAMS['max_depth'])
+    parser.add_argument('--learning-rate', type=float, default=DEFAULT_PARAMS['learning_rate'])
+    parser.add_argument('--seed', type=int, default=DEFAULT_PARAMS['random_state'])
+    parser.add_argument('--cache-dir', help='reuse fitted preprocessing from this training cache directory')
+    parser.add_argument('--clear-cache', action='store_true', help='with --cache-dir: empty the cache directory first')
+    parser.add_argument('--out-of-core', metavar='DIR',
+                        help='hist only: stream the CSV into a memory-mapped feature matrix in DIR and fit from it '
+                             '(no CV; see utils.feature_matrix)')
+    parser.add_argument('--max-train-rows', type=int, default=None,
+                        help='with --out-of-core: fit on a uniform sample of at most this many training rows')
+    args = parser.parse_args(argv)
+
+    params = {
+        'n_estimators': args.n_estimators,
+        'max_depth': args.max_depth,
+        'learning_rate': args.learning_rate,
+        'random_state': args.seed,
+    }
+    if args.out_of_core and (args.engine != 'hist' or args.rows):
+        parser.error('--out-of-core needs --engine hist and reads every row')
+    if args.clear_cache:
+        if not args.cache_dir:
+            parser.error('--clear-cache needs --cache-dir')
+        from .train_cache import TransformerCache
+
+        freed = TransformerCache(args.cache_dir).clear()
+        print(f'Cleared {format_bytes(freed)} from {args.cache_dir}')
+    try:
+        if args.out_of_core:
+            from .feature_matrix import train_out_of_core
+
+            pipeline, report = train_out_of_core(args.data, args.out_of_core, params=params,
+                                                 max_train_rows=args.max_train_rows)
+        else:
+            pipeline, report = train(args.data, args.engine, cv=args.cv, cv_jobs=args.cv_jobs, nrows=args.rows,
+                                     params=params, cache_dir=args.cache_dir)
+    except (FileNotFoundError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    print_report(report)
+    if args.output:
+        import joblib
+
+        joblib.dump(pipeline, args.output)
+        print(f'Pipeline saved to {args.output}')
+        print(f"Evaluation report saved to {save_report(report['evaluation'], args.output)}")
+    if args.metrics:
+        with open(args.metrics, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Report saved to {args.metrics}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# utils/train_cache.py - Disk cache of fitted preprocessing for cross-validation and searches
+#
+# Cross-validation refits the preprocessor (imputers, scaler, encoder) in
+# every fold, and a hyperparameter search repeats that for every candidate,
+# although the preprocessing only depends on the fold's rows and its own
+# parameters. CachedTransformer wraps the preprocessor of a pipeline: the
+# fitted transformer and its output are stored under a key made of the
+# data fingerprint (joblib.hash of X and y) and the transformer's class and
+# parameters, and reused by every later fit on the same rows, in this or
+# any other process. Hits and the fit time they saved are appended to a
+# log in the cache directory, so parallel workers are counted too.
+#
+# Every entry is a full transformed matrix, so the directory is bounded:
+# after each training run or search, prune() drops the least recently used
+# entries beyond STORM_TRAIN_CACHE_MAX_BYTES (1 GiB by default) and folds
+# the log into per-event totals once it grows; clear() empties it.
+
+import os
+import shutil
+import time
+
+import joblib
+from sklearn.base import BaseEstimator, TransformerMixin, clone
+
+from .data_utils import DEFAULT_CACHE_DIR
+
+DEFAULT_TRAIN_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'train')
+
+# Bump when the layout of cached entries changes
+CACHE_VERSION = 1
+
+DEFAULT_MAX_CACHE_BYTES = int(os.environ.get('STORM_TRAIN_CACHE_MAX_BYTES', 1 << 30))
+
+_STATS_LOG = 'stats.log'
+# Size above which prune() folds the log into one line per event
+_MAX_LOG_BYTES = 64 * 1024
+
+
+class TransformerCache:
+    """Directory of fitted transformers and transformed matrices, keyed by content."""
+
+    def __init__(self, cache_dir=DEFAULT_TRAIN_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.joblib')
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            entry = joblib.load(path)
+            os.utime(path)  # mark as recently used for prune()
+            return entry
+        except (OSError, EOFError, ValueError):
+            return None
+
+    def _store(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.joblib'):
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, os.path.join(root, name)))
+        return entries
+
+    def size_bytes(self):
+        """Total size of the cached entries."""
+        return sum(size for _, size, _ in self._entries())
+
+    def prune(self, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+        """Remove the least recently used entries until at most max_bytes remain; returns bytes freed."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in entries:
+            if total - freed <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        self._compact_log()
+        return freed
+
+    def clear(self):
+        """Remove every entry and the statistics log; returns bytes freed."""
+        freed = self.size_bytes()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return freed
+
+    def _compact_log(self):
+        # Fold the log into one 'event seconds count' line per event. Events
+        # appended by another process while this runs may be lost from the stats.
+        path = os.path.join(self.cache_dir, _STATS_LOG)
+        try:
+            if os.path.getsize(path) <= _MAX_LOG_BYTES:
+                return
+        except OSError:
+            return
+        totals = {}
+        for event, seconds, n in self._log_events():
+            total = totals.setdefault(event, [0.0, 0])
+            total[0] += seconds
+            total[1] += n
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            for event, (seconds, n) in totals.items():
+                f.write(f'{event} {seconds:.6f} {n}\n')
+        os.replace(tmp_path, path)
+
+    def _log_events(self):
+        try:
+            with open(os.path.join(self.cache_dir, _STATS_LOG)) as f:
+                lines = f.read().split('\n')
+        except OSError:
+            return
+        for line in lines:
+            # 'event seconds', or 'event seconds count' for a compacted total
+            try:
+                event, seconds, *n = line.split()
+                yield event, float(seconds), int(n[0]) if n else 1
+            except ValueError:
+                continue
+
+    def _record(self, event, seconds):
+        # One short O_APPEND write per event, safe from parallel worker processes
+        with open(os.path.join(self.cache_dir, _STATS_LOG), 'a') as f:
+            f.write(f'{event} {seconds:.6f}\n')
+
+    def fit_key(self, transformer, X, y=None):
+        params = transformer.get_params(deep=True)
+        return joblib.hash((CACHE_VERSION, type(transformer).__qualname__, repr(sorted(params.items())),
+                            joblib.hash(X), joblib.hash(y)))
+
+    def fit_transform(self, transformer, X, y=None):
+        """Return (fitted clone of transformer, its output on X, cache key), from the cache when possible."""
+        key = self.fit_key(transformer, X, y)
+        entry = self._load(key)
+        if entry is not None:
+            self._record('fit_hit', entry['seconds'])
+            return entry['fitted'], entry['output'], key
+        start = time.perf_counter()
+        fitted = clone(transformer)
+        output = fitted.fit_transform(X, y)
+        seconds = time.perf_counter() - start
+        self._store(key, {'fitted': fitted, 'output': output, 'seconds': seconds})
+        self._record('fit_miss', seconds)
+        return fitted, output, key
+
+    def transform(self, fit_key, fitted, X):
+        """fitted.transform(X), reusing an earlier result for the same fitted transformer and rows."""
+        key = joblib.hash((fit_key, joblib.hash(X)))
+        entry = self._load(key)
+        if entry is not None:
+            self._record('transform_hit', entry['seconds'])
+            return entry['output']
+        start = time.perf_counter()
+        output = fitted.transform(X)
+        seconds = time.perf_counter() - start
+        self._store(key, {'output': output, 'seconds': seconds})
+        self._record('transform_miss', seconds)
+        return output
+
+    def stats(self):
+        """Hit/miss counts, seconds spent computing entries and seconds saved by hits."""
+        stats = {'hits': 0, 'misses': 0, 'seconds_computed': 0.0, 'seconds_saved': 0.0}
+        for event, seconds, n in self._log_events():
+            if event.endswith('_hit'):
+                stats['hits'] += n
+                stats['seconds_saved'] += seconds
+            else:
+                stats['misses'] += n
+                stats['seconds_computed'] += seconds
+        return stats
+
+
+class CachedTransformer(TransformerMixin, BaseEstimator):
+    """Pipeline step that fits and applies transformer through a TransformerCache directory."""
+
+    def __init__(self, transformer, cache_dir=DEFAULT_TRAIN_CACHE_DIR):
+        self.transformer = transformer
+        self.cache_dir = cache_dir
+
+    def fit_transform(self, X, y=None):
+        self.fitted_, output, self.fit_key_ = TransformerCache(self.cache_dir).fit_transform(self.transformer, X, y)
+        return output
+
+    def fit(self, X, y=None):
+        self.fit_transform(X, y)
+        return self
+
+    def transform(self, X):
+        return TransformerCache(self.cache_dir).transform(self.fit_key_, self.fitted_, X)
+
+
+def unwrap_pipeline(pipeline):
+    """Replace CachedTransformer steps of a fitted pipeline by the transformers they hold.
+
+    The result no longer refers to the cache directory and has the same
+    layout as an uncached pipeline (so it can be served or flattened).
+    """
+    from sklearn.pipeline import Pipeline
+
+    steps = [(name, step.fitted_ if isinstance(step, CachedTransformer) else step) for name, step in pipeline.steps]
+    return Pipeline(steps)